@@ -1,55 +1,68 @@
 import streamlit as st
-import requests
-import json
-import time
-
-# Função para fazer a requisição GraphQL
-def execute_graphql_mutation(bearer_token, mutation_query):
-    url = "https://api.pipefy.com/graphql"
-    headers = {
-        "Authorization": f"Bearer {bearer_token}",
-        "Content-Type": "application/json"
-    }
-    
-    response = requests.post(url, headers=headers, json={"query": mutation_query})
-    return response
-
-# Função para dividir a query em super-lotes e sub-lotes
-def partition_query(mutation_query, batch_size):
-    # Dividir em mutações completas por "mutation{ ... }"
-    queries = mutation_query.strip().split('mutation{')[1:]
-    
-    super_lotes = []
-    
-    # Para cada query completa, dividir em sub-lotes
-    for query in queries:
-        query_parts = query.strip().split("}")
-        query_parts = [part.strip() + "}" for part in query_parts if part.strip()]
-        
-        # Dividir em sub-lotes, com base no tamanho do lote
-        query_batches = [f"mutation{{{' '.join(query_parts[i:i + batch_size])}}}" for i in range(0, len(query_parts), batch_size)]
-        
-        super_lotes.append(query_batches)
-    
-    return super_lotes
-
-# Função para mostrar o log de execução dinamicamente
-def update_log(log_message):
-    # Usamos st.empty() para atualizar dinamicamente o campo de log
-    if 'log' not in st.session_state:
-        st.session_state['log'] = []
-    
-    # Adicionar o novo log no topo (inverter a ordem)
-    st.session_state['log'].insert(0, log_message)
-    
-    # Exibir log atualizado de forma dinâmica
-    log_text = "\n".join(st.session_state['log'])
-    
-    # A chave única será baseada em timestamp para evitar duplicação
-    # Usamos o placeholder definido na UI principal
-    if 'log_placeholder' in st.session_state:
-        log_placeholder = st.session_state['log_placeholder']
-        log_placeholder.text_area("Log de Execução", value=log_text, height=300, max_chars=None, key=f"log_area_{time.time()}", disabled=True)
+from toolbox_common.metrics import init_metrics, track_action
+from toolbox_common.jobs import JobCancelled
+from toolbox_common.job_panel import submit_job, job_is_active, render_job_panel
+from toolbox_common.pipefy_scheduler import request_context, BULK
+from mutation_utils import (
+    partition_query,
+    execute_batches,
+    MUTATION_TEMPLATES,
+    read_mutation_rows,
+    prepare_mutation_rows,
+    generate_mutation_batches,
+    count_mutation_batches
+)
+
+# Execução dos sub-lotes em segundo plano: continua mesmo que a página seja
+# recarregada, e o progresso é acompanhado pelo painel do job
+# 'build_super_lotes' monta os super-lotes já dentro do job (e da métrica da ação)
+def run_batches_job(job, action_name, bearer_token, build_super_lotes, delay_time, total_sub_lotes=None):
+    job.log("Iniciando execução...")
+    # Execução em lote: no agendador do token, cede a vez às consultas interativas
+    with track_action(action_name) as action, request_context(job.owner, BULK):
+        try:
+            super_lotes = build_super_lotes()
+            executed = execute_batches(
+                bearer_token,
+                super_lotes,
+                delay_time,
+                log=job.log,
+                on_progress=lambda done, total: job.report_progress(done / total, f"Sub-lote {done} de {total}"),
+                should_cancel=lambda: job.cancelled,
+                total_sub_lotes=total_sub_lotes
+            )
+            action.add_rows(executed)
+        except Exception as e:
+            action.mark_error()
+            job.log(f"ERRO CRÍTICO NA EXECUÇÃO: {e}")
+            raise
+    if job.cancelled:
+        raise JobCancelled()
+    return {"executed": executed, "logs": list(job.logs)}
+
+# Execução da query colada (dividida em super-lotes e sub-lotes)
+def execute_batches_job(job, bearer_token, mutation_query, batch_size, delay_time):
+    return run_batches_job(job, "execute_batches", bearer_token,
+                           lambda: partition_query(mutation_query, batch_size), delay_time)
+
+# Execução das mutations geradas a partir de uma planilha: um único super-lote, cujos
+# sub-lotes são gerados à medida que são enviados
+def execute_generated_job(job, bearer_token, rows, template, mutations_per_batch, delay_time):
+    return run_batches_job(job, "execute_generated_batches", bearer_token,
+                           lambda: [generate_mutation_batches(rows, template, mutations_per_batch)], delay_time,
+                           total_sub_lotes=count_mutation_batches(rows, mutations_per_batch))
+
+# Lê a planilha enviada uma única vez por arquivo (as reexecuções da página a reaproveitam)
+def load_uploaded_rows(uploaded_file):
+    cached = st.session_state.get("mutation_rows")
+    if cached is None or cached[0] != uploaded_file.file_id:
+        cached = (uploaded_file.file_id, read_mutation_rows(uploaded_file, uploaded_file.name))
+        st.session_state["mutation_rows"] = cached
+    return cached[1]
+
+# Guarda o log do job concluído (mais recentes no topo)
+def store_execution_log(result):
+    st.session_state['log'] = list(reversed(result["logs"]))
 
 # Função para mostrar todos os previews em compartimentos expansíveis
 def show_all_previews(super_lotes):
@@ -62,55 +75,9 @@ def show_all_previews(super_lotes):
                     with st.expander(f"Sub-Lote {i + 1}-{j + 1}"):
                         st.code(sub_lote, language='graphql')
 
-# Função para executar os sub-lotes com razão de progresso
-# Agora aceita 'delay_time' para pausar entre as requisições
-def execute_batches(bearer_token, super_lotes, delay_time):
-    total_sub_lotes = sum(len(batch) for batch in super_lotes)  # Total de sub-lotes
-    executed_sub_lotes = 0  # Contador de sub-lotes executados
-
-    for i, query_batches in enumerate(super_lotes):
-        # Iniciar execução do Super-Lote
-        update_log(f"\n{'-'*40}\nIniciando execução do Super-Lote {i + 1}\n{'-'*40}\n")
-        
-        for idx, batch in enumerate(query_batches):
-            executed_sub_lotes += 1  # Incrementa o contador de sub-lotes executados
-            
-            # Calcular a porcentagem de conclusão
-            progress = (executed_sub_lotes / total_sub_lotes) * 100
-            
-            # Exibir o progresso
-            update_log(f"Sub-Lote {i + 1}-{idx + 1} : Iniciando execução ...")
-            update_log(f"Progresso: {executed_sub_lotes}/{total_sub_lotes} ({progress:.2f}%)")
-            
-            response = execute_graphql_mutation(bearer_token, batch)
-            
-            # --- VERIFICAÇÃO DE ERRO MELHORADA ---
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    if "errors" in data:
-                        # Erro de GraphQL detectado (operação falhou, mas HTTP foi 200)
-                        error_message = json.dumps(data["errors"], indent=2)
-                        update_log(f"Sub-Lote {i + 1}-{idx + 1} : Erro de GraphQL (Status 200) - {error_message}")
-                    else:
-                        # Execução bem-sucedida
-                        update_log(f"Sub-Lote {i + 1}-{idx + 1} : Executado com sucesso!")
-                except json.JSONDecodeError:
-                    # Resposta não é JSON, o que pode indicar um problema inesperado no Pipefy
-                    update_log(f"Sub-Lote {i + 1}-{idx + 1} : Erro - Resposta HTTP 200, mas corpo inesperado ou não JSON: {response.text}")
-
-            else:
-                # Erro HTTP tradicional (4xx, 5xx, etc.)
-                update_log(f"Sub-Lote {i + 1}-{idx + 1} : Erro HTTP ({response.status_code}) - {response.text}")
-            
-            # Pausa configurável para evitar sobrecarga (controle de rate-limit)
-            if delay_time > 0:
-                update_log(f"Pausando por {delay_time}s...")
-                time.sleep(delay_time) 
-
-
 # Configuração do Streamlit
 st.set_page_config(page_title="Executador de Mutations Pipefy", layout="wide")
+init_metrics("mutations")
 st.title("Executador de Mutations do Pipefy")
 
 # Campo para o Bearer Token
@@ -122,25 +89,85 @@ mutation_query = st.text_area("Cole sua query GraphQL completa aqui", height=300
 # Tamanho do lote (alterando o valor padrão para 25)
 batch_size = st.slider("Selecione o tamanho do lote de mutations (Sub-Lote)", min_value=1, max_value=50, value=25)
 
+# Mutations por sub-lote no gerador a partir de planilhas (sem o ajuste abaixo, que é do partition_query)
+mutations_per_batch = batch_size
+
 # MM - dobro o tamanho batch_size para corrigir mecânica.
 batch_size = 2 * batch_size
 
 # NOVO CAMPO: Tempo de pausa entre sub-lotes
 delay_time = st.slider("Tempo de Pausa (segundos) entre sub-lotes", min_value=0.0, max_value=5.0, value=0.5, step=0.1, key='delay_time_slider')
 
-# Criar o componente vazio para o log e armazená-lo na session_state
-# Isso é necessário para que a função update_log possa acessá-lo.
+# Gerador de mutations a partir de uma planilha: cada linha vira uma mutation do modelo
+with st.expander("Gerar mutations a partir de uma planilha (CSV/Excel)"):
+    st.markdown("Cada linha da planilha vira uma mutation do modelo: **$coluna$** é trocado pelo valor da coluna "
+                "(ex: colunas card_id, field_id e value, ou card_id e phase_id).")
+    uploaded_rows = st.file_uploader("Planilha com as linhas (CSV ou Excel)", type=["csv", "xlsx"], key="mutation_rows_file")
+    template_name = st.selectbox("Modelo da mutation", list(MUTATION_TEMPLATES) + ["Personalizado"], key="mutation_template_name")
+    mutation_template = st.text_area(
+        "Mutation de cada linha (use $coluna$ para os valores)",
+        value=MUTATION_TEMPLATES.get(template_name, ""),
+        key=f"mutation_template_{template_name}"
+    )
+
+    rows = None
+    if uploaded_rows is not None:
+        try:
+            rows = load_uploaded_rows(uploaded_rows)
+            st.caption(f"{len(rows)} linhas ({', '.join(rows.columns)}) · "
+                       f"{count_mutation_batches(rows, mutations_per_batch)} sub-lotes de até {mutations_per_batch} mutations.")
+        except Exception as e:
+            st.error(f"Não foi possível ler a planilha: {e}")
+
+    col_preview, col_run = st.columns(2)
+    with col_preview:
+        preview_rows = st.button("Mostrar Preview da Planilha")
+    with col_run:
+        run_rows = st.button("Iniciar Execução da Planilha")
+
+    if (preview_rows or run_rows) and (rows is None or not mutation_template.strip()):
+        st.warning("Por favor, envie a planilha e preencha o modelo da mutation.")
+    elif preview_rows:
+        with track_action("preview_generated") as action:
+            try:
+                batches = generate_mutation_batches(rows, mutation_template, mutations_per_batch)
+                # Só os primeiros sub-lotes são gerados para o preview
+                for i, sub_lote in zip(range(3), batches):
+                    with st.expander(f"Sub-Lote {i + 1}"):
+                        st.code(sub_lote, language='graphql')
+                action.add_rows(min(3, count_mutation_batches(rows, mutations_per_batch)))
+            except ValueError as e:
+                action.mark_error()
+                st.error(str(e))
+    elif run_rows:
+        if not bearer_token:
+            st.error("Por favor, preencha o Bearer Token!")
+        elif job_is_active("execution_job"):
+            st.warning("Já existe uma execução em andamento nesta sessão. Aguarde ou cancele antes de iniciar outra.")
+        else:
+            try:
+                # Confere colunas e IDs antes de submeter o job
+                prepare_mutation_rows(rows, mutation_template)
+                st.session_state.pop('log', None)
+                submit_job("execution_job", execute_generated_job, bearer_token, rows, mutation_template,
+                           mutations_per_batch, delay_time, label="Execução das mutations da planilha")
+            except ValueError as e:
+                st.error(str(e))
+
+# Componente do log de execução (preenchido no final da página)
 log_placeholder = st.empty()
-st.session_state['log_placeholder'] = log_placeholder
 
 # Botão para processar e mostrar todos os previews
 if st.button("Mostrar Preview"):
     if mutation_query:
-        try:
-            super_lotes = partition_query(mutation_query, batch_size)
-            show_all_previews(super_lotes)
-        except Exception as e:
-             st.error(f"Erro ao processar a query: {e}. Verifique a sintaxe da sua query.")
+        with track_action("preview") as action:
+            try:
+                super_lotes = partition_query(mutation_query, batch_size)
+                show_all_previews(super_lotes)
+                action.add_rows(sum(len(batch) for batch in super_lotes))
+            except Exception as e:
+                 action.mark_error()
+                 st.error(f"Erro ao processar a query: {e}. Verifique a sintaxe da sua query.")
     else:
         st.warning("Por favor, cole sua query GraphQL completa.")
 
@@ -150,23 +177,21 @@ if st.button("Iniciar Execução"):
     if not bearer_token or not mutation_query:
         st.error("Por favor, preencha o Bearer Token e a Query!")
     else:
-        update_log("Iniciando execução...")
-        
-        try:
-            super_lotes = partition_query(mutation_query, batch_size)
-            
+        if job_is_active("execution_job"):
+            st.warning("Já existe uma execução em andamento nesta sessão. Aguarde ou cancele antes de iniciar outra.")
+        else:
+            st.session_state.pop('log', None)
             # Passando o delay_time para a função de execução
-            execute_batches(bearer_token, super_lotes, delay_time)
-            
-        except Exception as e:
-             update_log(f"ERRO CRÍTICO NA EXECUÇÃO: {e}")
-             st.error(f"Erro crítico: {e}")
+            submit_job("execution_job", execute_batches_job, bearer_token, mutation_query, batch_size, delay_time, label="Execução das mutations")
+
+# Progresso da execução em segundo plano (com o log ao vivo e o botão de cancelar)
+render_job_panel("execution_job", store_execution_log, show_logs=True)
 
 
 # Exibição do log (dinâmico e atualizado)
 if 'log' in st.session_state:
     log_text = "\n".join(st.session_state['log'])
-    # Usa o placeholder para atualização final (o update_log cuida das atualizações intermediárias)
-    st.session_state['log_placeholder'].text_area("Log de Execução", value=log_text, height=300, max_chars=None, key=f"log_area_final", disabled=True)
-else:
-    st.session_state['log_placeholder'].text_area("Log de Execução", value="Nenhum log gerado ainda.", height=300, max_chars=None, key=f"log_area_init", disabled=True)
+    log_placeholder.text_area("Log de Execução", value=log_text, height=300, max_chars=None, key=f"log_area_final", disabled=True)
+elif "execution_job" not in st.session_state:
+    # Enquanto há um job (ou após uma falha/cancelamento), o log aparece no painel do job
+    log_placeholder.text_area("Log de Execução", value="Nenhum log gerado ainda.", height=300, max_chars=None, key=f"log_area_init", disabled=True)
@@ -0,0 +1,224 @@
+import csv
+import io
+import json
+import re
+import time
+
+import requests
+
+from toolbox_common.metrics import record_api_call
+from toolbox_common.pipefy_transport import post_graphql
+
+# Função para fazer a requisição GraphQL
+def execute_graphql_mutation(bearer_token, mutation_query):
+    started = time.perf_counter()
+    try:
+        response = post_graphql({"query": mutation_query}, bearer_token)
+    except requests.exceptions.RequestException:
+        record_api_call("pipefy", None, time.perf_counter() - started)
+        raise
+    record_api_call("pipefy", response.status_code, time.perf_counter() - started)
+    return response
+
+# Função para dividir a query em super-lotes e sub-lotes
+def partition_query(mutation_query, batch_size):
+    # Dividir em mutações completas por "mutation{ ... }"
+    queries = mutation_query.strip().split('mutation{')[1:]
+    
+    super_lotes = []
+    
+    # Para cada query completa, dividir em sub-lotes
+    for query in queries:
+        query_parts = query.strip().split("}")
+        query_parts = [part.strip() + "}" for part in query_parts if part.strip()]
+        
+        # Dividir em sub-lotes, com base no tamanho do lote
+        query_batches = [f"mutation{{{' '.join(query_parts[i:i + batch_size])}}}" for i in range(0, len(query_parts), batch_size)]
+        
+        super_lotes.append(query_batches)
+    
+    return super_lotes
+
+# Modelos de mutation do gerador a partir de planilhas: cada $coluna$ é trocado pelo
+# valor da coluna em cada linha. Entre aspas, o valor é escapado; fora delas, só são
+# aceitos IDs (letras, números, "_", "-" e ".")
+MUTATION_TEMPLATES = {
+    "Atualizar campo do card (card_id, field_id, value)":
+        'updateCardField(input: {card_id: $card_id$, field_id: "$field_id$", new_value: "$value$"}) { success }',
+    "Mover card de fase (card_id, phase_id)":
+        'moveCardToPhase(input: {card_id: $card_id$, destination_phase_id: $phase_id$}) { card { id } }',
+}
+TEMPLATE_PLACEHOLDER = re.compile(r"\$(\w+)\$")
+UNQUOTED_VALUE_PATTERN = r"[\w.-]+"
+# Caracteres de controle que não podem aparecer em um texto GraphQL (além de \n, \r e \t, que são escapados)
+CONTROL_CHARS_PATTERN = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+# Separadores aceitos nos CSVs do gerador (detectados no início do arquivo; "," se nenhum for detectado)
+CSV_DELIMITERS = ",;\t"
+
+# Detecta o separador do CSV entre CSV_DELIMITERS (uma planilha de uma coluna só fica com ",")
+def sniff_csv_delimiter(sample):
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+# Lê a planilha do gerador (CSV, com separador detectado, ou Excel): todas as colunas
+# como texto, com os nomes sem espaços nas bordas e em minúsculas
+def read_mutation_rows(uploaded_file, file_name):
+    import pandas as pd
+
+    if file_name.lower().endswith(".xlsx"):
+        rows = pd.read_excel(uploaded_file, dtype=str).fillna("")
+    else:
+        content = uploaded_file.read()
+        if isinstance(content, bytes):
+            content = content.decode("utf-8-sig")
+        delimiter = sniff_csv_delimiter(content[:64 * 1024])
+        rows = pd.read_csv(io.StringIO(content), dtype=str, keep_default_na=False, sep=delimiter)
+    rows.columns = [str(column).strip().lower() for column in rows.columns]
+    return rows.reset_index(drop=True)
+
+# Separa o modelo em trechos fixos e colunas: ("text", trecho) e ("column", nome, entre aspas)
+def parse_mutation_template(template):
+    segments = []
+    cursor = 0
+    for match in TEMPLATE_PLACEHOLDER.finditer(template):
+        segments.append(("text", template[cursor:match.start()]))
+        # Os trechos fixos antes da coluna abrem (e fecham) as aspas: um número ímpar delas
+        # indica que a coluna está dentro de um texto
+        quoted = template[:match.start()].replace('\\"', "").count('"') % 2 == 1
+        segments.append(("column", match.group(1).lower(), quoted))
+        cursor = match.end()
+    segments.append(("text", template[cursor:]))
+    return [segment for segment in segments if segment != ("text", "")]
+
+# Escapa, de uma vez para a coluna inteira (Series do pandas), os valores que vão entre aspas
+def escape_graphql_strings(values):
+    return (
+        values.astype(str)
+        .str.replace("\\", "\\\\", regex=False)
+        .str.replace('"', '\\"', regex=False)
+        .str.replace("\n", "\\n", regex=False)
+        .str.replace("\r", "\\r", regex=False)
+        .str.replace("\t", "\\t", regex=False)
+        .str.replace(CONTROL_CHARS_PATTERN, "", regex=True)
+    )
+
+# Confere as linhas da planilha para o modelo e prepara (escapa ou valida) cada coluna usada
+# Levanta ValueError com as colunas ausentes ou as linhas com IDs inválidos
+# Retorna (trechos do modelo, coluna -> valores prontos)
+def prepare_mutation_rows(rows, template):
+    segments = parse_mutation_template(template)
+    columns = {segment[1]: segment[2] for segment in segments if segment[0] == "column"}
+    if not columns:
+        raise ValueError("O modelo não usa nenhuma coluna da planilha ($coluna$).")
+    missing = [column for column in columns if column not in rows.columns]
+    if missing:
+        raise ValueError(f"Colunas ausentes na planilha: {', '.join(missing)}. Colunas encontradas: {', '.join(rows.columns)}.")
+
+    prepared = {}
+    for segment in segments:
+        if segment[0] != "column" or (segment[1], segment[2]) in prepared:
+            continue
+        column, quoted = segment[1], segment[2]
+        if quoted:
+            prepared[(column, quoted)] = escape_graphql_strings(rows[column])
+            continue
+        values = rows[column].astype(str).str.strip()
+        invalid = ~values.str.fullmatch(UNQUOTED_VALUE_PATTERN)
+        if invalid.any():
+            # Linha 1 da planilha é o cabeçalho
+            lines = ", ".join(str(position + 2) for position in rows.index[invalid][:10])
+            raise ValueError(f"Valores inválidos na coluna {column} (linhas {lines} da planilha): fora de aspas, "
+                             "o modelo só aceita IDs (letras, números, _, - e .).")
+        prepared[(column, quoted)] = values
+    return segments, prepared
+
+# Quantidade de sub-lotes que o gerador produz para a planilha
+def count_mutation_batches(rows, batch_size):
+    return -(-len(rows) // batch_size)
+
+# Gera os sub-lotes de mutations da planilha, um de cada vez: cada sub-lote é um
+# "mutation{ ... }" com `batch_size` linhas, com aliases que indicam a linha da planilha
+# (linha_2, linha_3, ...). A mutation de cada linha é montada com operações do pandas
+# sobre as colunas inteiras; os sub-lotes só são juntados quando pedidos, sem nunca
+# montar um texto com todas as linhas
+# Levanta ValueError (ver prepare_mutation_rows) antes de gerar o primeiro sub-lote
+def generate_mutation_batches(rows, template, batch_size):
+    rows = rows.reset_index(drop=True)
+    segments, prepared = prepare_mutation_rows(rows, template)
+    lines = "linha_" + (rows.index + 2).astype(str).to_series(index=rows.index) + ": "
+    for segment in segments:
+        if segment[0] == "text":
+            lines = lines + segment[1]
+        else:
+            lines = lines + prepared[(segment[1], segment[2])]
+    return _mutation_batches(lines.tolist(), batch_size)
+
+def _mutation_batches(lines, batch_size):
+    for start in range(0, len(lines), batch_size):
+        yield "mutation{ " + " ".join(lines[start:start + batch_size]) + " }"
+
+# Função para executar os sub-lotes com razão de progresso
+# Agora aceita 'delay_time' para pausar entre as requisições
+# 'super_lotes' pode conter geradores de sub-lotes (ex: generate_mutation_batches), desde
+# que 'total_sub_lotes' seja informado
+# 'log' recebe cada mensagem de progresso (na interface, é o log do job em segundo plano)
+# 'on_progress' (opcional) recebe (sub-lotes executados, total) após cada sub-lote
+# 'should_cancel' (opcional) é consultada antes de cada sub-lote; se retornar True, a execução para
+# Retorna a quantidade de sub-lotes executados
+def execute_batches(bearer_token, super_lotes, delay_time, log=print, on_progress=None, should_cancel=None,
+                    total_sub_lotes=None):
+    if total_sub_lotes is None:
+        total_sub_lotes = sum(len(batch) for batch in super_lotes)  # Total de sub-lotes
+    executed_sub_lotes = 0  # Contador de sub-lotes executados
+
+    for i, query_batches in enumerate(super_lotes):
+        # Iniciar execução do Super-Lote
+        log(f"\n{'-'*40}\nIniciando execução do Super-Lote {i + 1}\n{'-'*40}\n")
+        
+        for idx, batch in enumerate(query_batches):
+            if should_cancel is not None and should_cancel():
+                log(f"Execução cancelada após {executed_sub_lotes}/{total_sub_lotes} sub-lotes.")
+                return executed_sub_lotes
+
+            executed_sub_lotes += 1  # Incrementa o contador de sub-lotes executados
+            
+            # Calcular a porcentagem de conclusão
+            progress = (executed_sub_lotes / total_sub_lotes) * 100
+            
+            # Exibir o progresso
+            log(f"Sub-Lote {i + 1}-{idx + 1} : Iniciando execução ...")
+            log(f"Progresso: {executed_sub_lotes}/{total_sub_lotes} ({progress:.2f}%)")
+            
+            response = execute_graphql_mutation(bearer_token, batch)
+            
+            # --- VERIFICAÇÃO DE ERRO MELHORADA ---
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                    if "errors" in data:
+                        # Erro de GraphQL detectado (operação falhou, mas HTTP foi 200)
+                        error_message = json.dumps(data["errors"], indent=2)
+                        log(f"Sub-Lote {i + 1}-{idx + 1} : Erro de GraphQL (Status 200) - {error_message}")
+                    else:
+                        # Execução bem-sucedida
+                        log(f"Sub-Lote {i + 1}-{idx + 1} : Executado com sucesso!")
+                except json.JSONDecodeError:
+                    # Resposta não é JSON, o que pode indicar um problema inesperado no Pipefy
+                    log(f"Sub-Lote {i + 1}-{idx + 1} : Erro - Resposta HTTP 200, mas corpo inesperado ou não JSON: {response.text}")
+
+            else:
+                # Erro HTTP tradicional (4xx, 5xx, etc.)
+                log(f"Sub-Lote {i + 1}-{idx + 1} : Erro HTTP ({response.status_code}) - {response.text}")
+
+            if on_progress is not None:
+                on_progress(executed_sub_lotes, total_sub_lotes)
+            
+            # Pausa configurável para evitar sobrecarga (controle de rate-limit)
+            if delay_time > 0:
+                log(f"Pausando por {delay_time}s...")
+                time.sleep(delay_time) 
+
+    return executed_sub_lotes
@@ -0,0 +1,354 @@
+"""
+Micro-benchmarks das análises de texto (character_counter/text_engine.py) e da
+geração e validação de senhas (password_and_hash_2025/password_engine.py).
+
+Mede cada cenário em vários tamanhos (textos de 1 KB a 50 MB e lotes de 10 a
+100 mil senhas), opcionalmente com profiling (cProfile ou pyinstrument), e
+compara o resultado com uma linha de base gravada para acusar regressões.
+
+Uso:
+    python benchmarks/engine_benchmarks.py
+    python benchmarks/engine_benchmarks.py --text-sizes 1KB 1MB 50MB --password-counts 10 1000 --bcrypt-rounds 4
+    python benchmarks/engine_benchmarks.py --save-baseline benchmarks/baselines/engines.json
+    python benchmarks/engine_benchmarks.py --baseline benchmarks/baselines/engines.json --tolerance 0.25
+    python benchmarks/engine_benchmarks.py --scenarios char_analysis --profile cprofile
+"""
+import argparse
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import random
+import re
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (
+    os.path.join(ROOT_DIR, "character_counter"),
+    os.path.join(ROOT_DIR, "password_and_hash_2025"),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import text_engine  # noqa: E402
+import password_engine  # noqa: E402
+
+# Cenários que geram uma linha de tabela por caractere: acima deste tamanho o
+# consumo de memória passa de alguns GB, então são pulados (ver --no-limits)
+ROW_PER_CHAR_MAX_SIZE = 5 * 1024 * 1024
+
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(B|KB|MB|GB)?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+WORDS = [
+    "ana", "joão", "análise", "caractere", "ação", "relatório", "pipefy", "de", "da", "dos",
+    "em", "e", "d'ávila", "NOME", "Ímpar", "coração", "çedilha", "über", "niño", "123",
+]
+SEPARATORS = [" ", " ", " ", " ", "  ", " ", ", ", ". ", "! ", "? ", "\n", "\n\n", "\u00a0", "\u200b "]
+
+
+def parse_size(value):
+    """
+    Converte tamanhos como "1KB", "50MB" ou "2048" em quantidade de caracteres.
+
+    Raises:
+        argparse.ArgumentTypeError: Se o formato for inválido.
+    """
+    match = SIZE_PATTERN.match(value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Tamanho inválido: {value!r} (use, por exemplo, 1KB, 100KB, 50MB)")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[(unit or "B").upper()])
+
+
+def format_size(size):
+    for unit in ("GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def make_text(size, seed=42):
+    """
+    Gera um texto determinístico com `size` caracteres: palavras acentuadas,
+    pontuação, quebras de linha e parágrafos, espaços repetidos e espaços não
+    separáveis (para exercitar todas as regras de limpeza).
+    """
+    rnd = random.Random(seed)
+    parts = []
+    length = 0
+    # Um bloco de até 64 KB repetido até o tamanho pedido (gerar 50 MB palavra a palavra seria lento)
+    block_size = min(size, 64 * 1024)
+    while length < block_size:
+        part = rnd.choice(WORDS) + rnd.choice(SEPARATORS)
+        parts.append(part)
+        length += len(part)
+    block = "".join(parts)
+    return (block * (size // len(block) + 1))[:size]
+
+
+def shifted_copy(text, seed=7):
+    """
+    Cópia do texto com algumas diferenças (troca de letras e um espaço a mais),
+    para o cenário de comparação.
+    """
+    rnd = random.Random(seed)
+    chars = list(text)
+    for _ in range(max(len(chars) // 1000, 1)):
+        position = rnd.randrange(len(chars))
+        chars[position] = "x" if chars[position] != "x" else "y"
+    middle = len(chars) // 2
+    return "".join(chars[:middle]) + " " + "".join(chars[middle:])
+
+
+def make_people_csv(count):
+    return "\n".join(f"{100000000 + i};{WORDS[i % len(WORDS)].capitalize()} Silva" for i in range(count))
+
+
+def make_passwords_csv(count):
+    return "\n".join(f"{100000000 + i};Senha{i:06d}" for i in range(count))
+
+
+def make_validation_csv(count, rounds):
+    # Um único hash para todas as linhas: a preparação não precisa custar `count` hashes
+    senha = "Senha000000"
+    hash_senha = password_engine.hash_password(senha, rounds)
+    lines = []
+    for i in range(count):
+        # Metade das linhas com a senha correta, metade com senha errada
+        lines.append(f"{100000000 + i};{senha if i % 2 == 0 else 'SenhaErrada'};{hash_senha}")
+    return "\n".join(lines)
+
+
+def _silent(message):
+    pass
+
+
+# Cada cenário: (grupo, preparação(tamanho, args) -> entrada, execução(entrada, args) -> itens processados)
+SCENARIOS = {
+    "basic_counts": ("text", lambda size, args: make_text(size),
+                     lambda text, args: text_engine.basic_counts(text)["chars"]),
+    "word_frequency": ("text", lambda size, args: make_text(size),
+                       lambda text, args: len(text_engine.word_frequency(text))),
+    "letter_frequency": ("text", lambda size, args: make_text(size),
+                         lambda text, args: len(text_engine.letter_frequency(text))),
+    "char_analysis": ("text", lambda size, args: make_text(size),
+                      lambda text, args: len(text_engine.analyze_chars(text))),
+    "char_comparison": ("text", lambda size, args: (make_text(size), shifted_copy(make_text(size))),
+                        lambda texts, args: len(text_engine.compare_texts(*texts))),
+    "text_cleanup": ("text", lambda size, args: make_text(size),
+                     lambda text, args: len(text_engine.clean_text(text, True, True, True, True))),
+    "generate_password": ("password", lambda count, args: make_people_csv(count),
+                          lambda csv_input, args: len(password_engine.process_data_generate_password(
+                              csv_input, rounds=args.bcrypt_rounds, report_error=_silent))),
+    "generate_hash": ("password", lambda count, args: make_passwords_csv(count),
+                      lambda csv_input, args: len(password_engine.process_data_generate_hash(
+                          csv_input, rounds=args.bcrypt_rounds, report_error=_silent))),
+    "validate_access": ("password", lambda count, args: make_validation_csv(count, args.bcrypt_rounds),
+                        lambda csv_input, args: len(password_engine.process_data_validate_access(
+                            csv_input, report_error=_silent))),
+}
+ROW_PER_CHAR_SCENARIOS = {"char_analysis", "char_comparison"}
+
+
+def profile_run(name, size_label, run, data, args):
+    """
+    Executa o cenário mais uma vez sob o profiler escolhido e grava o relatório
+    em --profile-dir.
+
+    Returns:
+        str: O caminho do relatório gravado.
+    """
+    os.makedirs(args.profile_dir, exist_ok=True)
+    stem = os.path.join(args.profile_dir, f"{name}_{size_label}")
+    if args.profile == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        run(data, args)
+        profiler.stop()
+        path = f"{stem}.html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        return path
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    run(data, args)
+    profiler.disable()
+    profiler.dump_stats(f"{stem}.prof")
+    # Também um resumo em texto (as 25 funções com maior tempo acumulado)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(25)
+    path = f"{stem}.txt"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+    return path
+
+
+def run_scenario(name, size, args):
+    """
+    Executa um cenário `args.repeat` vezes (após uma execução de aquecimento).
+
+    Returns:
+        dict: Tempo (mediana e mínimo), vazão e itens processados.
+    """
+    group, prepare, run = SCENARIOS[name]
+    data = prepare(size, args)
+    items = run(data, args)  # aquecimento (imports tardios, caches do regex)
+    durations = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        items = run(data, args)
+        durations.append(time.perf_counter() - started)
+
+    seconds = statistics.median(durations)
+    size_label = format_size(size) if group == "text" else str(size)
+    result = {
+        "scenario": name,
+        "group": group,
+        "size": size,
+        "size_label": size_label,
+        "items": items,
+        "seconds": seconds,
+        "min_seconds": min(durations),
+        # Textos: MB/s; senhas: linhas/s
+        "throughput": (size / SIZE_UNITS["MB"] if group == "text" else size) / seconds if seconds else None,
+        "throughput_unit": "MB/s" if group == "text" else "linhas/s",
+    }
+    if args.profile:
+        result["profile"] = profile_run(name, size_label, run, data, args)
+    return result
+
+
+def baseline_key(result):
+    return f"{result['scenario']}:{result['size']}"
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compara cada resultado com a linha de base (pelo tempo mediano).
+
+    Returns:
+        list: As regressões (resultados mais lentos que a base além da tolerância).
+    """
+    regressions = []
+    for result in results:
+        base = baseline["results"].get(baseline_key(result))
+        if base is None:
+            continue
+        result["baseline_seconds"] = base["seconds"]
+        result["change"] = result["seconds"] / base["seconds"] - 1 if base["seconds"] else None
+        if result["change"] is not None and result["change"] > tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def print_results(results):
+    header = f"{'cenário':<20}{'tamanho':>10}{'itens':>11}{'tempo (s)':>12}{'mín (s)':>10}{'vazão':>18}  {'vs. base':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r.get("skipped"):
+            print(f"{r['scenario']:<20}{r['size_label']:>10}  (pulado: {r['skipped']})")
+            continue
+        change = f"{r['change']:+.0%}" if r.get("change") is not None else "-"
+        throughput = f"{r['throughput']:.1f} {r['throughput_unit']}" if r["throughput"] else "-"
+        print(
+            f"{r['scenario']:<20}{r['size_label']:>10}{r['items']:>11}{r['seconds']:>12.4f}{r['min_seconds']:>10.4f}"
+            f"{throughput:>18}  {change:>9}"
+        )
+        if r.get("profile"):
+            print(f"{'':<20}profile: {r['profile']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das análises de texto e do gerador de senhas.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--text-sizes", nargs="+", type=parse_size, default=[parse_size(s) for s in ("1KB", "100KB", "1MB")],
+                        help="Tamanhos dos textos (ex: 1KB 100KB 1MB 10MB 50MB).")
+    parser.add_argument("--password-counts", nargs="+", type=int, default=[10, 100],
+                        help="Quantidade de senhas por lote (ex: 10 1000 100000).")
+    parser.add_argument("--bcrypt-rounds", type=int, default=password_engine.BCRYPT_ROUNDS,
+                        help="Custo do BCrypt (o app usa 10; valores menores viabilizam lotes grandes).")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções medidas por cenário (o tempo reportado é a mediana).")
+    parser.add_argument("--no-limits", action="store_true",
+                        help=f"Não pula os cenários de uma linha por caractere acima de {format_size(ROW_PER_CHAR_MAX_SIZE)}.")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="Grava um profile de cada cenário.")
+    parser.add_argument("--profile-dir", default="profiles", help="Pasta dos relatórios de profiling.")
+    parser.add_argument("--save-baseline", metavar="ARQUIVO", help="Grava os resultados como linha de base.")
+    parser.add_argument("--baseline", metavar="ARQUIVO", help="Compara com uma linha de base gravada.")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="Aumento de tempo aceito em relação à base antes de acusar regressão (0.20 = 20%%).")
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados.")
+    args = parser.parse_args()
+
+    if args.profile == "pyinstrument":
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError:
+            parser.error("pyinstrument não está instalado (pip install pyinstrument); use --profile cprofile")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = []
+    for name in args.scenarios:
+        group = SCENARIOS[name][0]
+        for size in (args.text_sizes if group == "text" else args.password_counts):
+            if name in ROW_PER_CHAR_SCENARIOS and size > ROW_PER_CHAR_MAX_SIZE and not args.no_limits:
+                results.append({"scenario": name, "size": size, "size_label": format_size(size),
+                                "skipped": f"acima de {format_size(ROW_PER_CHAR_MAX_SIZE)}, use --no-limits"})
+                continue
+            results.append(run_scenario(name, size, args))
+
+    measured = [r for r in results if not r.get("skipped")]
+    regressions = compare_with_baseline(measured, baseline, args.tolerance) if baseline else []
+    print_results(results)
+
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "repeat": args.repeat,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        # Uma base parcial (menos cenários ou tamanhos) não apaga as medições já gravadas
+        saved = {"results": {}}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, encoding="utf-8") as f:
+                saved = json.load(f)
+        saved["meta"] = meta
+        for r in measured:
+            saved["results"][baseline_key(r)] = {"seconds": r["seconds"], "items": r["items"]}
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nLinha de base gravada em {args.save_baseline}")
+
+    if baseline:
+        if baseline.get("meta", {}).get("machine") != meta["machine"] or baseline.get("meta", {}).get("python") != meta["python"]:
+            print("\nAtenção: a linha de base foi gravada em outro ambiente; compare com cautela.")
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.tolerance:.0%}:")
+            for r in regressions:
+                print(f"  {r['scenario']} ({r['size_label']}): {r['baseline_seconds']:.4f}s -> {r['seconds']:.4f}s ({r['change']:+.0%})")
+            sys.exit(1)
+        print(f"\n✅ Nenhuma regressão acima de {args.tolerance:.0%} em relação a {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
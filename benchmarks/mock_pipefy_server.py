@@ -0,0 +1,192 @@
+"""
+Servidor GraphQL local que imita a API do Pipefy, para benchmarks reproduzíveis.
+
+Os dados vêm do PipefyDataModel (toolbox_common/pipefy_fake.py), o mesmo
+modelo usado pelo transporte em memória; este servidor acrescenta a camada
+HTTP, com latência, limite de requisições e taxa de erros configuráveis.
+
+Uso isolado:
+    python benchmarks/mock_pipefy_server.py --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from toolbox_common.pipefy_fake import PipefyDataModel  # noqa: E402
+
+
+class MockConfig:
+    """
+    Parâmetros da simulação.
+
+    Args:
+        latency_ms (float): Latência média de cada resposta.
+        jitter_ms (float): Variação máxima (para mais ou para menos) da latência.
+        error_rate (float): Fração das requisições que recebem HTTP 503.
+        rate_limit (float): Requisições por segundo aceitas (0 = sem limite);
+            o excesso recebe HTTP 429 com Retry-After.
+        fan_out (int): Cards conectados (pais e filhos) de cada card.
+        pipes (int): Quantidade de pipes simulados.
+        pipe_size (int): Cards por pipe na conexão paginada.
+        max_page_size (int): Tamanho máximo de página aceito em `first`.
+        seed (int): Semente do gerador aleatório (latência e erros).
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0.0, fan_out=3,
+                 pipes=20, pipe_size=1000, max_page_size=50, seed=42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.fan_out = fan_out
+        self.pipes = pipes
+        self.pipe_size = pipe_size
+        self.max_page_size = max_page_size
+        self.seed = seed
+
+
+class MockStats:
+    """
+    Registra as requisições atendidas (status e tempo de resposta no servidor).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latencies = []
+            self.statuses = {}
+            self.bytes_sent = 0
+
+    def record(self, status, latency_seconds, size):
+        with self._lock:
+            self.latencies.append(latency_seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.bytes_sent += size
+
+    def snapshot(self):
+        with self._lock:
+            return {"latencies": list(self.latencies), "statuses": dict(self.statuses), "bytes_sent": self.bytes_sent}
+
+
+class MockPipefyServer:
+    """
+    Servidor HTTP em uma thread daemon, no endereço `url` (POST /graphql).
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.model = PipefyDataModel(self.config.fan_out, self.config.pipes, self.config.pipe_size, self.config.max_page_size)
+        self.stats = MockStats()
+        self._random = random.Random(self.config.seed)
+        self._random_lock = threading.Lock()
+        self._tokens = float(self.config.rate_limit)
+        self._last_refill = time.monotonic()
+        self._bucket_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def _allow_request(self):
+        # Balde de fichas: até `rate_limit` requisições por segundo (com rajada do mesmo tamanho)
+        if not self.config.rate_limit:
+            return True
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(self.config.rate_limit, self._tokens + (now - self._last_refill) * self.config.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _simulated_delay(self):
+        with self._random_lock:
+            jitter = self._random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+            fail = self._random.random() < self.config.error_rate
+        return max(self.config.latency_ms + jitter, 0) / 1000, fail
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                started = time.perf_counter()
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                delay, fail = server._simulated_delay()
+                time.sleep(delay)
+                headers = {}
+                if not server._allow_request():
+                    status, body = 429, {"errors": [{"message": "Too many requests"}]}
+                    headers["Retry-After"] = "1"
+                elif fail:
+                    status, body = 503, {"errors": [{"message": "Service unavailable"}]}
+                else:
+                    status, body = 200, {"data": server.model.resolve(payload.get("query", ""), payload.get("variables"))}
+
+                encoded = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+                server.stats.record(status, time.perf_counter() - started, len(encoded))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-pipefy", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API GraphQL do Pipefy.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--fan-out", type=int, default=3)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.fan_out)
+    server = MockPipefyServer(config, args.host, args.port).start()
+    print(f"Mock do Pipefy em {server.url} (defina PIPEFY_API_URL={server.url} nas ferramentas)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
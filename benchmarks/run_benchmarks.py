@@ -0,0 +1,254 @@
+"""
+Benchmarks das ferramentas do Pipefy contra o servidor local (mock_pipefy_server.py).
+
+Mede, para cada cenário e tamanho de entrada: tempo total, vazão (itens por
+segundo), quantidade de requisições, latência das requisições (p50/p95/p99)
+e respostas de erro (429/503) recebidas.
+
+Com `--transport fake`, as requisições são respondidas em memória pelo
+FakeTransport (sem servidor HTTP), para medir só o processamento local.
+
+Uso:
+    python benchmarks/run_benchmarks.py --sizes 10 50 200 --latency-ms 50
+    python benchmarks/run_benchmarks.py --transport fake --sizes 1000 5000
+    python benchmarks/run_benchmarks.py --scenarios phase_report --output resultados.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (
+    ROOT_DIR,
+    os.path.join(ROOT_DIR, "report_generator_connected_cards__from_pipefy_card"),
+    os.path.join(ROOT_DIR, "Execute_multiple_mutations_on_pipefy"),
+    os.path.dirname(os.path.abspath(__file__)),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import pipefy_utils  # noqa: E402
+import mutation_utils  # noqa: E402
+from instrumentation import percentile  # noqa: E402
+from mock_pipefy_server import MockConfig, MockPipefyServer, MockStats  # noqa: E402
+from toolbox_common.pipefy_fake import PipefyDataModel  # noqa: E402
+from toolbox_common.pipefy_transport import FakeTransport, HttpTransport, set_transport  # noqa: E402
+from toolbox_common.pipefy_scheduler import TokenScheduler, set_scheduler  # noqa: E402
+
+TOKEN = "token-de-benchmark"
+QUERY_RUNNER_PAGE_SIZE = 50
+# Mesmo padrão da interface do executor (25 mutations por sub-lote, dobrado pelo partition_query)
+MUTATION_BATCH_SIZE = 2 * 25
+
+
+def card_ids_for(size):
+    return [str(1000 + i) for i in range(size)]
+
+
+def run_phase_report(size):
+    rows = pipefy_utils.generate_phase_report(card_ids_for(size), TOKEN, "Nenhum Filtro", True)
+    return len(rows)
+
+
+def run_mandatory_report(size):
+    rows = pipefy_utils.get_connected_cards_with_mandatory_fields(card_ids_for(size), TOKEN, True)
+    return len(rows)
+
+
+def run_final_phase_report(size):
+    rows = pipefy_utils.generate_final_phase_report(card_ids_for(size), TOKEN, "Mudança de Embarque", True)
+    return len(rows)
+
+
+def run_query_runner(size):
+    """
+    Simula o Query Runner: busca `size` cards paginados de um pipe e aplica a
+    extração de listas aninhadas e o flatten com subtabelas.
+    """
+    records = []
+    fetched = 0
+    after = ""
+    while fetched < size:
+        query = f"""
+        query {{
+          cards(pipe_id: "101", first: {min(QUERY_RUNNER_PAGE_SIZE, size - fetched)}, after: "{after}") {{
+            edges {{ node {{ id title parent_relations {{ name cards {{ id title pipe {{ id name }} current_phase {{ id name }} }} }} }} }}
+            pageInfo {{ hasNextPage endCursor }}
+          }}
+        }}
+        """
+        result = pipefy_utils.execute_graphql_query(query, TOKEN)
+        connection = result["data"]["cards"]
+        fetched += len(connection["edges"])
+        records.extend(pipefy_utils.extract_nested_lists(result.get("data", {})))
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        after = connection["pageInfo"]["endCursor"]
+
+    flattened_rows = []
+    for record in records:
+        flat, _ = pipefy_utils.flatten_record_with_lists(record, list_field_limit=6)
+        flattened_rows.append(flat)
+    return len(flattened_rows)
+
+
+def run_execute_batches(size):
+    mutations = " ".join(
+        f'm{i}: updateCardField(input: {{card_id: {1000 + i}, field_id: "campo", new_value: "valor {i}"}}) {{ success }}'
+        for i in range(size)
+    )
+    super_lotes = mutation_utils.partition_query(f"mutation{{ {mutations} }}", MUTATION_BATCH_SIZE)
+    mutation_utils.execute_batches(TOKEN, super_lotes, 0, log=lambda message: None)
+    return size
+
+
+def run_generate_mutations(size):
+    import pandas as pd
+
+    rows = pd.DataFrame({
+        "card_id": [str(1000 + i) for i in range(size)],
+        "field_id": ["campo"] * size,
+        "value": [f'valor "{i}"' for i in range(size)],
+    })
+    template = mutation_utils.MUTATION_TEMPLATES["Atualizar campo do card (card_id, field_id, value)"]
+    batches = mutation_utils.generate_mutation_batches(rows, template, MUTATION_BATCH_SIZE // 2)
+    total = mutation_utils.count_mutation_batches(rows, MUTATION_BATCH_SIZE // 2)
+    mutation_utils.execute_batches(TOKEN, [batches], 0, log=lambda message: None, total_sub_lotes=total)
+    return size
+
+
+SCENARIOS = {
+    "phase_report": run_phase_report,
+    "mandatory_report": run_mandatory_report,
+    "final_phase_report": run_final_phase_report,
+    "query_runner": run_query_runner,
+    "execute_batches": run_execute_batches,
+    "generate_mutations": run_generate_mutations,
+}
+
+
+class MeasuredTransport:
+    """
+    Envolve um transporte em memória registrando status e tempo de cada
+    requisição, como o servidor local faz no modo HTTP.
+    """
+
+    def __init__(self, inner, stats):
+        self.inner = inner
+        self.stats = stats
+
+    def post(self, payload, headers, timeout=None):
+        started = time.perf_counter()
+        response = self.inner.post(payload, headers, timeout)
+        self.stats.record(response.status_code, time.perf_counter() - started, len(response.content))
+        return response
+
+
+def reset_client_state():
+    # Cada medição começa sem pausas herdadas do disjuntor da medição anterior
+    pipefy_utils.circuit_breaker = pipefy_utils.CircuitBreaker()
+
+
+def run_scenario(stats, name, size, repeat):
+    """
+    Executa um cenário `repeat` vezes e resume as medições.
+
+    Returns:
+        dict: Tempo (mediana), vazão, requisições e latências das respostas.
+    """
+    durations = []
+    latencies = []
+    statuses = {}
+    requests_count = 0
+    items = 0
+    for _ in range(repeat):
+        reset_client_state()
+        stats.reset()
+        started = time.perf_counter()
+        items = SCENARIOS[name](size)
+        durations.append(time.perf_counter() - started)
+        snapshot = stats.snapshot()
+        latencies.extend(snapshot["latencies"])
+        requests_count += len(snapshot["latencies"])
+        for status, count in snapshot["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    wall = statistics.median(durations)
+    return {
+        "scenario": name,
+        "size": size,
+        "items": items,
+        "seconds": wall,
+        "throughput": size / wall if wall else None,
+        "requests": requests_count / repeat,
+        "latency_p50_ms": (percentile(latencies, 50) or 0) * 1000,
+        "latency_p95_ms": (percentile(latencies, 95) or 0) * 1000,
+        "latency_p99_ms": (percentile(latencies, 99) or 0) * 1000,
+        "errors": {str(status): count for status, count in statuses.items() if status != 200},
+    }
+
+
+def print_results(results):
+    header = f"{'cenário':<20}{'tamanho':>8}{'itens':>8}{'tempo (s)':>11}{'itens/s':>10}{'reqs':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  erros"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        errors = ", ".join(f"{status}: {count}" for status, count in r["errors"].items()) or "-"
+        print(
+            f"{r['scenario']:<20}{r['size']:>8}{r['items']:>8}{r['seconds']:>11.3f}{r['throughput']:>10.1f}"
+            f"{r['requests']:>7.0f}{r['latency_p50_ms']:>9.1f}{r['latency_p95_ms']:>9.1f}{r['latency_p99_ms']:>9.1f}  {errors}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks das ferramentas do Pipefy contra um servidor local.")
+    parser.add_argument("--transport", choices=["http", "fake"], default="http",
+                        help="http: servidor local; fake: respostas em memória, sem rede.")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por medição (o tempo reportado é a mediana).")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requisições por segundo aceitas pelo mock (0 = sem limite).")
+    parser.add_argument("--token-rate", type=float, default=0.0,
+                        help="Requisições por segundo do agendador por token (0 = sem limite, para medir só o cliente).")
+    parser.add_argument("--fan-out", type=int, default=3, help="Cards conectados de cada card no mock.")
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados.")
+    args = parser.parse_args()
+
+    set_scheduler(TokenScheduler(rate_per_second=args.token_rate))
+    server = None
+    if args.transport == "fake":
+        stats = MockStats()
+        set_transport(MeasuredTransport(FakeTransport(PipefyDataModel(args.fan_out), latency_ms=0), stats))
+        print("Transporte em memória (FakeTransport): sem rede, sem latência nem erros simulados\n")
+    else:
+        config = MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.fan_out)
+        server = MockPipefyServer(config).start()
+        stats = server.stats
+        set_transport(HttpTransport(server.url))
+        print(f"Mock do Pipefy em {server.url} (latência {args.latency_ms} ms ± {args.jitter_ms} ms, "
+              f"erros {args.error_rate:.0%}, limite {args.rate_limit or 'nenhum'} req/s)\n")
+
+    results = []
+    try:
+        for name in args.scenarios:
+            for size in args.sizes:
+                results.append(run_scenario(stats, name, size, args.repeat))
+    finally:
+        if server is not None:
+            server.stop()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
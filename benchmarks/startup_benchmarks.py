@@ -0,0 +1,102 @@
+"""
+Mede a partida de cada ferramenta Streamlit: o tempo até a primeira
+renderização da página (importações + primeira execução do script) e a
+memória (RSS máximo) do processo, cada uma em um processo Python novo,
+como acontece quando um contêiner sobe.
+
+Também lista quais módulos pesados (pandas, numpy, xlsxwriter, openpyxl,
+bcrypt) já foram carregados na primeira renderização, para verificar as
+importações tardias.
+
+Uso:
+    python benchmarks/startup_benchmarks.py
+    python benchmarks/startup_benchmarks.py --apps report_generator mutations --repeat 5
+    python benchmarks/startup_benchmarks.py --output partida.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    "lobby": "lobby",
+    "report_generator": "report_generator_connected_cards__from_pipefy_card",
+    "password": "password_and_hash_2025",
+    "mutations": "Execute_multiple_mutations_on_pipefy",
+    "character": "character_counter",
+}
+HEAVY_MODULES = ("pandas", "numpy", "xlsxwriter", "openpyxl", "bcrypt")
+
+# Executado em um processo novo, dentro da pasta da ferramenta
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "exceptions": len(at.exception),
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def measure_app(app_dir):
+    """
+    Sobe a ferramenta uma vez em um processo novo.
+
+    Returns:
+        dict: Segundos até a primeira renderização, RSS máximo (MB), exceções
+              na página e módulos pesados carregados.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH")]))
+    # O endpoint de métricas não faz parte da medição (e não pode disputar a porta)
+    env["TOOLBOX_METRICS_PORT"] = "0"
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT % (HEAVY_MODULES,)],
+        cwd=os.path.join(ROOT_DIR, app_dir), env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de partida e memória de cada ferramenta Streamlit.")
+    parser.add_argument("--apps", nargs="+", choices=sorted(APPS), default=list(APPS))
+    parser.add_argument("--repeat", type=int, default=3, help="Partidas por ferramenta (o tempo reportado é a mediana).")
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados.")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.apps:
+        runs = [measure_app(APPS[name]) for _ in range(args.repeat)]
+        results.append({
+            "app": name,
+            "seconds": statistics.median(run["seconds"] for run in runs),
+            "max_rss_mb": statistics.median(run["max_rss_mb"] for run in runs),
+            "exceptions": max(run["exceptions"] for run in runs),
+            "loaded": runs[-1]["loaded"],
+        })
+
+    header = f"{'ferramenta':<20}{'partida (s)':>12}{'RSS máx (MB)':>14}  módulos pesados carregados"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        warning = f"  ({r['exceptions']} exceções na página)" if r["exceptions"] else ""
+        print(f"{r['app']:<20}{r['seconds']:>12.2f}{r['max_rss_mb']:>14.1f}  {', '.join(r['loaded']) or '-'}{warning}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,68 @@
 import streamlit as st
-import re
-import pandas as pd
-from collections import Counter
 import io
+from toolbox_common.table_viewer import render_paginated_dataframe
+from toolbox_common.metrics import init_metrics, track_action
+from text_engine import basic_counts, word_frequency, letter_frequency, analyze_chars, compare_texts, clean_text
 
 st.set_page_config(layout="wide")
 
 # Título da aplicação
 st.set_page_config(page_title="Analisador de Strings", layout="wide")
+init_metrics("character_counter")
 st.title("Analisador de Strings")
 
+
+def store_table(state_key, df, file_stem, source):
+    """
+    Guarda uma tabela de análise no session_state, junto com as exportações e
+    o texto analisado (`source`).
+
+    Assim a paginação, a ordenação e os filtros (que reexecutam o script) não
+    perdem o resultado nem regeram os arquivos de exportação.
+    """
+    output = io.BytesIO()
+    df.to_excel(output, index=False)
+    st.session_state[state_key] = {
+        "df": df,
+        "csv": df.to_csv(index=False),
+        "excel": output.getvalue(),
+        "file_stem": file_stem,
+        "source": source,
+    }
+
+
+def render_stored_table(state_key, title, source):
+    """
+    Exibe (paginada) uma tabela guardada no session_state e seus botões de exportação.
+
+    Se o texto atual (`source`) não for mais o analisado, a tabela é
+    descartada: o resultado nunca fica na tela ao lado de outro texto.
+    """
+    stored = st.session_state.get(state_key)
+    if stored and stored["source"] != source:
+        del st.session_state[state_key]
+        return
+    if not stored:
+        return
+    st.write(title)
+    render_paginated_dataframe(stored["df"], key=f"{state_key}_table", use_container_width=True)
+
+    # Botões de download
+    st.download_button(
+        label="Exportar para CSV",
+        data=stored["csv"],
+        file_name=f"{stored['file_stem']}.csv",
+        mime="text/csv",
+        key=f"{state_key}_csv",
+    )
+    st.download_button(
+        label="Exportar para Excel",
+        data=stored["excel"],
+        file_name=f"{stored['file_stem']}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"{state_key}_excel",
+    )
+
 # Explicação da ferramenta
 st.write("Digite seu texto na caixa abaixo para obter contagens detalhadas e análises avançadas.")
 
@@ -22,32 +75,22 @@ text_input = st.text_area(
 
 # --- Contagens Básicas ---
 
-# Separadores para contagens
-sentences = re.split(r'[.!?]+', text_input)
-paragraphs = re.split(r'\n\n+', text_input)
-words = re.findall(r'\b\w+\b', text_input.lower())
-
-# Contagens simples
-char_count = len(text_input)
-word_count = len(words)
-line_count = len(text_input.split('\n'))
-sentence_count = len([s for s in sentences if s.strip()])
-paragraph_count = len([p for p in paragraphs if p.strip()])
-space_count = text_input.count(' ')
+# Contagens simples (a lógica das análises fica em text_engine.py)
+counts = basic_counts(text_input)
 
 st.markdown("---")
 st.subheader("Contagem de Atributos do Texto")
 
 # Exibição das contagens básicas
 col1, col2, col3 = st.columns(3)
-col1.metric("Caracteres", char_count)
-col2.metric("Palavras", word_count)
-col3.metric("Espaços", space_count)
+col1.metric("Caracteres", counts["chars"])
+col2.metric("Palavras", counts["words"])
+col3.metric("Espaços", counts["spaces"])
 
 col1, col2, col3 = st.columns(3)
-col1.metric("Linhas", line_count)
-col2.metric("Sentenças", sentence_count)
-col3.metric("Parágrafos", paragraph_count)
+col1.metric("Linhas", counts["lines"])
+col2.metric("Sentenças", counts["sentences"])
+col3.metric("Parágrafos", counts["paragraphs"])
 
 
 # --- Seção de Análises Avançadas ---
@@ -65,57 +108,22 @@ with st.container(border=True):
             if not text_input:
                 st.warning("Por favor, digite um texto para iniciar a análise.")
             else:
-                word_counts = Counter(words)
-                df_words = pd.DataFrame(word_counts.items(), columns=["Palavra", "Frequência"])
-                df_words = df_words.sort_values(by="Frequência", ascending=False).reset_index(drop=True)
-                st.write("### Frequência de Palavras")
-                st.dataframe(df_words, use_container_width=True)
-
-                # Botões de download
-                st.download_button(
-                    label="Exportar para CSV",
-                    data=df_words.to_csv(index=False),
-                    file_name="frequencia_palavras.csv",
-                    mime="text/csv",
-                )
-
-                output = io.BytesIO()
-                df_words.to_excel(output, index=False)
-                st.download_button(
-                    label="Exportar para Excel",
-                    data=output.getvalue(),
-                    file_name="frequencia_palavras.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                with track_action("word_frequency") as action:
+                    df_words = word_frequency(text_input)
+                    store_table("word_frequency", df_words, "frequencia_palavras", text_input)
+                    action.add_rows(len(df_words))
+        render_stored_table("word_frequency", "### Frequência de Palavras", text_input)
 
     with col2:
         if st.button("Analisar Frequência de Letras"):
             if not text_input:
                 st.warning("Por favor, digite um texto para iniciar a análise.")
             else:
-                letters = [c for c in text_input.lower() if c.isalpha()]
-                letter_counts = Counter(letters)
-                df_letters = pd.DataFrame(letter_counts.items(), columns=["Letra", "Frequência"])
-                df_letters = df_letters.sort_values(by="Frequência", ascending=False).reset_index(drop=True)
-                st.write("### Frequência de Letras")
-                st.dataframe(df_letters, use_container_width=True)
-
-                # Botões de download
-                st.download_button(
-                    label="Exportar para CSV",
-                    data=df_letters.to_csv(index=False),
-                    file_name="frequencia_letras.csv",
-                    mime="text/csv",
-                )
-
-                output = io.BytesIO()
-                df_letters.to_excel(output, index=False)
-                st.download_button(
-                    label="Exportar para Excel",
-                    data=output.getvalue(),
-                    file_name="frequencia_letras.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                with track_action("letter_frequency") as action:
+                    df_letters = letter_frequency(text_input)
+                    store_table("letter_frequency", df_letters, "frequencia_letras", text_input)
+                    action.add_rows(len(df_letters))
+        render_stored_table("letter_frequency", "### Frequência de Letras", text_input)
 
 # --------------------------
 # Análise Caractere por Caractere
@@ -123,44 +131,16 @@ with st.container(border=True):
 st.markdown("---")
 st.subheader("Análise Caractere por Caractere")
 
-def analyze_chars(text):
-    if not text:
-        return pd.DataFrame()
-    char_data = []
-    for char in text:
-        char_data.append({
-            "Caractere": char,
-            "Código Decimal": ord(char),
-            "Hexadecimal": hex(ord(char)),
-            "Octal": oct(ord(char)),
-            "URL Unicode": f"https://www.compart.com/en/unicode/U+{ord(char):04X}",
-        })
-    return pd.DataFrame(char_data)
-
 with st.container(border=True):
     if st.button("Gerar Análise Char a Char"):
         if not text_input:
             st.warning("Por favor, digite um texto para gerar a análise.")
         else:
-            df_chars = analyze_chars(text_input)
-            st.write("### Análise Char a Char do Texto")
-            st.dataframe(df_chars, use_container_width=True)
-
-            # Botões de download
-            st.download_button(
-                label="Exportar para CSV",
-                data=df_chars.to_csv(index=False),
-                file_name="analise_caracteres.csv",
-                mime="text/csv",
-            )
-            output = io.BytesIO()
-            df_chars.to_excel(output, index=False)
-            st.download_button(
-                label="Exportar para Excel",
-                data=output.getvalue(),
-                file_name="analise_caracteres.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            with track_action("char_analysis") as action:
+                df_chars = analyze_chars(text_input)
+                store_table("char_analysis", df_chars, "analise_caracteres", text_input)
+                action.add_rows(len(df_chars))
+    render_stored_table("char_analysis", "### Análise Char a Char do Texto", text_input)
 
 # --------------------------
 # Comparação de Textos
@@ -181,51 +161,11 @@ with st.container(border=True):
         if not text1 or not text2:
             st.warning("Por favor, insira ambos os textos para comparar.")
         else:
-            data = []
-            max_len = max(len(text1), len(text2))
-            shift_detected = False
-
-            for i in range(max_len):
-                char1 = text1[i] if i < len(text1) else ""
-                char2 = text2[i] if i < len(text2) else ""
-
-                # Check for "damaging" difference like extra space
-                if char1.isspace() != char2.isspace():
-                    shift_detected = True
-
-                difference = ""
-                if char1 != char2:
-                    difference = "Sim"
-
-                # Flag all subsequent characters if a damaging difference was found
-                if shift_detected and char1 != char2:
-                    difference = "Sim (deslocamento)"
-
-                data.append({
-                    "Posição": i,
-                    "Caractere 1": repr(char1),
-                    "Caractere 2": repr(char2),
-                    "Diferença": difference
-                })
-
-            df_comparison = pd.DataFrame(data)
-            st.write("### Tabela de Comparação de Caracteres")
-            st.dataframe(df_comparison, use_container_width=True)
-
-            st.download_button(
-                label="Exportar para CSV",
-                data=df_comparison.to_csv(index=False),
-                file_name="comparacao_caracteres.csv",
-                mime="text/csv",
-            )
-            output = io.BytesIO()
-            df_comparison.to_excel(output, index=False)
-            st.download_button(
-                label="Exportar para Excel",
-                data=output.getvalue(),
-                file_name="comparacao_caracteres.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            with track_action("char_comparison") as action:
+                df_comparison = compare_texts(text1, text2)
+                store_table("char_comparison", df_comparison, "comparacao_caracteres", (text1, text2))
+                action.add_rows(len(df_comparison))
+    render_stored_table("char_comparison", "### Tabela de Comparação de Caracteres", (text1, text2))
 
 # --------------------------
 # Limpeza e Normalização
@@ -244,40 +184,15 @@ with st.container(border=True):
         arrumar_nomes = st.checkbox("Arrumar para nomes", value=False)
 
     if st.button("Limpar e Normalizar Texto"):
-        cleaned_text = text_input
-
-        # Ajustar caracteres estranhos
-        if ajustar_estranhos:
-            cleaned_text = cleaned_text.replace('\u00A0', ' ').replace('\u200B', '')
-
-        # Ajustar caracteres corrompidos
-        if ajustar_corrompidos:
-            corrupted_map = {
-                'Ã': 'ã', 'á': 'à', 'À': 'Á', 'é': 'è', 'É': 'È', 'í': 'ì', 'Í': 'Ì',
-                'ó': 'ò', 'Ó': 'Ò', 'ú': 'ù', 'Ú': 'Ù', 'ç': 'Ç', 'ã': 'Ã',
-                'ü': 'Ü', 'ï': 'Ï', 'ñ': 'Ñ'
-            }
-            cleaned_text = cleaned_text.translate(str.maketrans(corrupted_map))
-
-        # Ajustar espaçamentos (mantém quebras de linha)
-        if ajustar_espacos:
-            lines = cleaned_text.split('\n')
-            cleaned_lines = [re.sub(r' +', ' ', line.strip()) for line in lines]
-            cleaned_text = '\n'.join(cleaned_lines)
-
-        # Arrumar para nomes
-        if arrumar_nomes:
-            # Lista de palavras para manter em minúsculo
-            prepositions = ['de', 'da', 'do', 'dos', 'das', 'e', 'em']
-            cleaned_words = []
-            for word in cleaned_text.split():
-                if word.lower() in prepositions:
-                    cleaned_words.append(word.lower())
-                elif word.lower().startswith("d'") and len(word) > 2:
-                    cleaned_words.append("D'" + word[2].upper() + word[3:].lower())
-                else:
-                    cleaned_words.append(word.capitalize())
-            cleaned_text = " ".join(cleaned_words)
+        with track_action("text_cleanup") as action:
+            cleaned_text = clean_text(
+                text_input,
+                ajustar_espacos=ajustar_espacos,
+                ajustar_corrompidos=ajustar_corrompidos,
+                ajustar_estranhos=ajustar_estranhos,
+                arrumar_nomes=arrumar_nomes,
+            )
+            action.add_rows(len(cleaned_text.splitlines()))
 
         st.write("### Texto Corrigido")
         st.code(cleaned_text, language='python')
@@ -0,0 +1,194 @@
+import re
+from collections import Counter
+
+# O pandas é importado dentro das funções que montam tabelas: as contagens básicas,
+# calculadas a cada execução da página, não precisam dele
+
+SENTENCE_SPLIT_PATTERN = re.compile(r'[.!?]+')
+PARAGRAPH_SPLIT_PATTERN = re.compile(r'\n\n+')
+# Equivale a \b\w+\b (cada sequência de \w já termina em uma fronteira), sem o custo das asserções
+WORD_PATTERN = re.compile(r'\w+')
+MULTIPLE_SPACES_PATTERN = re.compile(r' +')
+
+# Substituições do ajuste de caracteres corrompidos
+CORRUPTED_MAP = {
+    'Ã': 'ã', 'á': 'à', 'À': 'Á', 'é': 'è', 'É': 'È', 'í': 'ì', 'Í': 'Ì',
+    'ó': 'ò', 'Ó': 'Ò', 'ú': 'ù', 'Ú': 'Ù', 'ç': 'Ç', 'ã': 'Ã',
+    'ü': 'Ü', 'ï': 'Ï', 'ñ': 'Ñ'
+}
+CORRUPTED_TABLE = str.maketrans(CORRUPTED_MAP)
+
+# Palavras mantidas em minúsculo no modo "Arrumar para nomes"
+NAME_PREPOSITIONS = {'de', 'da', 'do', 'dos', 'das', 'e', 'em'}
+
+
+def extract_words(text):
+    """
+    Retorna as palavras do texto, em minúsculas.
+    """
+    return WORD_PATTERN.findall(text.lower())
+
+
+def basic_counts(text):
+    """
+    Calcula as contagens básicas do texto.
+
+    Args:
+        text (str): O texto analisado.
+
+    Returns:
+        dict: Caracteres, palavras, espaços, linhas, sentenças e parágrafos.
+    """
+    sentences = SENTENCE_SPLIT_PATTERN.split(text)
+    paragraphs = PARAGRAPH_SPLIT_PATTERN.split(text)
+    return {
+        "chars": len(text),
+        "words": len(extract_words(text)),
+        "spaces": text.count(' '),
+        "lines": text.count('\n') + 1,
+        "sentences": sum(1 for s in sentences if s.strip()),
+        "paragraphs": sum(1 for p in paragraphs if p.strip()),
+    }
+
+
+def _frequency_dataframe(counts, label):
+    import pandas as pd
+
+    df = pd.DataFrame(counts.items(), columns=[label, "Frequência"])
+    return df.sort_values(by="Frequência", ascending=False).reset_index(drop=True)
+
+
+def word_frequency(text):
+    """
+    Conta as ocorrências de cada palavra (sem diferenciar maiúsculas).
+
+    Returns:
+        pd.DataFrame: Colunas "Palavra" e "Frequência", da mais frequente à menos frequente.
+    """
+    return _frequency_dataframe(Counter(extract_words(text)), "Palavra")
+
+
+def letter_frequency(text):
+    """
+    Conta as ocorrências de cada letra (sem diferenciar maiúsculas).
+
+    Returns:
+        pd.DataFrame: Colunas "Letra" e "Frequência", da mais frequente à menos frequente.
+    """
+    # Contar todos os caracteres de uma vez (em C) e só depois descartar os que não são letras
+    counts = Counter(text.lower())
+    letter_counts = {char: count for char, count in counts.items() if char.isalpha()}
+    return _frequency_dataframe(letter_counts, "Letra")
+
+
+def analyze_chars(text):
+    """
+    Monta a tabela caractere por caractere: código decimal, hexadecimal, octal
+    e o link da página Unicode de cada caractere.
+
+    Returns:
+        pd.DataFrame: Uma linha por caractere (vazio se não houver texto).
+    """
+    import pandas as pd
+
+    if not text:
+        return pd.DataFrame()
+    codes = [ord(char) for char in text]
+    return pd.DataFrame({
+        "Caractere": list(text),
+        "Código Decimal": codes,
+        "Hexadecimal": [hex(code) for code in codes],
+        "Octal": [oct(code) for code in codes],
+        "URL Unicode": [f"https://www.compart.com/en/unicode/U+{code:04X}" for code in codes],
+    })
+
+
+def compare_texts(text1, text2):
+    """
+    Compara dois textos posição a posição.
+
+    A partir da primeira posição em que só um dos textos tem um espaço em
+    branco, as diferenças seguintes são marcadas como deslocamento.
+
+    Returns:
+        pd.DataFrame: Colunas "Posição", "Caractere 1", "Caractere 2" e "Diferença".
+    """
+    max_len = max(len(text1), len(text2))
+    chars1 = []
+    chars2 = []
+    differences = []
+    shift_detected = False
+
+    for i in range(max_len):
+        char1 = text1[i] if i < len(text1) else ""
+        char2 = text2[i] if i < len(text2) else ""
+
+        # Diferença "danosa", como um espaço a mais em um dos textos
+        if char1.isspace() != char2.isspace():
+            shift_detected = True
+
+        if char1 == char2:
+            differences.append("")
+        elif shift_detected:
+            differences.append("Sim (deslocamento)")
+        else:
+            differences.append("Sim")
+        chars1.append(repr(char1))
+        chars2.append(repr(char2))
+
+    import pandas as pd
+
+    return pd.DataFrame({
+        "Posição": range(max_len),
+        "Caractere 1": chars1,
+        "Caractere 2": chars2,
+        "Diferença": differences,
+    })
+
+
+def format_name_words(text):
+    """
+    Formata o texto como nomes próprios: capitaliza as palavras, mantém as
+    preposições em minúsculo e trata nomes como "d'Ávila".
+    """
+    formatted = []
+    for word in text.split():
+        lower = word.lower()
+        if lower in NAME_PREPOSITIONS:
+            formatted.append(lower)
+        elif lower.startswith("d'") and len(word) > 2:
+            formatted.append("D'" + word[2].upper() + word[3:].lower())
+        else:
+            formatted.append(word.capitalize())
+    return " ".join(formatted)
+
+
+def clean_text(text, ajustar_espacos=True, ajustar_corrompidos=True, ajustar_estranhos=True, arrumar_nomes=False):
+    """
+    Aplica a limpeza e a normalização escolhidas, na mesma ordem da interface.
+
+    Args:
+        text (str): O texto original.
+        ajustar_espacos (bool): Remove espaços repetidos e nas pontas de cada linha (mantém as quebras).
+        ajustar_corrompidos (bool): Substitui caracteres corrompidos (CORRUPTED_MAP).
+        ajustar_estranhos (bool): Troca espaços não separáveis e remove espaços de largura zero.
+        arrumar_nomes (bool): Formata o resultado como nomes próprios.
+
+    Returns:
+        str: O texto corrigido.
+    """
+    cleaned_text = text
+
+    if ajustar_estranhos:
+        cleaned_text = cleaned_text.replace('\u00A0', ' ').replace('\u200B', '')
+
+    if ajustar_corrompidos:
+        cleaned_text = cleaned_text.translate(CORRUPTED_TABLE)
+
+    if ajustar_espacos:
+        cleaned_text = '\n'.join(MULTIPLE_SPACES_PATTERN.sub(' ', line.strip()) for line in cleaned_text.split('\n'))
+
+    if arrumar_nomes:
+        cleaned_text = format_name_words(cleaned_text)
+
+    return cleaned_text
@@ -1,65 +1,76 @@
+import time
+
 import streamlit as st
+from toolbox_common.metrics import init_metrics, track_action
+from catalog_search import get_catalog_index
+from health_monitor import get_health_monitor, LOBBY_HEALTH_INTERVAL_SECONDS, CHECKING, UP, SLOW, BUSY, DOWN
 
 # Título do Lobby
 st.set_page_config(page_title="Caixa de Ferramentas", layout="wide")
+init_metrics("lobby")
 st.title("Projeto Caixa de Ferramentas")
 
 # Descrição geral
 st.write("Bem-vindo! Use a barra de pesquisa ou navegue pelas ferramentas disponíveis abaixo.")
 
-# Dados dos projetos em uma estrutura de lista para facilitar a busca
-projetos = [
-    {
-        "titulo": "Gerador de Senhas e Hashes + Validador de Senhas",
-        "descricao": """
-Este projeto gera senhas e hashes usando Streamlit e BCrypt. Ele permite gerar senhas aleatórias baseadas em nomes e criar hashes de senhas fornecidas pelo usuário. Também valida se uma senha acessa um hash, ambos fornecidos pelo usuário.
-""",
-        "link": "http://localhost/password-app/"
-    },
-    {
-        "titulo": "Executor de Queries de busca de cards conectados via GraphQL do Pipefy com Subtabelas (Report Generator)",
-        "descricao": """
-Este projeto permite a execução de **queries GraphQL genéricas** contra a API do Pipefy, com foco em análise de dados estruturados. A aplicação identifica listas aninhadas automaticamente (como `parent_relations.cards`) e trata campos complexos de forma inteligente, exibindo os dados em tabelas interativas e exportáveis em Excel.
+# O catálogo de ferramentas fica em catalog.json e é indexado uma vez por processo (catalog_search.py)
+catalogo = get_catalog_index()
+# As ferramentas são verificadas em segundo plano; a página só lê o último resultado
+monitor = get_health_monitor()
+
+STATUS_ICONS = {UP: "🟢", SLOW: "🟡", BUSY: "🟠", DOWN: "🔴", CHECKING: "⚪"}
+
+
+def format_health(saude):
+    """
+    Resume o estado de uma ferramenta em uma linha (status, réplicas, p95 da
+    duração das ações e fila).
+    """
+    partes = [f"{STATUS_ICONS[saude['status']]} {saude['status'].capitalize()}"]
+    if saude["replicas"] and saude["replicas"] > 1:
+        partes.append(f"réplicas: {saude['replicas_up']}/{saude['replicas']}")
+    if saude["action_p95_seconds"] is not None:
+        partes.append(f"ações (p95): {saude['action_p95_seconds']:.2f} s")
+    if saude["queue_depth"] is not None:
+        partes.append(f"fila: {saude['queue_depth']:g}")
+    return " · ".join(partes)
+
+
+@st.fragment(run_every=LOBBY_HEALTH_INTERVAL_SECONDS or None)
+def render_health_dashboard():
+    linhas = ["| Ferramenta | Status | Ações (p95) | Fila | Em andamento | Verificada há |", "|---|---|---|---|---|---|"]
+    for projeto in catalogo.tools:
+        if not projeto.get("saude"):
+            continue
+        saude = monitor.status(projeto)
+        p95 = f"{saude['action_p95_seconds']:.2f} s" if saude["action_p95_seconds"] is not None else "-"
+        fila = f"{saude['queue_depth']:g}" if saude["queue_depth"] is not None else "-"
+        andamento = f"{saude['in_flight']:g}" if saude["in_flight"] is not None else "-"
+        verificada = f"{time.time() - saude['checked_at']:.0f} s" if saude["checked_at"] else "-"
+        linhas.append(f"| {projeto['titulo']} | {STATUS_ICONS[saude['status']]} {saude['status']} | {p95} | {fila} | {andamento} | {verificada} |")
+    st.markdown("\n".join(linhas))
+
 
-Você poderá:
-- Substituir campos variáveis da query de forma prática
-- Visualizar resultados em tabela principal e subtabelas
-- Ver prévias de campos complexos e listas de objetos
-- Exportar todos os dados para Excel com múltiplas abas
-- Salvar e reutilizar queries nomeadas
-""",
-        "link": "http://localhost/report-generator/"
-    },
-    {
-        "titulo": "Executador de Mutations do Pipefy",
-        "descricao": """
-Este projeto foi desenvolvido para automatizar a execução de mutações em lote no **Pipefy** utilizando **GraphQL**. O sistema divide a query em **super-lotes** e **sub-lotes**, permitindo a execução de várias mutações de maneira eficiente. Ele também exibe o progresso da execução e mantém um log dinâmico com informações detalhadas de cada etapa.
-""",
-        "link": "http://localhost/mutations-app/"
-    },
-    {
-        "titulo": "Analisador de Strings (textos) Avançado (Contador, Comparador e Limpeza)",
-        "descricao": """
-Uma ferramenta multifuncional para análise de texto. Permite contagem em tempo real de caracteres, palavras e linhas, além de análises avançadas de frequência, inspeção de caracteres e limpeza de texto.
-""",
-        "link": "http://localhost/character-app/"
-    }
-]
+with st.expander("Saúde das ferramentas"):
+    render_health_dashboard()
 
 # Barra de pesquisa
 termo_busca = st.text_input("Pesquisar ferramenta...", placeholder="Digite o nome ou uma palavra-chave...", key="search_bar")
 
-# Filtra os projetos com base no termo de busca
-projetos_filtrados = [
-    p for p in projetos
-    if termo_busca.lower() in p["titulo"].lower() or termo_busca.lower() in p["descricao"].lower()
-]
+# Busca no índice do catálogo, sem diferenciar acentos, com palavras parciais e tolerância
+# a erros de digitação; os resultados vêm do mais relevante ao menos relevante
+# (buscas contam como ações nas métricas)
+with track_action("search" if termo_busca else "view") as action:
+    projetos_filtrados = [projeto for projeto, _pontuacao in catalogo.search(termo_busca)]
+    action.add_rows(len(projetos_filtrados))
 
 # Exibe os projetos filtrados
 if projetos_filtrados:
     for projeto in projetos_filtrados:
         st.markdown("---")
         st.header(projeto["titulo"])
+        if projeto.get("saude"):
+            st.caption(format_health(monitor.status(projeto)))
         st.write(projeto["descricao"])
         
         # Cria um botão de link que abre na mesma aba
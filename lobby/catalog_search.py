@@ -0,0 +1,179 @@
+import bisect
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Palavras muito comuns, ignoradas no índice e na busca
+STOPWORDS = {"a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "um", "uma",
+             "para", "por", "com", "se", "que", "ou", "via"}
+
+# Peso de cada campo da ferramenta (um termo vale pelo campo mais importante em que aparece)
+FIELD_WEIGHTS = {"titulo": 3.0, "palavras_chave": 2.0, "descricao": 1.0}
+# Peso de cada tipo de correspondência de um termo da busca com um termo do índice
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+# Similaridade mínima (Jaccard dos trigramas) para uma correspondência aproximada
+FUZZY_MIN_SIMILARITY = 0.3
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 3
+
+
+def normalize_text(text):
+    """
+    Remove os acentos e passa para minúsculas ("Relatório" -> "relatorio").
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    """
+    Retorna os termos do texto, normalizados e sem as palavras muito comuns.
+    """
+    return [token for token in TOKEN_PATTERN.findall(normalize_text(text)) if token not in STOPWORDS]
+
+
+def trigrams(token):
+    """
+    Trigramas do termo, com espaços nas bordas para valorizar o início da palavra.
+    """
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """
+    Índice de busca do catálogo de ferramentas, montado uma vez por processo.
+
+    Cada termo do título, das palavras-chave e da descrição vai para um índice
+    invertido (termo -> ferramentas). Na busca, cada termo digitado é expandido
+    para os termos do índice iguais a ele, que começam com ele (palavras
+    parciais) ou parecidos com ele pelos trigramas (erros de digitação), sem
+    diferenciar acentos nem maiúsculas.
+
+    As ferramentas que correspondem a mais termos da busca vêm primeiro; no
+    empate, a maior pontuação (peso do campo x peso da correspondência).
+
+    Args:
+        tools (list): As ferramentas do catálogo (dicts com "titulo", "descricao",
+            "palavras_chave" e "link").
+    """
+
+    def __init__(self, tools):
+        self.tools = list(tools)
+        self._postings = {}
+        for tool_id, tool in enumerate(self.tools):
+            for field, weight in FIELD_WEIGHTS.items():
+                value = tool.get(field) or ""
+                if isinstance(value, list):
+                    value = " ".join(value)
+                for token in tokenize(value):
+                    postings = self._postings.setdefault(token, {})
+                    postings[tool_id] = max(postings.get(tool_id, 0.0), weight)
+        # Vocabulário ordenado, para achar os termos com um prefixo por busca binária
+        self._vocabulary = sorted(self._postings)
+        self._trigram_index = {}
+        self._trigram_counts = {}
+        for token in self._vocabulary:
+            token_trigrams = trigrams(token)
+            self._trigram_counts[token] = len(token_trigrams)
+            for gram in token_trigrams:
+                self._trigram_index.setdefault(gram, []).append(token)
+
+    def expand_term(self, term):
+        """
+        Retorna os termos do índice que correspondem a um termo da busca.
+
+        Returns:
+            dict: Termo do índice -> peso da correspondência (exata, prefixo ou aproximada).
+        """
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_MATCH
+
+        if len(term) >= MIN_PREFIX_LENGTH:
+            position = bisect.bisect_left(self._vocabulary, term)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+                matches.setdefault(self._vocabulary[position], PREFIX_MATCH)
+                position += 1
+
+        if len(term) >= MIN_FUZZY_LENGTH:
+            term_trigrams = trigrams(term)
+            shared = Counter()
+            for gram in term_trigrams:
+                shared.update(self._trigram_index.get(gram, ()))
+            for token, count in shared.items():
+                similarity = count / (len(term_trigrams) + self._trigram_counts[token] - count)
+                if similarity >= FUZZY_MIN_SIMILARITY and FUZZY_MATCH * similarity > matches.get(token, 0.0):
+                    matches[token] = FUZZY_MATCH * similarity
+        return matches
+
+    def search(self, query, limit=None):
+        """
+        Busca as ferramentas do catálogo.
+
+        Args:
+            query (str): O texto digitado (vazio retorna todo o catálogo, na ordem do arquivo).
+            limit (int, opcional): Quantidade máxima de resultados.
+
+        Returns:
+            list: Tuplas (ferramenta, pontuação), da mais relevante à menos relevante.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            results = [(tool, 0.0) for tool in self.tools]
+            return results[:limit] if limit else results
+
+        scores = {}
+        matched_terms = {}
+        for term in terms:
+            # Cada termo da busca conta uma vez por ferramenta, pela sua melhor correspondência
+            best = {}
+            for token, match_weight in self.expand_term(term).items():
+                for tool_id, field_weight in self._postings[token].items():
+                    score = match_weight * field_weight
+                    if score > best.get(tool_id, 0.0):
+                        best[tool_id] = score
+            for tool_id, score in best.items():
+                scores[tool_id] = scores.get(tool_id, 0.0) + score
+                matched_terms[tool_id] = matched_terms.get(tool_id, 0) + 1
+
+        ranked = sorted(scores, key=lambda tool_id: (-matched_terms[tool_id], -scores[tool_id], tool_id))
+        results = [(self.tools[tool_id], scores[tool_id]) for tool_id in ranked]
+        return results[:limit] if limit else results
+
+
+def load_catalog(path=CATALOG_PATH):
+    """
+    Lê o catálogo de ferramentas (lista JSON).
+
+    Raises:
+        ValueError: Se alguma ferramenta não tiver "titulo" ou "link".
+    """
+    with open(path, encoding="utf-8") as f:
+        tools = json.load(f)
+    for position, tool in enumerate(tools):
+        missing = [field for field in ("titulo", "link") if not tool.get(field)]
+        if missing:
+            raise ValueError(f"Ferramenta {position} do catálogo sem {', '.join(missing)} ({path})")
+    return tools
+
+
+@lru_cache(maxsize=4)
+def _build_index(path, modified_at):
+    return CatalogIndex(load_catalog(path))
+
+
+def get_catalog_index(path=CATALOG_PATH):
+    """
+    Retorna o índice do catálogo, montado uma vez por processo e refeito
+    apenas quando o arquivo do catálogo é alterado.
+    """
+    return _build_index(path, os.path.getmtime(path))
@@ -0,0 +1,291 @@
+import json
+import math
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog_search import get_catalog_index
+
+# Intervalo entre duas rodadas de verificação (0 desativa as verificações)
+LOBBY_HEALTH_INTERVAL_SECONDS = float(os.environ.get("LOBBY_HEALTH_INTERVAL_SECONDS", 15))
+# Tempo máximo de cada verificação
+LOBBY_HEALTH_TIMEOUT_SECONDS = float(os.environ.get("LOBBY_HEALTH_TIMEOUT_SECONDS", 3))
+# Quantidade de verificações recentes usadas no tempo de resposta (p95)
+LOBBY_HEALTH_WINDOW = int(os.environ.get("LOBBY_HEALTH_WINDOW", 20))
+# A partir de quando uma ferramenta é exibida como lenta ou sobrecarregada
+LOBBY_HEALTH_SLOW_SECONDS = float(os.environ.get("LOBBY_HEALTH_SLOW_SECONDS", 1.0))
+LOBBY_HEALTH_BUSY_QUEUE = int(os.environ.get("LOBBY_HEALTH_BUSY_QUEUE", 5))
+
+CHECKING = "verificando"
+UP = "disponível"
+SLOW = "lenta"
+BUSY = "sobrecarregada"
+DOWN = "fora do ar"
+
+
+def percentile(values, fraction):
+    """
+    Percentil pelo método do posto mais próximo (ex: fraction=0.95 para o p95).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def resolve_replicas(url):
+    """
+    Endereços IP de todas as réplicas por trás do host de `url` (o DNS do
+    Docker devolve um endereço por contêiner do serviço), na ordem do DNS.
+
+    Raises:
+        OSError: Se o host não puder ser resolvido.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    infos = socket.getaddrinfo(parsed.hostname, parsed.port or 80, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+def replica_url(url, address):
+    """
+    O mesmo endereço apontando para uma réplica (ex: http://streamlit-app:8501/x
+    -> http://172.18.0.5:8501/x).
+    """
+    parsed = urllib.parse.urlsplit(url)
+    host = f"[{address}]" if ":" in address else address
+    netloc = f"{host}:{parsed.port}" if parsed.port else host
+    return urllib.parse.urlunsplit(parsed._replace(netloc=netloc))
+
+
+def probe_replica(urls, timeout=LOBBY_HEALTH_TIMEOUT_SECONDS):
+    """
+    Verifica uma réplica: o endpoint de saúde do Streamlit (disponibilidade e
+    tempo de resposta) e o /healthz do endpoint de métricas (fila, ações em
+    andamento e p95 da duração das ações).
+
+    Returns:
+        dict: ok, latência (s), profundidade de fila, ações em andamento, p95
+              da duração das ações (s), o erro, se a réplica não respondeu,
+              e o erro do /healthz, se só ele não respondeu.
+    """
+    result = {"ok": False, "latency": None, "queue_depth": None, "in_flight": None, "action_p95_seconds": None,
+              "error": None, "status_error": None}
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urls["streamlit"], timeout=timeout) as response:
+            response.read()
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        result["error"] = str(getattr(e, "reason", e))
+        return result
+    result["ok"] = True
+    result["latency"] = time.perf_counter() - started
+
+    if urls.get("status"):
+        try:
+            with urllib.request.urlopen(urls["status"], timeout=timeout) as response:
+                status = json.load(response)
+            result["queue_depth"] = status.get("queue_depth")
+            result["in_flight"] = status.get("in_flight")
+            result["action_p95_seconds"] = status.get("action_p95_seconds")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            # Sem o endpoint de métricas, a réplica continua disponível, só sem a fila
+            result["status_error"] = str(getattr(e, "reason", e))
+    return result
+
+
+def _sum_known(values):
+    known = [value for value in values if value is not None]
+    return sum(known) if known else None
+
+
+def probe_tool(tool, timeout=LOBBY_HEALTH_TIMEOUT_SECONDS):
+    """
+    Verifica uma ferramenta pelos endereços internos de "saude" do catálogo,
+    em todas as réplicas do serviço (ao mesmo tempo): um nome como
+    streamlit-app resolve para um endereço por réplica, e verificar só o que
+    o DNS devolve primeiro esconderia uma réplica sobrecarregada ou fora do ar.
+
+    A ferramenta está disponível se alguma réplica responder. Fila e ações em
+    andamento são somadas entre as réplicas; a latência e o p95 das ações são
+    os da pior réplica.
+
+    Returns:
+        dict: ok, latência (s), profundidade de fila, ações em andamento, p95
+              da duração das ações (s), réplicas disponíveis e total, o erro,
+              se nenhuma réplica respondeu, e o erro do /healthz, se ele não
+              respondeu em alguma réplica disponível.
+    """
+    urls = tool.get("saude") or {}
+    streamlit_host = urllib.parse.urlsplit(urls.get("streamlit", "")).hostname
+    try:
+        addresses = resolve_replicas(urls["streamlit"])
+    except (OSError, ValueError, KeyError) as e:
+        return {"ok": False, "latency": None, "queue_depth": None, "in_flight": None, "action_p95_seconds": None,
+                "replicas": 0, "replicas_up": 0, "error": str(e), "status_error": None}
+
+    def replica_urls(address):
+        # O /healthz de cada réplica, quando ele fica no mesmo host do Streamlit
+        status_url = urls.get("status")
+        if status_url and urllib.parse.urlsplit(status_url).hostname == streamlit_host:
+            status_url = replica_url(status_url, address)
+        return {"streamlit": replica_url(urls["streamlit"], address), "status": status_url}
+
+    with ThreadPoolExecutor(max_workers=len(addresses), thread_name_prefix="lobby-replica") as pool:
+        results = list(pool.map(lambda address: probe_replica(replica_urls(address), timeout), addresses))
+
+    up = [result for result in results if result["ok"]]
+    status_errors = [result["status_error"] for result in up if result["status_error"]]
+    action_p95s = [result["action_p95_seconds"] for result in up if result["action_p95_seconds"] is not None]
+    return {
+        "ok": bool(up),
+        "latency": max(result["latency"] for result in up) if up else None,
+        "queue_depth": _sum_known(result["queue_depth"] for result in up),
+        "in_flight": _sum_known(result["in_flight"] for result in up),
+        "action_p95_seconds": max(action_p95s) if action_p95s else None,
+        "replicas": len(results),
+        "replicas_up": len(up),
+        "error": None if up else "; ".join(dict.fromkeys(result["error"] for result in results)),
+        "status_error": status_errors[0] if status_errors else None,
+    }
+
+
+class HealthMonitor:
+    """
+    Verifica as ferramentas do catálogo em segundo plano, todas ao mesmo
+    tempo, a cada `interval_seconds`. As páginas do Lobby só leem o último
+    resultado (`status`): abrir ou atualizar a página nunca dispara uma
+    verificação. Um /healthz inacessível só vai para o log quando deixa de
+    responder ou volta a responder, e não a cada rodada.
+
+    Args:
+        tools_provider (callable): Retorna as ferramentas a verificar (as que
+            tiverem "saude" no catálogo); chamada a cada rodada, então
+            mudanças no catálogo valem na rodada seguinte.
+        interval_seconds (float, opcional): Intervalo entre as rodadas.
+        timeout_seconds (float, opcional): Tempo máximo de cada verificação.
+        window (int, opcional): Verificações recentes usadas no p95.
+    """
+
+    def __init__(self, tools_provider, interval_seconds=LOBBY_HEALTH_INTERVAL_SECONDS,
+                 timeout_seconds=LOBBY_HEALTH_TIMEOUT_SECONDS, window=LOBBY_HEALTH_WINDOW):
+        self.tools_provider = tools_provider
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.window = max(int(window), 1)
+        self._latencies = {}
+        self._latest = {}
+        self._status_reachable = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Inicia a thread de verificação (uma única vez).
+        """
+        with self._lock:
+            if self._thread is not None or not self.interval_seconds:
+                return
+            self._thread = threading.Thread(target=self._loop, name="lobby-health", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"Erro ao verificar as ferramentas: {e}")
+            time.sleep(self.interval_seconds)
+
+    def probe_all(self):
+        """
+        Verifica todas as ferramentas em paralelo e guarda os resultados.
+        """
+        tools = [tool for tool in self.tools_provider() if tool.get("saude")]
+        if not tools:
+            return
+        with ThreadPoolExecutor(max_workers=len(tools), thread_name_prefix="lobby-probe") as pool:
+            results = list(pool.map(lambda tool: probe_tool(tool, self.timeout_seconds), tools))
+        checked_at = time.time()
+        messages = []
+        with self._lock:
+            for tool, result in zip(tools, results):
+                key = tool["link"]
+                latencies = self._latencies.get(key)
+                if latencies is None:
+                    latencies = self._latencies[key] = deque(maxlen=self.window)
+                if result["ok"]:
+                    latencies.append(result["latency"])
+                    if tool["saude"].get("status"):
+                        messages.extend(self._track_status_reachability(tool, result["status_error"]))
+                self._latest[key] = dict(result, checked_at=checked_at)
+        for message in messages:
+            print(message)
+
+    def _track_status_reachability(self, tool, status_error):
+        # Registra só as mudanças: a primeira falha e a volta do /healthz
+        url = tool["saude"]["status"]
+        reachable = status_error is None
+        previous = self._status_reachable.get(tool["link"])
+        self._status_reachable[tool["link"]] = reachable
+        if not reachable and previous is not False:
+            return [f"Não foi possível ler {url}: {status_error}"]
+        if reachable and previous is False:
+            return [f"{url} voltou a responder."]
+        return []
+
+    def status(self, tool):
+        """
+        Retorna o último estado conhecido da ferramenta.
+
+        Returns:
+            dict: status (UP, SLOW, BUSY, DOWN ou CHECKING), p95 do tempo de
+                  resposta do Streamlit (s, define o status "lenta"), p95 da
+                  duração das ações (s, do /healthz), profundidade de fila,
+                  ações em andamento (somadas entre as réplicas), réplicas
+                  disponíveis e total, momento da última verificação e erro.
+        """
+        with self._lock:
+            latest = self._latest.get(tool["link"])
+            latencies = list(self._latencies.get(tool["link"], ()))
+        if latest is None:
+            return {"status": CHECKING, "response_p95_seconds": None, "action_p95_seconds": None,
+                    "queue_depth": None, "in_flight": None, "replicas": None, "replicas_up": None,
+                    "checked_at": None, "error": None}
+
+        p95 = percentile(latencies, 0.95)
+        if not latest["ok"]:
+            status = DOWN
+        elif latest["queue_depth"] is not None and latest["queue_depth"] >= LOBBY_HEALTH_BUSY_QUEUE:
+            status = BUSY
+        elif p95 is not None and p95 > LOBBY_HEALTH_SLOW_SECONDS:
+            status = SLOW
+        else:
+            status = UP
+        return {"status": status, "response_p95_seconds": p95, "action_p95_seconds": latest["action_p95_seconds"],
+                "queue_depth": latest["queue_depth"], "in_flight": latest["in_flight"],
+                "replicas": latest["replicas"], "replicas_up": latest["replicas_up"],
+                "checked_at": latest["checked_at"], "error": latest["error"]}
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor():
+    """
+    Retorna o monitor do processo (compartilhado por todas as sessões do
+    Lobby), iniciando as verificações na primeira chamada.
+    """
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = HealthMonitor(lambda: get_catalog_index().tools)
+            _monitor.start()
+        return _monitor
@@ -0,0 +1,122 @@
+import random
+import string
+
+import bcrypt
+
+# Custo do BCrypt usado nos hashes gerados (padrão $2a$10$)
+BCRYPT_ROUNDS = 10
+PASSWORD_CHARS = string.ascii_letters + string.digits
+
+
+def hash_password(senha, rounds=BCRYPT_ROUNDS):
+    """
+    Gera o hash BCrypt da senha no padrão $2a$.
+
+    Args:
+        senha (str): A senha em texto puro.
+        rounds (int, opcional): O custo do BCrypt (padrão: BCRYPT_ROUNDS).
+
+    Returns:
+        str: O hash gerado.
+    """
+    return bcrypt.hashpw(senha.encode("utf-8"), bcrypt.gensalt(rounds=rounds, prefix=b"2a")).decode("utf-8")
+
+
+def generate_random_alphanumeric(length):
+    """
+    Gera uma sequência aleatória de letras e dígitos.
+    """
+    return ''.join(random.choices(PASSWORD_CHARS, k=length))
+
+
+def generate_password(nome):
+    """
+    Gera uma senha com as 3 primeiras letras do nome e 6 caracteres aleatórios.
+    """
+    base = nome[:3] if len(nome) >= 3 else nome
+    random_part = generate_random_alphanumeric(6)
+    return base + random_part
+
+
+def process_data_generate_password(csv_input, rounds=BCRYPT_ROUNDS, report_error=print):
+    """
+    Gera senha e hash para cada linha "Código;Nome".
+
+    Args:
+        csv_input (str): As linhas de entrada.
+        rounds (int, opcional): O custo do BCrypt.
+        report_error (callable, opcional): Recebe a mensagem de cada linha com
+            erro (na interface, é o st.error).
+
+    Returns:
+        list: [código, senha, hash] de cada linha válida.
+    """
+    processed_list = []
+    for line in csv_input.strip().split("\n"):
+        try:
+            codigo, nome = line.split(";")
+            codigo = codigo.strip()
+            nome = nome.strip()
+
+            senha = generate_password(nome)
+            processed_list.append([codigo, senha, hash_password(senha, rounds)])
+        except Exception as e:
+            report_error(f"Erro ao processar a linha: {line}, erro: {e}")
+    return processed_list
+
+
+def process_data_generate_hash(csv_input, rounds=BCRYPT_ROUNDS, report_error=print):
+    """
+    Gera o hash de cada linha "Código;Senha".
+
+    Returns:
+        list: [código, senha, hash] de cada linha válida.
+    """
+    processed_list = []
+    for line in csv_input.strip().split("\n"):
+        try:
+            codigo, senha = line.split(";")
+            codigo = codigo.strip()
+            senha = senha.strip()
+
+            processed_list.append([codigo, senha, hash_password(senha, rounds)])
+        except Exception as e:
+            report_error(f"Erro ao processar a linha: {line}, erro: {e}")
+    return processed_list
+
+
+def validate_password(senha, hash_fornecido):
+    """
+    Verifica se a senha corresponde ao hash.
+
+    Returns:
+        str: "Acesso permitido", "Acesso negado" ou a descrição do erro
+             (ex: hash com salt inválido).
+    """
+    try:
+        if bcrypt.checkpw(senha.encode("utf-8"), hash_fornecido.encode("utf-8")):
+            return "Acesso permitido"
+        return "Acesso negado"
+    except Exception as e:
+        return f"Erro na validação: {e}"
+
+
+def process_data_validate_access(csv_input, report_error=print):
+    """
+    Valida cada linha "Código;Senha;Hash".
+
+    Returns:
+        list: [código, senha, hash, validação] de cada linha válida.
+    """
+    processed_list = []
+    for line in csv_input.strip().split("\n"):
+        try:
+            codigo, senha, hash_fornecido = line.split(";")
+            codigo = codigo.strip()
+            senha = senha.strip()
+            hash_fornecido = hash_fornecido.strip()
+
+            processed_list.append([codigo, senha, hash_fornecido, validate_password(senha, hash_fornecido)])
+        except Exception as e:
+            report_error(f"Erro ao processar a linha: {line}, erro: {e}")
+    return processed_list
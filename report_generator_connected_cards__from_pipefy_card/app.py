@@ -1,6 +1,4 @@
 import streamlit as st
-import pandas as pd
-import json
 import re
 from io import BytesIO
 from pathlib import Path
@@ -8,23 +6,197 @@ from pipefy_utils import (
     execute_graphql_query, 
     extract_nested_lists, 
     flatten_record_with_lists, 
-    generate_phase_report, 
-    get_pipe_phases, 
-    get_connected_cards_with_mandatory_fields, 
-    generate_final_phase_report
+    parse_card_ids, 
+    PHASE_MATCH_MODES, 
+    compile_phase_matcher, 
+    fetch_connected_cards_dataset, 
+    fetch_connected_cards_dataset_incremental,
+    annotate_report_changes,
+    build_phase_report, 
+    build_mandatory_fields_report, 
+    build_final_phase_report, 
+    traverse_connected_cards, 
+    describe_lost_ids,
+    parse_batch_values,
+    execute_query_batch
 )
+from report_cache import TTLCache, make_report_key, make_dataset_key, get_cached_report
+from instrumentation import record_run, stage, current_run
+from query_templates import compile_query_template
+from query_store import get_query_store
+from card_snapshots import load_snapshot, update_snapshot
+from toolbox_common.table_viewer import render_paginated_dataframe
+from toolbox_common.metrics import init_metrics
+from toolbox_common.job_panel import submit_job, job_is_active, render_job_panel, session_owner
+from toolbox_common.pipefy_scheduler import request_context, BULK
+
+# O pandas (e o xlsxwriter, por meio dele) é importado só onde um relatório ou uma
+# exportação é gerado: a página abre sem carregá-lo (ver benchmarks/startup_benchmarks.py)
 
 st.set_page_config(page_title="Pipefy Query Runner", layout="wide")
+init_metrics("report_generator")
 st.title("📊 Executor de Query GraphQL (Pipefy) com Suporte a Subtabelas")
 
 QUERIES_FILE = Path("saved_queries.json")
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CACHE_SOURCE_LABELS = {
+    "session": "⚡ Resultado reaproveitado do cache desta sessão (nenhuma chamada à API).",
+    "process": "⚡ Resultado reaproveitado do cache do servidor (nenhuma chamada à API).",
+    "shared": "⚡ Resultado reaproveitado do cache compartilhado entre os servidores (nenhuma chamada à API).",
+}
+
+
+def dataframes_to_excel_bytes(sheets):
+    """
+    Gera um arquivo Excel em memória com uma aba por DataFrame.
+
+    Args:
+        sheets (dict): Mapeamento nome da aba -> DataFrame.
+
+    Returns:
+        bytes: O conteúdo do arquivo .xlsx.
+    """
+    import pandas as pd
+
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, index=False, sheet_name=sheet_name[:31])
+    return output.getvalue()
+
+
+def build_stored_report(df_report, sheet_name, with_csv=True, source="api", lost_ids=None, incremental=None):
+    """
+    Monta o resultado de um relatório a ser guardado no session_state, junto
+    com as exportações.
+
+    As exportações são geradas uma única vez aqui, para que as reexecuções do
+    script (paginação, ordenação, filtros) não reprocessem o arquivo inteiro.
+    """
+    with stage("Exportação (Excel/CSV)"):
+        excel = dataframes_to_excel_bytes({sheet_name: df_report})
+        csv = df_report.to_csv(index=False) if with_csv else None
+    run = current_run()
+    if run:
+        run.add_rows(len(df_report))
+    return {
+        "df": df_report,
+        "excel": excel,
+        "csv": csv,
+        "source": source,
+        "lost_ids": lost_ids or [],
+        "incremental": incremental,
+        "run_summary": run.summary() if run else None,
+        "trace": run.to_jsonl() if run else None,
+    }
+
+
+def format_bytes(size):
+    """
+    Formata um tamanho em bytes de forma legível (B, KB, MB).
+    """
+    for unit in ("B", "KB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} MB"
+
+
+def format_ms(seconds):
+    return "—" if seconds is None else f"{seconds * 1000:.0f} ms"
+
 
-# Carrega queries salvas
-if QUERIES_FILE.exists():
-    with open(QUERIES_FILE, "r", encoding="utf-8") as f:
-        saved_queries = json.load(f)
-else:
-    saved_queries = {}
+def render_run_summary(run_summary, trace, key):
+    """
+    Exibe (sob demanda) o painel de métricas de uma execução: requisições à API,
+    novas tentativas, bytes recebidos, acertos de cache, percentis de latência e
+    duração de cada etapa, com o download do trace em JSON lines.
+    """
+    if not run_summary:
+        return
+    if not st.checkbox("⏱️ Mostrar métricas desta execução", key=f"{key}_show_metrics"):
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Requisições à API", run_summary["requests"])
+    col2.metric("Novas tentativas", run_summary["retries"])
+    col3.metric("Dados recebidos", format_bytes(run_summary["bytes_received"]))
+    hit_rate = run_summary["cache_hit_rate"]
+    col4.metric("Acertos de cache", "—" if hit_rate is None else f"{hit_rate:.0%}")
+    st.caption(
+        f"Latência da API: p50 {format_ms(run_summary['latency_p50'])} · "
+        f"p95 {format_ms(run_summary['latency_p95'])} · p99 {format_ms(run_summary['latency_p99'])} · "
+        f"tempo total da execução: {run_summary['elapsed']:.2f} s"
+    )
+    if run_summary["stages"]:
+        import pandas as pd
+
+        st.dataframe(pd.DataFrame(
+            [{"Etapa": name, "Duração (s)": round(seconds, 3)} for name, seconds in run_summary["stages"].items()]
+        ))
+    if trace:
+        st.download_button(
+            label="🧾 Baixar trace (JSON lines)",
+            data=trace,
+            file_name=f"trace_{key}_{run_summary['run_id']}.jsonl",
+            mime="application/x-ndjson",
+            key=f"{key}_trace"
+        )
+
+
+def render_incremental_summary(incremental):
+    """
+    Resume o que o modo incremental buscou de novo e o que reaproveitou do
+    snapshot da execução anterior.
+    """
+    if not incremental:
+        return
+    since = f" desde {incremental['watermark']}" if incremental.get("watermark") else ""
+    st.caption(
+        f"♻️ Modo incremental: {incremental['checked']} cards verificados, "
+        f"{incremental['refetched']} buscados de novo, {incremental['reused']} cards de origem reaproveitados "
+        f"do snapshot · {incremental['changed']} cards alterados{since} "
+        "(coluna \"Alteração desde a última execução\")."
+    )
+
+
+def render_stored_report(state_key, file_stem, success_message, empty_message):
+    """
+    Exibe (paginado) um relatório guardado no session_state e seus botões de exportação.
+    """
+    stored = st.session_state.get(state_key)
+    if not stored:
+        return
+    if stored["df"] is None:
+        warn_lost_ids(stored.get("lost_ids"))
+        st.info(empty_message)
+        return
+    st.success(success_message)
+    if stored.get("source") in CACHE_SOURCE_LABELS:
+        st.caption(CACHE_SOURCE_LABELS[stored["source"]])
+    render_incremental_summary(stored.get("incremental"))
+    warn_lost_ids(stored.get("lost_ids"))
+    render_paginated_dataframe(stored["df"], key=f"{state_key}_table")
+    render_run_summary(stored.get("run_summary"), stored.get("trace"), key=state_key)
+
+    st.download_button(
+        label="📤 Baixar Relatório em Excel",
+        data=stored["excel"],
+        file_name=f"{file_stem}.xlsx",
+        mime=EXCEL_MIME,
+        key=f"{state_key}_excel"
+    )
+    if stored["csv"] is not None:
+        st.download_button(
+            label="📥 Baixar Relatório em CSV",
+            data=stored["csv"],
+            file_name=f"{file_stem}.csv",
+            mime="text/csv",
+            key=f"{state_key}_csv"
+        )
+
+# Queries salvas: lidas uma vez por processo e de novo só quando o arquivo muda (ver query_store.py)
+query_store = get_query_store(QUERIES_FILE)
 
 # Entradas principais
 token = st.text_input("🔐 Token de Acesso (Bearer)", type="password", key="token_input")
@@ -39,6 +211,321 @@ include_original_cards = st.radio(
     key="include_original_cards"
 ) == "Sim"
 
+# Cache de relatórios da sessão (o cache do processo é compartilhado entre sessões)
+if "report_cache" not in st.session_state:
+    st.session_state["report_cache"] = TTLCache()
+force_refresh = st.checkbox(
+    "🔄 Ignorar cache e consultar a API novamente",
+    value=False,
+    key="force_refresh_reports"
+)
+incremental_reports = st.checkbox(
+    "♻️ Modo incremental: buscar de novo só os cards alterados desde a última execução",
+    value=False,
+    key="incremental_reports",
+    help="Guarda um snapshot dos cards a cada execução e, na seguinte, verifica a data da última alteração "
+         "e a fase de cada card com uma consulta leve. Os cards alterados são destacados no relatório."
+)
+
+
+def read_card_ids(text):
+    """
+    Normaliza, valida e deduplica os IDs colados pelo usuário, avisando sobre
+    duplicatas removidas e entradas inválidas ignoradas.
+
+    Returns:
+        list: Os IDs válidos e únicos, na ordem da primeira ocorrência.
+    """
+    parsed = parse_card_ids(text)
+    if parsed["duplicates"]:
+        st.info(f"ℹ️ {parsed['duplicates']} ID(s) duplicado(s) removido(s); {len(parsed['card_ids'])} ID(s) único(s) serão consultados.")
+    if parsed["invalid"]:
+        st.warning(f"⚠️ Entradas ignoradas por não serem IDs numéricos: {', '.join(parsed['invalid'])}")
+    return parsed["card_ids"]
+
+
+PHASE_MATCH_MODE_LABELS = {
+    "contains": "Contém",
+    "startswith": "Começa com",
+    "equals": "Igual a",
+    "regex": "Expressão regular",
+}
+
+
+def phase_filter_selector(label, options, key):
+    """
+    Exibe a escolha do filtro de fase, incluindo a opção de um filtro personalizado.
+
+    Returns:
+        tuple: (filtro, mensagem de erro). O filtro é o nome escolhido ou, no
+               filtro personalizado, a tupla (modo, nome alvo) aceita pelo pipefy_utils.
+    """
+    choice = st.radio(label, tuple(options) + ("Personalizado",), key=key)
+    if choice != "Personalizado":
+        return choice, None
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        mode = st.selectbox("Modo de comparação", PHASE_MATCH_MODES, format_func=PHASE_MATCH_MODE_LABELS.get, key=f"{key}_mode")
+    with col2:
+        target = st.text_input("Nome da fase (sem diferenciar maiúsculas e acentos)", key=f"{key}_target").strip()
+    if not target:
+        return None, "⚠️ Informe o nome da fase do filtro personalizado."
+    try:
+        compile_phase_matcher(target, mode)
+    except re.error as e:
+        return None, f"⚠️ Expressão regular inválida: {e}"
+    return (mode, target), None
+
+
+def load_connected_cards_dataset(card_ids, token, report_cache, refresh, incremental=False):
+    """
+    Retorna o conjunto de dados de cards conectados, buscando na API apenas se
+    ele ainda não estiver em cache. Todos os relatórios sobre os mesmos IDs
+    compartilham essa única busca.
+
+    No modo incremental, a busca parte do snapshot da execução anterior do
+    token (card_snapshots.py), busca de novo só os cards alterados e atualiza
+    o snapshot.
+    """
+    def compute():
+        if not incremental:
+            return fetch_connected_cards_dataset(card_ids, token)
+        dataset, snapshot_update = fetch_connected_cards_dataset_incremental(
+            card_ids, token, load_snapshot(token), full_refresh=refresh
+        )
+        update_snapshot(token, snapshot_update)
+        return dataset
+
+    dataset, _ = get_cached_report(
+        report_cache,
+        make_dataset_key(card_ids, token, incremental),
+        compute,
+        force_refresh=refresh,
+        should_cache=lambda dataset: not dataset["failed_ids"]["card"]
+    )
+    return dataset
+
+
+def get_connected_cards_report(report_type, card_ids, filter_type, token, build_report, report_cache, refresh, include_original,
+                               incremental=False):
+    """
+    Gera (ou reaproveita do cache) um relatório de cards conectados.
+
+    Relatórios em que algum card, pipe ou fase não pôde ser buscado depois de
+    todas as tentativas não vão para o cache, para que a próxima execução
+    consulte a API novamente.
+
+    Args:
+        report_type (str): Identificador do relatório (ex: "phase_report").
+        card_ids (list): Os IDs dos cards de origem.
+        filter_type (str or tuple or None): O filtro aplicado, se houver.
+        token (str): O token de acesso da API.
+        build_report (callable): Recebe o conjunto de dados (sem alterá-lo) e retorna as linhas do
+            relatório e os IDs de pipes/fases que o relatório não conseguiu buscar.
+        report_cache (TTLCache): O cache de relatórios da sessão.
+        refresh (bool): Ignora o cache e consulta a API novamente.
+        include_original (bool): Se os cards de origem entram no relatório (faz parte da chave do cache).
+        incremental (bool, opcional): Usa o modo incremental e marca os cards alterados.
+
+    Returns:
+        tuple: (linhas do relatório, IDs perdidos, resumo do modo incremental
+                (None fora dele), origem do resultado).
+    """
+    def compute():
+        with stage("Busca dos cards"):
+            dataset = load_connected_cards_dataset(card_ids, token, report_cache, refresh, incremental)
+        with stage("Montagem do relatório"):
+            report_data, report_failed_ids = build_report(dataset)
+            if incremental:
+                report_data = annotate_report_changes(report_data, dataset)
+        return report_data, describe_lost_ids(dataset, report_failed_ids), dataset.get("incremental")
+
+    (report_data, lost_ids, incremental_summary), source = get_cached_report(
+        report_cache,
+        make_report_key(f"{report_type}_incremental" if incremental else report_type,
+                        card_ids, filter_type, include_original, token),
+        compute,
+        force_refresh=refresh,
+        should_cache=lambda result: not result[1]
+    )
+    return report_data, lost_ids, incremental_summary, source
+
+
+def connected_cards_report_job(job, report_type, card_ids, filter_type, token, build_report, report_cache, refresh,
+                               include_original, sheet_name, with_csv=True, sort_by=None, incremental=False):
+    """
+    Job em segundo plano de um relatório de cards conectados: busca (ou
+    reaproveita do cache) os dados, monta a tabela e gera as exportações, sem
+    depender da execução do script do Streamlit. As requisições entram no
+    agendador do token com prioridade de lote (BULK).
+
+    Returns:
+        dict: O resultado a ser guardado no session_state ("df" é None se não
+              houver dados).
+    """
+    import pandas as pd
+
+    with record_run(report_type), request_context(job.owner, BULK):
+        job.report_progress(0.05, "Buscando os cards conectados e montando o relatório")
+        report_data, lost_ids, incremental_summary, source = get_connected_cards_report(
+            report_type, card_ids, filter_type, token, build_report, report_cache, refresh, include_original,
+            incremental
+        )
+        job.check_cancelled()
+        if not report_data:
+            return {"df": None, "lost_ids": lost_ids}
+
+        job.report_progress(0.8, "Montando a tabela")
+        with stage("DataFrame"):
+            df_report = pd.DataFrame(report_data)
+            if sort_by:
+                df_report = df_report.sort_values(by=sort_by, ascending=[True] * len(sort_by))
+        job.report_progress(0.9, "Gerando as exportações")
+        return build_stored_report(df_report, sheet_name, with_csv=with_csv, source=source, lost_ids=lost_ids,
+                                   incremental=incremental_summary)
+
+
+def card_tree_job(job, card_ids, token, max_depth, max_nodes, follow_children, report_cache, refresh):
+    """
+    Job em segundo plano da auditoria da árvore de cards conectados.
+
+    Returns:
+        dict: O resultado a ser guardado no session_state (cards, arestas e exportação).
+    """
+    import pandas as pd
+
+    with record_run("card_tree") as run, request_context(job.owner, BULK):
+        tree_options = f"profundidade={max_depth};limite={max_nodes};filhos={follow_children}"
+        job.report_progress(0.05, "Percorrendo a árvore de cards")
+        with stage("Travessia da árvore"):
+            tree, source = get_cached_report(
+                report_cache,
+                make_report_key("card_tree", card_ids, tree_options, None, token),
+                lambda: traverse_connected_cards(
+                    card_ids,
+                    token,
+                    max_depth=max_depth,
+                    max_nodes=max_nodes,
+                    follow_children=follow_children
+                ),
+                force_refresh=refresh,
+                should_cache=lambda tree: not tree["failed_ids"]
+            )
+        job.check_cancelled()
+        job.report_progress(0.8, "Montando as tabelas")
+        with stage("DataFrame"):
+            df_nodes = pd.DataFrame(tree["nodes"])
+            df_edges = pd.DataFrame(tree["edges"], columns=["Card Pai", "Card Filho", "Profundidade"])
+        job.report_progress(0.9, "Gerando a exportação")
+        with stage("Exportação (Excel/CSV)"):
+            excel = dataframes_to_excel_bytes({"Cards": df_nodes, "Arestas": df_edges})
+        run.add_rows(len(df_nodes))
+        return {
+            "nodes": df_nodes,
+            "edges": df_edges,
+            "excel": excel,
+            "truncated": tree["truncated"],
+            "failed_ids": tree["failed_ids"],
+            "source": source,
+            "run_summary": run.summary(),
+            "trace": run.to_jsonl(),
+        }
+
+
+def query_batch_job(job, query_text, param, values, token, col_limit, fixed_values=None):
+    """
+    Job em segundo plano do modo em lote das queries salvas: executa a query
+    uma vez para cada valor do campo variável `param` (várias por requisição,
+    em paralelo) e junta os resultados em uma única tabela achatada, com uma
+    coluna indicando o valor de origem de cada linha.
+
+    Returns:
+        dict: O resultado a ser guardado no session_state.
+    """
+    import pandas as pd
+
+    source_column = f"{param} (origem)"
+    with record_run("query_batch") as run, request_context(job.owner, BULK):
+        def report_progress(done, total):
+            job.check_cancelled()
+            job.report_progress(0.05 + 0.75 * done / total, f"{done} de {total} valores consultados")
+
+        job.report_progress(0.05, f"Executando a query para {len(values)} valores")
+        with stage("Execução das queries"):
+            data_by_value, failed_values = execute_query_batch(
+                query_text, param, values, token, fixed_values=fixed_values, progress=report_progress
+            )
+
+        job.report_progress(0.8, "Achatando os resultados")
+        flattened_rows = []
+        all_sub_tables = {}
+        empty_values = []
+        with stage("Flatten"):
+            for value in values:
+                if value not in data_by_value:
+                    continue
+                records = extract_nested_lists(data_by_value[value])
+                if not records:
+                    empty_values.append(value)
+                for rec in records:
+                    flat, sub = flatten_record_with_lists(rec, list_field_limit=col_limit)
+                    flattened_rows.append({source_column: value, **flat})
+                    for subname, rows in sub.items():
+                        all_sub_tables.setdefault(subname, []).extend({source_column: value, **row} for row in rows)
+
+        job.report_progress(0.9, "Gerando a exportação")
+        with stage("DataFrame"):
+            df_main = pd.DataFrame(flattened_rows)
+            sub_dfs = {sub_name: pd.DataFrame(sub_data) for sub_name, sub_data in all_sub_tables.items()}
+        with stage("Exportação (Excel/CSV)"):
+            excel = dataframes_to_excel_bytes({"Principal": df_main, **sub_dfs}) if flattened_rows else None
+        run.add_rows(len(df_main))
+        return {
+            "df_main": df_main,
+            "sub_tables": sub_dfs,
+            "excel": excel,
+            "values": len(values),
+            "failed_values": failed_values,
+            "empty_values": empty_values,
+            "run_summary": run.summary(),
+            "trace": run.to_jsonl(),
+        }
+
+
+def start_report_job(state_key, label, job_fn, *args, **kwargs):
+    """
+    Submete o job de um relatório, a menos que já haja um em andamento para
+    a mesma seção nesta sessão.
+    """
+    job_key = f"{state_key}_job"
+    if job_is_active(job_key):
+        st.warning("⚠️ Este relatório já está sendo gerado. Aguarde ou cancele a execução em andamento.")
+        return
+    submit_job(job_key, job_fn, *args, label=label, **kwargs)
+
+
+def render_report_job(state_key):
+    """
+    Exibe o progresso do job da seção e, quando ele termina, guarda o resultado
+    no session_state (onde `render_stored_report` o encontra).
+    """
+    def store_result(result):
+        st.session_state[state_key] = result
+
+    render_job_panel(f"{state_key}_job", store_result)
+
+
+def warn_lost_ids(lost_ids):
+    """
+    Avisa quais IDs ficaram de fora do relatório por falha na API.
+    """
+    if lost_ids:
+        st.warning(
+            "⚠️ Relatório incompleto: a API do Pipefy não respondeu para "
+            f"{', '.join(lost_ids)}. Gere novamente para tentar buscá-los."
+        )
+
 st.markdown("---")
 
 # Seção de Relatório de Fases de Cards Conectados
@@ -48,7 +535,7 @@ with st.expander("📝 Gerar Relatório de Fases de Cards Conectados"):
     
     st.markdown("---")
     
-    filter_type = st.radio(
+    filter_type, filter_error = phase_filter_selector(
         "Selecione um filtro:",
         ("Nenhum Filtro", "Mudança de Embarque", "Desistências"),
         key="phase_report_filter_type"
@@ -57,57 +544,37 @@ with st.expander("📝 Gerar Relatório de Fases de Cards Conectados"):
     if st.button("▶️ Gerar Relatório de Fases"):
         if not report_card_ids_text:
             st.warning("⚠️ Por favor, insira pelo menos um Card ID.")
+        elif filter_error:
+            st.warning(filter_error)
         elif not st.session_state.get('token'):
             st.warning("⚠️ O Token de Acesso é obrigatório.")
         else:
-            card_ids = report_card_ids_text.strip().splitlines()
+            card_ids = read_card_ids(report_card_ids_text)
             if not card_ids:
                 st.warning("⚠️ Por favor, insira IDs válidos.")
             else:
-                try:
-                    with st.spinner("🔄 Gerando relatório..."):
-                        report_data = generate_phase_report(
-                            card_ids, 
-                            st.session_state.get('token'), 
-                            filter_type, 
-                            include_original_cards
-                        )
-                    
-                    if report_data:
-                        df_report = pd.DataFrame(report_data)
-                        
-                        # Ordenação: Acima Pipe ID crescente, abaixo Fase ID crescente
-                        df_report = df_report.sort_values(by=['Pipe ID','Fase ID'], ascending=[True, True])
-
-                        st.success("✅ Relatório gerado com sucesso!")
-                        st.dataframe(df_report)
-                        
-                        # Exportar Excel
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                            df_report.to_excel(writer, index=False, sheet_name="Relatório de Fases")
-                            
-                        st.download_button(
-                            label="📤 Baixar Relatório em Excel",
-                            data=output.getvalue(),
-                            file_name="relatorio_fases.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                        
-                        # Exportar CSV
-                        csv_output = df_report.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Baixar Relatório em CSV",
-                            data=csv_output,
-                            file_name="relatorio_fases.csv",
-                            mime="text/csv"
-                        )
-                        
-                    else:
-                        st.info("ℹ️ Nenhum dado encontrado para os IDs e filtros fornecidos.")
-                except Exception as e:
-                    st.error("❌ Erro ao gerar o relatório.")
-                    st.exception(e)
+                session_token = st.session_state.get('token')
+                start_report_job(
+                    "phase_report",
+                    "Relatório de Fases",
+                    connected_cards_report_job,
+                    "phase_report",
+                    card_ids,
+                    filter_type,
+                    session_token,
+                    lambda dataset: build_phase_report(dataset, session_token, filter_type, include_original_cards),
+                    st.session_state["report_cache"],
+                    force_refresh,
+                    include_original_cards,
+                    "Relatório de Fases",
+                    # Ordenação: Acima Pipe ID crescente, abaixo Fase ID crescente
+                    sort_by=['Pipe ID', 'Fase ID'],
+                    incremental=incremental_reports
+                )
+
+    render_report_job("phase_report")
+    render_stored_report("phase_report", "relatorio_fases", "✅ Relatório gerado com sucesso!",
+                         "ℹ️ Nenhum dado encontrado para os IDs e filtros fornecidos.")
 
 st.markdown("---")
 
@@ -122,50 +589,42 @@ with st.expander("📝 Gerar Relatório de Cards com Campos Obrigatórios (Exclu
         elif not st.session_state.get('token'):
             st.warning("⚠️ O Token de Acesso é obrigatório.")
         else:
-            card_ids = mandatory_report_card_ids.strip().splitlines()
+            card_ids = read_card_ids(mandatory_report_card_ids)
             if not card_ids:
                 st.warning("⚠️ Por favor, insira IDs válidos.")
             else:
-                try:
-                    with st.spinner("🔄 Gerando relatório..."):
-                        report_data = get_connected_cards_with_mandatory_fields(
-                            card_ids, 
-                            st.session_state.get('token'),
-                            include_original_cards
-                        )
-                    
-                    if report_data:
-                        df_report = pd.DataFrame(report_data)
-                        st.success("✅ Relatório gerado com sucesso!")
-                        st.dataframe(df_report)
-                        
-                        # Exportar Excel
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                            df_report.to_excel(writer, index=False, sheet_name="Relatório Obrigatórios")
-                            
-                        st.download_button(
-                            label="📤 Baixar Relatório em Excel",
-                            data=output.getvalue(),
-                            file_name="relatorio_obrigatorios.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                    else:
-                        st.info("ℹ️ Nenhum dado encontrado para os IDs fornecidos ou foram excluídos pelo filtro de pipe.")
-                except Exception as e:
-                    st.error("❌ Erro ao gerar o relatório.")
-                    st.exception(e)
+                session_token = st.session_state.get('token')
+                start_report_job(
+                    "mandatory_report",
+                    "Relatório de Obrigatórios",
+                    connected_cards_report_job,
+                    "mandatory_report",
+                    card_ids,
+                    None,
+                    session_token,
+                    lambda dataset: build_mandatory_fields_report(dataset, session_token, include_original_cards),
+                    st.session_state["report_cache"],
+                    force_refresh,
+                    include_original_cards,
+                    "Relatório Obrigatórios",
+                    with_csv=False,
+                    incremental=incremental_reports
+                )
+
+    render_report_job("mandatory_report")
+    render_stored_report("mandatory_report", "relatorio_obrigatorios", "✅ Relatório gerado com sucesso!",
+                         "ℹ️ Nenhum dado encontrado para os IDs fornecidos ou foram excluídos pelo filtro de pipe.")
 
 st.markdown("---")
 
 # Seção de Relatório de Fases Finais
 with st.expander("📝 Gerar Relatório com IDs de Fases Finais"):
-    st.markdown("Use esta função para encontrar os IDs de fases finais ('Mudança de Embarque' ou 'Desistências') para cada card conectado.")
+    st.markdown("Use esta função para encontrar os IDs de fases finais ('Mudança de Embarque', 'Desistências' ou uma fase personalizada) para cada card conectado.")
     special_phase_card_ids = st.text_area("IDs dos Cards (um por linha)", key="special_phase_card_ids")
     
     st.markdown("---")
     
-    special_phase_filter_type = st.radio(
+    special_phase_filter_type, special_phase_filter_error = phase_filter_selector(
         "Selecione o tipo de fase a ser buscada:",
         ("Mudança de Embarque", "Desistências"),
         key="special_phase_filter_type"
@@ -174,146 +633,290 @@ with st.expander("📝 Gerar Relatório com IDs de Fases Finais"):
     if st.button("▶️ Gerar Relatório de Fases Finais"):
         if not special_phase_card_ids:
             st.warning("⚠️ Por favor, insira pelo menos um Card ID.")
+        elif special_phase_filter_error:
+            st.warning(special_phase_filter_error)
         elif not st.session_state.get('token'):
             st.warning("⚠️ O Token de Acesso é obrigatório.")
         else:
-            card_ids = special_phase_card_ids.strip().splitlines()
+            card_ids = read_card_ids(special_phase_card_ids)
             if not card_ids:
                 st.warning("⚠️ Por favor, insira IDs válidos.")
             else:
-                try:
-                    with st.spinner("🔄 Gerando IDs de fases..."):
-                        report_data = generate_final_phase_report(
-                            card_ids, 
-                            st.session_state.get('token'), 
-                            special_phase_filter_type,
-                            include_original_cards
-                        )
-                    
-                    if report_data:
-                        df_report = pd.DataFrame(report_data)
-                        st.success("✅ Relatório de IDs gerado com sucesso!")
-                        st.dataframe(df_report)
-                        
-                        # Exportar Excel
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                            df_report.to_excel(writer, index=False, sheet_name="IDs de Fases")
-                            
-                        st.download_button(
-                            label="📤 Baixar Relatório em Excel",
-                            data=output.getvalue(),
-                            file_name="relatorio_fases_especificas.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                        
-                        # Exportar CSV
-                        csv_output = df_report.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Baixar Relatório em CSV",
-                            data=csv_output,
-                            file_name="relatorio_fases_especificas.csv",
-                            mime="text/csv"
-                        )
-                        
-                    else:
-                        st.info("ℹ️ Nenhum dado encontrado para os IDs fornecidos.")
-                except Exception as e:
-                    st.error("❌ Erro ao gerar o relatório.")
-                    st.exception(e)
+                session_token = st.session_state.get('token')
+                start_report_job(
+                    "final_phase_report",
+                    "Relatório de Fases Finais",
+                    connected_cards_report_job,
+                    "final_phase_report",
+                    card_ids,
+                    special_phase_filter_type,
+                    session_token,
+                    lambda dataset: build_final_phase_report(dataset, session_token, special_phase_filter_type, include_original_cards),
+                    st.session_state["report_cache"],
+                    force_refresh,
+                    include_original_cards,
+                    "IDs de Fases",
+                    incremental=incremental_reports
+                )
+
+    render_report_job("final_phase_report")
+    render_stored_report("final_phase_report", "relatorio_fases_especificas", "✅ Relatório de IDs gerado com sucesso!",
+                         "ℹ️ Nenhum dado encontrado para os IDs fornecidos.")
 
 st.markdown("---")
 
-query_names = list(saved_queries.keys())
+# Seção de Auditoria da Árvore de Cards Conectados (vários níveis)
+with st.expander("🌳 Auditar Árvore de Cards Conectados (vários níveis)"):
+    st.markdown("Percorre as conexões dos cards em vários níveis (pais e, opcionalmente, filhos), listando todos os cards alcançados e as arestas entre eles.")
+    tree_card_ids_text = st.text_area("IDs dos Cards (um por linha)", key="tree_card_ids")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        tree_max_depth = st.number_input("Profundidade máxima (saltos)", min_value=1, max_value=10, value=3, step=1, key="tree_max_depth")
+    with col2:
+        tree_max_nodes = st.number_input("Limite de cards visitados", min_value=10, max_value=20000, value=500, step=10, key="tree_max_nodes")
+    with col3:
+        tree_follow_children = st.checkbox("Seguir também relações filho", value=True, key="tree_follow_children")
+
+    if st.button("▶️ Auditar Árvore de Cards"):
+        if not tree_card_ids_text:
+            st.warning("⚠️ Por favor, insira pelo menos um Card ID.")
+        elif not st.session_state.get('token'):
+            st.warning("⚠️ O Token de Acesso é obrigatório.")
+        else:
+            card_ids = read_card_ids(tree_card_ids_text)
+            if not card_ids:
+                st.warning("⚠️ Por favor, insira IDs válidos.")
+            else:
+                start_report_job(
+                    "card_tree_report",
+                    "Auditoria da Árvore de Cards",
+                    card_tree_job,
+                    card_ids,
+                    st.session_state.get('token'),
+                    int(tree_max_depth),
+                    int(tree_max_nodes),
+                    tree_follow_children,
+                    st.session_state["report_cache"],
+                    force_refresh
+                )
+
+    render_report_job("card_tree_report")
+
+    card_tree_report = st.session_state.get("card_tree_report")
+    if card_tree_report:
+        st.success(f"✅ {len(card_tree_report['nodes'])} cards e {len(card_tree_report['edges'])} arestas encontrados.")
+        if card_tree_report["source"] in CACHE_SOURCE_LABELS:
+            st.caption(CACHE_SOURCE_LABELS[card_tree_report["source"]])
+        if card_tree_report["truncated"]:
+            st.warning("⚠️ O limite de cards visitados foi atingido; a árvore está incompleta.")
+        if card_tree_report["failed_ids"]:
+            st.warning(f"⚠️ Não foi possível expandir os cards: {', '.join(card_tree_report['failed_ids'])}")
+
+        st.markdown("#### 🗂️ Cards")
+        render_paginated_dataframe(card_tree_report["nodes"], key="card_tree_nodes_table")
+        st.markdown("#### 🔗 Arestas")
+        render_paginated_dataframe(card_tree_report["edges"], key="card_tree_edges_table")
+        render_run_summary(card_tree_report.get("run_summary"), card_tree_report.get("trace"), key="card_tree_report")
+
+        st.download_button(
+            label="📤 Baixar Árvore em Excel",
+            data=card_tree_report["excel"],
+            file_name="arvore_cards_conectados.xlsx",
+            mime=EXCEL_MIME,
+            key="card_tree_report_excel"
+        )
+
+st.markdown("---")
+
+# Busca na biblioteca de queries (nome, tags e campos da query) e filtro por tags
+search_col, tags_col = st.columns([2, 1])
+with search_col:
+    query_search = st.text_input("🔎 Buscar query salva", key="query_search")
+with tags_col:
+    query_tags_filter = st.multiselect("🏷️ Tags", query_store.all_tags(), key="query_tags_filter")
+query_names = query_store.search(query_search, query_tags_filter)
 selected_query = st.selectbox("📂 Escolher uma query salva", [""] + query_names)
-query_text = saved_queries.get(selected_query, "")
+selected_entry = query_store.get(selected_query) if selected_query else None
+query_text = selected_entry["query"] if selected_entry else ""
+if selected_entry and selected_entry["tags"]:
+    st.caption("Tags: " + ", ".join(selected_entry["tags"]))
 
-# Extração de parâmetros variáveis
-param_matches = re.findall(r"\$\$([^$]+)\$\$|\$([^$\n]+)\$", query_text)
-params = [m[0] if m[0] else m[1] for m in param_matches]
+# Extração de parâmetros variáveis da query do editor (a query é compilada uma única vez por
+# texto, ver query_templates.py). O editor fica mais abaixo, então o texto editado é lido do
+# session_state; a chave muda com a query escolhida, o que recarrega o editor com ela
+query_editor_key = f"query_editor_{selected_query}"
+edited_query = st.session_state.get(query_editor_key, query_text)
+compiled_query = compile_query_template(edited_query)
+params = compiled_query.params
 param_values = {}
+batch_param = None
 if params:
     st.subheader("🧩 Campos Variáveis da Query")
+    # Modo em lote: um dos campos recebe uma lista de valores e a query roda uma vez para cada um
+    if st.checkbox("📚 Modo em lote: executar a query para uma lista de valores", key="query_batch_mode"):
+        batch_param = st.selectbox("Campo variável do lote", params, key="query_batch_param")
+        batch_values_text = st.text_area(
+            f"Valores de {batch_param} (um por linha, ou separados por vírgula)", key="query_batch_values"
+        )
     for p in params:
-        if f"$$" + p + "$$" in query_text:
+        if p == batch_param:
+            continue
+        if p in compiled_query.multiline:
             param_values[p] = st.text_area(f"{p} (multilinha)")
         else:
             param_values[p] = st.text_input(f"{p}")
 
-# Substituir campos na query
-final_query = query_text
-for k, v in param_values.items():
-    final_query = final_query.replace(f"$$" + k + "$$", v).replace(f"$" + k + "$", v)
-
+# O editor mostra a query com os campos variáveis: os valores são enviados como variáveis
+# GraphQL na execução, sem alterar o texto da query
 with st.expander("⚙️ Configurações Avançadas"):
-    edited_query = st.text_area("✍️ Editar Query GraphQL", value=final_query, height=300)
+    edited_query = st.text_area("✍️ Editar Query GraphQL", value=query_text, height=300, key=query_editor_key)
     with st.expander("💾 Salvar esta query"):
-        new_name = st.text_input("Nome para salvar a query")
+        new_name = st.text_input("Nome para salvar a query", value=selected_query)
+        new_tags = st.text_input(
+            "Tags (separadas por vírgula)",
+            value=", ".join(selected_entry["tags"]) if selected_entry else ""
+        )
         if st.button("Salvar query"):
-            if new_name:
-                saved_queries[new_name] = edited_query
-                with open(QUERIES_FILE, "w", encoding="utf-8") as f:
-                    json.dump(saved_queries, f, indent=2, ensure_ascii=False)
-                st.success(f"Query '{new_name}' salva!")
+            if new_name.strip():
+                query_store.save(new_name, edited_query, new_tags.split(","))
+                st.success(f"Query '{new_name.strip()}' salva!")
             else:
                 st.warning("⚠️ Informe um nome válido.")
     col_limit = st.number_input("🔧 Limite máximo de colunas antes de criar subtabela", min_value=1, max_value=50, value=6, step=1)
 
-# Executar a query
-if st.button("▶️ Executar Query"):
+# Executar a query em lote
+if batch_param:
+    if st.button("▶️ Executar Query em Lote"):
+        batch_values = parse_batch_values(batch_values_text)
+        if not st.session_state.get('token') or not edited_query.strip():
+            st.warning("⚠️ Token e query são obrigatórios.")
+        elif not batch_values:
+            st.warning(f"⚠️ Informe pelo menos um valor para {batch_param}.")
+        elif batch_param not in compile_query_template(edited_query).params:
+            st.warning(f"⚠️ A query editada não contém mais o campo variável {batch_param}.")
+        else:
+            st.session_state.pop("query_batch_result", None)
+            start_report_job(
+                "query_batch_result",
+                f"Query em lote ({len(batch_values)} valores de {batch_param})",
+                query_batch_job,
+                edited_query,
+                batch_param,
+                batch_values,
+                st.session_state.get('token'),
+                col_limit,
+                fixed_values=param_values
+            )
+
+render_report_job("query_batch_result")
+query_batch_result = st.session_state.get("query_batch_result")
+if query_batch_result:
+    st.success(
+        f"✅ Query executada para {query_batch_result['values']} valores: "
+        f"{len(query_batch_result['df_main'])} linhas na tabela principal."
+    )
+    if query_batch_result["failed_values"]:
+        st.warning(
+            "⚠️ Resultado incompleto: a API do Pipefy não respondeu para "
+            f"{', '.join(query_batch_result['failed_values'])}. Execute novamente para tentar buscá-los."
+        )
+    if query_batch_result["empty_values"]:
+        st.info(f"ℹ️ Sem registros para: {', '.join(query_batch_result['empty_values'])}")
+    render_run_summary(query_batch_result.get("run_summary"), query_batch_result.get("trace"), key="query_batch_result")
+
+    if query_batch_result["excel"] is not None:
+        st.subheader("📊 Tabela Principal (lote)")
+        render_paginated_dataframe(query_batch_result["df_main"], key="query_batch_main_table")
+        for sub_name, df_sub in query_batch_result["sub_tables"].items():
+            st.markdown(f"#### 📄 Subtabela: `{sub_name}`")
+            render_paginated_dataframe(df_sub, key=f"query_batch_sub_table_{sub_name}")
+        st.download_button(
+            label="📤 Baixar resultado do lote em Excel",
+            data=query_batch_result["excel"],
+            file_name="resultado_pipefy_lote.xlsx",
+            mime=EXCEL_MIME,
+            key="query_batch_result_excel"
+        )
+
+# Executar a query (fora do modo em lote)
+if not batch_param and st.button("▶️ Executar Query"):
     if not st.session_state.get('token') or not edited_query.strip():
         st.warning("⚠️ Token e query são obrigatórios.")
     else:
-        try:
-            with st.spinner("🔄 Executando query..."):
-                result = execute_graphql_query(edited_query, st.session_state.get('token'))
-            st.success("✅ Query executada com sucesso.")
-
-            with st.expander("🔍 Logs de Execução"):
-                with st.expander("📥 Resposta bruta"):
-                    st.json(result)
-                st.write("🔎 Buscando listas aninhadas (ex: parent_relations[*].cards[*])...")
-                nested_list = extract_nested_lists(result.get("data", {}))
-
-                if nested_list:
-                    st.write(f"✅ Lista extraída com sucesso: {len(nested_list)} registros encontrados.")
-                    st.write("🧾 Preview do primeiro item:")
-                    st.json(nested_list[0])
-                else:
-                    st.warning("❌ Nenhuma sublista encontrada com chave 'cards'.")
-                    st.stop()
-            
-            # Flatten com subtabelas
-            flattened_rows = []
-            all_sub_tables = {}
-            for rec in nested_list:
-                flat, sub = flatten_record_with_lists(rec, list_field_limit=col_limit)
-                flattened_rows.append(flat)
-                for subname, rows in sub.items():
-                    all_sub_tables.setdefault(subname, []).extend(rows)
+        # Consulta interativa: passa à frente dos relatórios em lote no agendador do token
+        with record_run("query_runner") as run, request_context(session_owner()):
+            try:
+                with st.spinner("🔄 Executando query..."):
+                    with stage("Execução da query"):
+                        query, variables = compile_query_template(edited_query).render(param_values)
+                        result = execute_graphql_query(query, st.session_state.get('token'), variables)
+                with stage("Extração das listas"):
+                    nested_list = extract_nested_lists(result.get("data", {}))
 
-            df_main = pd.DataFrame(flattened_rows)
-            st.subheader("📊 Tabela Principal")
-            st.dataframe(df_main)
-            for sub_name, sub_data in all_sub_tables.items():
-                df_sub = pd.DataFrame(sub_data)
-                st.markdown(f"#### 📄 Subtabela: `{sub_name}`")
-                st.dataframe(df_sub)
-
-            # Exportar Excel
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                df_main.to_excel(writer, index=False, sheet_name="Principal")
-                for tab_name, sub_data in all_sub_tables.items():
-                    df_sub = pd.DataFrame(sub_data)
-                    df_sub.to_excel(writer, index=False, sheet_name=tab_name[:31])
-            st.download_button(
-                label="📤 Baixar resultado em Excel",
-                data=output.getvalue(),
-                file_name="resultado_pipefy.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+                # Flatten com subtabelas
+                flattened_rows = []
+                all_sub_tables = {}
+                with stage("Flatten"):
+                    for rec in nested_list:
+                        flat, sub = flatten_record_with_lists(rec, list_field_limit=col_limit)
+                        flattened_rows.append(flat)
+                        for subname, rows in sub.items():
+                            all_sub_tables.setdefault(subname, []).extend(rows)
+
+                with stage("DataFrame"):
+                    import pandas as pd
+
+                    df_main = pd.DataFrame(flattened_rows)
+                    sub_dfs = {sub_name: pd.DataFrame(sub_data) for sub_name, sub_data in all_sub_tables.items()}
+                with stage("Exportação (Excel/CSV)"):
+                    excel = dataframes_to_excel_bytes({"Principal": df_main, **sub_dfs}) if nested_list else None
+                run.add_rows(len(df_main))
+                st.session_state["query_result"] = {
+                    "result": result,
+                    "nested_list": nested_list,
+                    "df_main": df_main,
+                    "sub_tables": sub_dfs,
+                    "excel": excel,
+                    "run_summary": run.summary(),
+                    "trace": run.to_jsonl(),
+                }
+            except Exception as e:
+                st.session_state.pop("query_result", None)
+                st.error("❌ Erro ao executar a query.")
+                run.mark_error()
+                st.exception(e)
 
-        except Exception as e:
-            st.error("❌ Erro ao executar a query.")
-            st.exception(e)
+# Exibe o último resultado guardado (sobrevive às reexecuções de paginação/ordenação)
+query_result = st.session_state.get("query_result")
+if query_result:
+    st.success("✅ Query executada com sucesso.")
+    nested_list = query_result["nested_list"]
+    render_run_summary(query_result.get("run_summary"), query_result.get("trace"), key="query_result")
+
+    with st.expander("🔍 Logs de Execução"):
+        with st.expander("📥 Resposta bruta"):
+            st.json(query_result["result"])
+        st.write("🔎 Buscando listas aninhadas (ex: parent_relations[*].cards[*])...")
+
+        if nested_list:
+            st.write(f"✅ Lista extraída com sucesso: {len(nested_list)} registros encontrados.")
+            st.write("🧾 Preview do primeiro item:")
+            st.json(nested_list[0])
+        else:
+            st.warning("❌ Nenhuma sublista encontrada com chave 'cards'.")
+            st.stop()
+
+    st.subheader("📊 Tabela Principal")
+    render_paginated_dataframe(query_result["df_main"], key="query_main_table")
+    for sub_name, df_sub in query_result["sub_tables"].items():
+        st.markdown(f"#### 📄 Subtabela: `{sub_name}`")
+        render_paginated_dataframe(df_sub, key=f"query_sub_table_{sub_name}")
+
+    # Exportar Excel
+    st.download_button(
+        label="📤 Baixar resultado em Excel",
+        data=query_result["excel"],
+        file_name="resultado_pipefy.xlsx",
+        mime=EXCEL_MIME
+    )
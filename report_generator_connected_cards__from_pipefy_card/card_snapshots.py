@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (os contêineres rodam em Linux)
+    fcntl = None
+
+from report_cache import token_fingerprint
+from toolbox_common.shared_store import SHARED_DIR, replace_file
+
+# Onde ficam os snapshots do modo incremental: REPORT_SNAPSHOT_DIR ou, se não
+# definido, o diretório compartilhado entre as réplicas (ou a pasta da ferramenta)
+SNAPSHOT_DIR = os.environ.get("REPORT_SNAPSHOT_DIR") or os.path.join(
+    SHARED_DIR or os.path.dirname(os.path.abspath(__file__)), "report_snapshots"
+)
+
+_lock = threading.Lock()
+
+
+def empty_snapshot():
+    return {"cards": {}, "parents": {}, "watermark": None, "saved_at": None}
+
+
+def snapshot_path(token, directory=SNAPSHOT_DIR):
+    """
+    Arquivo do snapshot de um token (apenas a impressão digital do token
+    aparece no nome: cada token só enxerga os cards que a API lhe mostrou).
+    """
+    return os.path.join(directory, f"{token_fingerprint(token)}.json")
+
+
+def load_snapshot(token, directory=SNAPSHOT_DIR):
+    """
+    Lê o snapshot da execução anterior do token.
+
+    Returns:
+        dict: "cards" (ID -> card com updated_at), "parents" (ID de origem ->
+              IDs conectados), "watermark" (maior updated_at visto) e
+              "saved_at". Vazio se não houver snapshot ou se ele estiver ilegível.
+    """
+    path = snapshot_path(token, directory)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return empty_snapshot()
+    except (OSError, ValueError) as e:
+        print(f"Snapshot ilegível ({path}): {e}")
+        return empty_snapshot()
+    return dict(empty_snapshot(), **snapshot)
+
+
+@contextmanager
+def _snapshot_lock(path):
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def update_snapshot(token, update, directory=SNAPSHOT_DIR):
+    """
+    Mescla no snapshot do token os cards buscados em uma execução incremental
+    (ver `fetch_connected_cards_dataset_incremental` em pipefy_utils.py).
+
+    O snapshot é relido sob trava e gravado em um temporário renomeado
+    (os.replace), então execuções simultâneas sobre listas de IDs diferentes
+    somam seus cards em vez de apagar umas às outras. Cards que não são mais
+    de origem nem conectados a um card de origem são descartados. Falhas de
+    gravação são registradas e ignoradas: sem snapshot, a próxima execução
+    apenas busca tudo de novo.
+
+    Args:
+        token (str): O token de acesso (define o arquivo do snapshot).
+        update (dict): "cards" e "parents" dos cards de origem buscados.
+    """
+    path = snapshot_path(token, directory)
+    temp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with _snapshot_lock(path):
+            snapshot = load_snapshot(token, directory)
+            snapshot["parents"].update(update["parents"])
+            snapshot["cards"].update(update["cards"])
+            kept_ids = set(snapshot["parents"])
+            for connected_ids in snapshot["parents"].values():
+                kept_ids.update(connected_ids)
+            snapshot["cards"] = {card_id: card for card_id, card in snapshot["cards"].items() if card_id in kept_ids}
+            updated_at = [card.get("updated_at") for card in snapshot["cards"].values() if card.get("updated_at")]
+            snapshot["watermark"] = max(updated_at) if updated_at else None
+            snapshot["saved_at"] = time.time()
+
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp",
+                                             delete=False) as f:
+                temp_path = f.name
+                json.dump(snapshot, f, ensure_ascii=False)
+            # Mantém a permissão do snapshot anterior (o temporário é criado com 0600)
+            replace_file(temp_path, path)
+    except Exception as e:
+        print(f"Não foi possível gravar o snapshot ({path}): {e}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
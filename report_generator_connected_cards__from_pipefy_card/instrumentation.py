@@ -0,0 +1,236 @@
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from toolbox_common.metrics import record_api_call, track_action
+
+# Se definido, cada execução acrescenta seu trace (JSON lines) a este arquivo
+TRACE_FILE = os.environ.get("PIPEFY_TRACE_FILE")
+
+# Execução em andamento no contexto atual (cada sessão do Streamlit roda em sua própria thread)
+_current_run = contextvars.ContextVar("pipefy_current_run", default=None)
+
+
+def percentile(values, pct):
+    """
+    Calcula um percentil pelo método do posto mais próximo (nearest-rank).
+
+    Args:
+        values (list): Os valores medidos.
+        pct (float): O percentil desejado (0 a 100).
+
+    Returns:
+        float or None: O valor do percentil, ou None se não houver medições.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class RunRecorder:
+    """
+    Acumula as métricas de uma execução (um relatório ou uma query): requisições
+    à API, latências, bytes recebidos, novas tentativas, consultas ao cache e a
+    duração de cada etapa. Cada medição também vira um evento do trace.
+
+    É seguro para uso concorrente, já que as buscas em lote usam várias threads.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.finished_seconds = None
+        self.latencies = []
+        self.bytes_received = 0
+        self.retries = 0
+        self.errors = 0
+        self.cache_lookups = {}
+        self.stages = {}
+        self.rows = 0
+        self.failed = False
+        self.events = []
+        self._lock = threading.Lock()
+
+    def _add_event(self, event_type, **fields):
+        self.events.append({
+            "run_id": self.run_id,
+            "label": self.label,
+            "type": event_type,
+            "t": round(time.perf_counter() - self._started, 6),
+            **fields,
+        })
+
+    def record_request(self, latency_seconds, bytes_received, status_code):
+        with self._lock:
+            self.latencies.append(latency_seconds)
+            self.bytes_received += bytes_received
+            if status_code is None or status_code >= 400:
+                self.errors += 1
+            self._add_event("request", latency=round(latency_seconds, 6), bytes=bytes_received, status=status_code)
+
+    def record_retry(self, attempt, delay_seconds):
+        with self._lock:
+            self.retries += 1
+            self._add_event("retry", attempt=attempt, delay=round(delay_seconds, 6))
+
+    def record_cache_lookup(self, source):
+        with self._lock:
+            self.cache_lookups[source] = self.cache_lookups.get(source, 0) + 1
+            self._add_event("cache", source=source)
+
+    def record_stage(self, name, duration_seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + duration_seconds
+            self._add_event("stage", stage=name, duration=round(duration_seconds, 6))
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def mark_error(self):
+        """
+        Marca a execução como falha (para erros tratados pela interface).
+        """
+        self.failed = True
+
+    def summary(self):
+        """
+        Resume a execução até o momento.
+
+        Returns:
+            dict: Contadores, percentis de latência (p50/p95/p99, em segundos),
+                  taxa de acerto do cache e duração de cada etapa.
+        """
+        with self._lock:
+            latencies = list(self.latencies)
+            cache_lookups = dict(self.cache_lookups)
+            stages = dict(self.stages)
+            bytes_received = self.bytes_received
+            retries = self.retries
+            errors = self.errors
+        cache_hits = sum(count for source, count in cache_lookups.items() if source != "api")
+        total_lookups = sum(cache_lookups.values())
+        elapsed = self.finished_seconds if self.finished_seconds is not None else time.perf_counter() - self._started
+        return {
+            "run_id": self.run_id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "elapsed": elapsed,
+            "requests": len(latencies),
+            "errors": errors,
+            "retries": retries,
+            "bytes_received": bytes_received,
+            "latency_total": sum(latencies),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "cache_lookups": cache_lookups,
+            "cache_hit_rate": cache_hits / total_lookups if total_lookups else None,
+            "stages": stages,
+            "rows": self.rows,
+        }
+
+    def to_jsonl(self):
+        """
+        Serializa o trace da execução em JSON lines: um evento por linha e, por
+        último, uma linha com o resumo.
+        """
+        with self._lock:
+            events = list(self.events)
+        lines = [json.dumps(event, ensure_ascii=False) for event in events]
+        lines.append(json.dumps({"run_id": self.run_id, "label": self.label, "type": "summary", **self.summary()}, ensure_ascii=False))
+        return "\n".join(lines) + "\n"
+
+
+def current_run():
+    """
+    Retorna a execução em andamento no contexto atual, ou None.
+    """
+    return _current_run.get()
+
+
+@contextmanager
+def record_run(label, trace_file=TRACE_FILE):
+    """
+    Abre uma execução instrumentada: tudo o que for medido dentro do bloco
+    (inclusive nas threads das buscas em lote) é acumulado nela. A execução
+    também é contada nas métricas do processo (toolbox_common.metrics).
+
+    Args:
+        label (str): Identificador da execução (ex: "phase_report").
+        trace_file (str, opcional): Arquivo ao qual o trace é acrescentado ao final.
+
+    Yields:
+        RunRecorder: A execução em andamento.
+    """
+    run = RunRecorder(label)
+    token = _current_run.set(run)
+    try:
+        with track_action(label) as action:
+            try:
+                yield run
+            finally:
+                action.add_rows(run.rows)
+                if run.failed:
+                    action.mark_error()
+    finally:
+        _current_run.reset(token)
+        run.finished_seconds = time.perf_counter() - run._started
+        if trace_file:
+            try:
+                with open(trace_file, "a", encoding="utf-8") as f:
+                    f.write(run.to_jsonl())
+            except OSError as e:
+                print(f"Não foi possível gravar o trace em {trace_file}: {e}")
+
+
+@contextmanager
+def stage(name):
+    """
+    Mede a duração de uma etapa (ex: "excel") na execução em andamento.
+    Fora de uma execução, não faz nada.
+    """
+    run = current_run()
+    if run is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.record_stage(name, time.perf_counter() - started)
+
+
+def record_request(latency_seconds, bytes_received, status_code, api="pipefy"):
+    record_api_call(api, status_code, latency_seconds)
+    run = current_run()
+    if run is not None:
+        run.record_request(latency_seconds, bytes_received, status_code)
+
+
+def record_retry(attempt, delay_seconds):
+    run = current_run()
+    if run is not None:
+        run.record_retry(attempt, delay_seconds)
+
+
+def record_cache_lookup(source):
+    run = current_run()
+    if run is not None:
+        run.record_cache_lookup(source)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    Envia uma tarefa ao executor preservando o contexto atual, para que as
+    medições feitas nas threads do pool entrem na execução em andamento.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -1,7 +1,32 @@
 import requests
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import random
 import re
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+
+from instrumentation import record_request, record_retry, submit_in_context
+from query_templates import compile_query_template
+from toolbox_common.pipefy_transport import post_graphql
+
+def _build_accent_table():
+    """
+    Monta a tabela de `str.translate` que remove acentos e cedilha das letras
+    latinas, usando a decomposição Unicode (NFKD) de cada caractere.
+    """
+    table = {}
+    for code_point in range(0x00C0, 0x0250):
+        char = chr(code_point)
+        base = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+        if base != char and base.isascii() and base.isalpha():
+            table[code_point] = base
+    return table
+
+ACCENT_TABLE = _build_accent_table()
 
 def normalize_string(text):
     """
@@ -10,44 +35,273 @@ def normalize_string(text):
     """
     if not isinstance(text, str):
         return ""
-    text = text.lower()
-    replacements = {
-        'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
-        'é': 'e', 'ê': 'e',
-        'í': 'i',
-        'ó': 'o', 'õ': 'o', 'ô': 'o',
-        'ú': 'u',
-        'ç': 'c',
-    }
-    for accented, unaccented in replacements.items():
-        text = text.replace(accented, unaccented)
-    return text
+    return text.lower().translate(ACCENT_TABLE)
+
+# Filtros de fase conhecidos: nome do filtro -> (modo de comparação, nome alvo)
+PHASE_FILTERS = {
+    "Mudança de Embarque": ("contains", "Mudança de Embarque"),
+    "Desistências": ("startswith", "Desist"),
+}
+PHASE_MATCH_MODES = ("contains", "startswith", "equals", "regex")
+
+@lru_cache(maxsize=128)
+def compile_phase_matcher(target, mode="contains"):
+    """
+    Compila, uma única vez, um comparador de nomes de fase.
+
+    O nome da fase é normalizado (minúsculas, sem acentos) antes da comparação.
+    Nos modos "contains", "startswith" e "equals" o alvo também é normalizado;
+    no modo "regex" o alvo é uma expressão regular aplicada, sem diferenciar
+    maiúsculas, ao nome normalizado.
+
+    Args:
+        target (str): O nome (ou expressão regular) da fase buscada.
+        mode (str, opcional): Um dos modos de PHASE_MATCH_MODES.
+
+    Returns:
+        callable: Função que recebe o nome de uma fase e retorna True se ela corresponde ao alvo.
+    """
+    if mode == "regex":
+        pattern = re.compile(target, re.IGNORECASE)
+        return lambda phase_name: pattern.search(normalize_string(phase_name)) is not None
+
+    norm_target = normalize_string(target)
+    if mode == "contains":
+        return lambda phase_name: norm_target in normalize_string(phase_name)
+    if mode == "startswith":
+        return lambda phase_name: normalize_string(phase_name).startswith(norm_target)
+    if mode == "equals":
+        return lambda phase_name: normalize_string(phase_name) == norm_target
+    raise ValueError(f"Modo de comparação de fase desconhecido: {mode}")
+
+def get_phase_matcher(filter_type):
+    """
+    Retorna o comparador de fases de um filtro.
+
+    Args:
+        filter_type (str or tuple): "Nenhum Filtro", o nome de um filtro de
+            PHASE_FILTERS ou uma tupla (modo, nome alvo) para um filtro personalizado.
+
+    Returns:
+        callable or None: O comparador compilado, ou None quando não há filtro.
+    """
+    if filter_type in (None, "Nenhum Filtro"):
+        return None
+    mode, target = filter_type if isinstance(filter_type, tuple) else PHASE_FILTERS[filter_type]
+    return compile_phase_matcher(target, mode)
+
+def index_end_phases(pipe_phases_by_id, phase_matcher):
+    """
+    Indexa, por pipe, a primeira fase que corresponde ao comparador.
+
+    Cada fase de cada pipe é avaliada uma única vez; depois disso, encontrar a
+    fase de um card é apenas uma consulta ao dicionário.
+
+    Args:
+        pipe_phases_by_id (dict): Pipe ID -> dados do pipe (com a chave "phases").
+        phase_matcher (callable): O comparador de `get_phase_matcher`.
+
+    Returns:
+        dict: Pipe ID -> fase correspondente (dict com "id" e "name") ou None.
+    """
+    end_phases = {}
+    for pipe_id, pipe_data in pipe_phases_by_id.items():
+        end_phases[pipe_id] = next(
+            (phase for phase in pipe_data.get("phases", []) if phase_matcher(phase.get("name", ""))),
+            None
+        )
+    return end_phases
+
+CARD_ID_SEPARATORS = re.compile(r"[\s,;]+")
+CARD_ID_PATTERN = re.compile(r"^[0-9]+$")
+
+def parse_card_ids(text):
+    """
+    Normaliza, valida e deduplica uma lista de IDs de cards colada pelo usuário.
+
+    Aceita um ID por linha e também vírgulas, ponto e vírgula, espaços ou tabs
+    como separadores. Entradas vazias são ignoradas, entradas não numéricas são
+    rejeitadas e duplicatas são removidas mantendo a ordem da primeira ocorrência.
+
+    Args:
+        text (str): O texto com os IDs.
+
+    Returns:
+        dict: Com as chaves "card_ids" (IDs válidos e únicos), "invalid" (entradas
+              rejeitadas) e "duplicates" (quantidade de duplicatas removidas).
+    """
+    card_ids = []
+    seen_ids = set()
+    invalid = []
+    duplicates = 0
+
+    for raw_id in CARD_ID_SEPARATORS.split(text or ""):
+        card_id = raw_id.strip().strip("\"'#")
+        if not card_id:
+            continue
+        if not CARD_ID_PATTERN.match(card_id):
+            invalid.append(raw_id)
+        elif card_id in seen_ids:
+            duplicates += 1
+        else:
+            seen_ids.add(card_id)
+            card_ids.append(card_id)
 
-def execute_graphql_query(query, token):
+    return {"card_ids": card_ids, "invalid": invalid, "duplicates": duplicates}
+
+# Política de novas tentativas para falhas transitórias da API (5xx, 429, rede)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 20.0
+RETRY_MAX_ELAPSED_SECONDS = 90.0
+REQUEST_TIMEOUT_SECONDS = 60
+
+class PipefyUnavailableError(Exception):
+    """
+    Indica que a API do Pipefy continuou indisponível (circuito aberto) por
+    mais tempo do que o orçamento de novas tentativas permite.
+    """
+
+class CircuitBreaker:
+    """
+    Disjuntor compartilhado por todas as threads (e sessões) do processo.
+
+    Após `failure_threshold` falhas transitórias seguidas, o circuito abre e
+    todas as requisições aguardam `cooldown_seconds` antes de tentar de novo,
+    em vez de insistir contra uma API degradada. Depois da pausa, as requisições
+    voltam a ser liberadas; um sucesso fecha o circuito e uma nova falha o reabre.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown_seconds=15.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait_until_closed(self, deadline):
+        """
+        Bloqueia enquanto o circuito estiver aberto.
+
+        Raises:
+            PipefyUnavailableError: Se o circuito só fecharia depois de `deadline`.
+        """
+        with self._lock:
+            open_until = self._open_until
+        remaining = open_until - time.monotonic()
+        if remaining <= 0:
+            return
+        if open_until > deadline:
+            raise PipefyUnavailableError(
+                f"API do Pipefy indisponível (circuito aberto por mais {remaining:.0f}s)."
+            )
+        time.sleep(remaining)
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown_seconds
+                self._consecutive_failures = 0
+
+circuit_breaker = CircuitBreaker()
+
+def compute_retry_delay(attempt, retry_after=None):
+    """
+    Calcula a espera antes da próxima tentativa: backoff exponencial com jitter
+    completo, respeitando o cabeçalho Retry-After quando a API o informa.
+
+    Args:
+        attempt (int): O número da tentativa que acabou de falhar (começando em 1).
+        retry_after (float, opcional): Segundos pedidos pela API no Retry-After.
+
+    Returns:
+        float: Segundos a aguardar.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def _parse_retry_after(response):
+    """
+    Lê o cabeçalho Retry-After (em segundos), se presente e numérico.
+    """
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def execute_graphql_query(query, token, variables=None):
     """
     Executa uma query GraphQL na API do Pipefy e lida com a resposta.
 
     Esta função faz a chamada HTTP para a API do Pipefy usando um token de acesso
     e uma query GraphQL. É a função central para comunicação com o serviço.
 
+    Falhas transitórias (HTTP 429 e 5xx, erros de conexão e timeouts) são
+    repetidas com backoff exponencial e jitter, até RETRY_MAX_ATTEMPTS tentativas
+    e RETRY_MAX_ELAPSED_SECONDS segundos no total. O disjuntor `circuit_breaker`
+    pausa todas as requisições do processo quando a API está degradada.
+    O destino das requisições é definido pelo transporte configurado
+    (ver toolbox_common/pipefy_transport.py).
+
     Args:
         query (str): A string da query GraphQL a ser executada.
         token (str): O token de acesso Bearer para autenticação.
+        variables (dict, opcional): As variáveis GraphQL da query, enviadas à
+            parte do texto (que assim não muda de uma requisição para outra).
 
     Returns:
         dict: O resultado da requisição em formato JSON, se bem-sucedida.
     
     Raises:
-        requests.exceptions.HTTPError: Se a resposta da API for um erro HTTP.
+        requests.exceptions.HTTPError: Se a resposta da API for um erro HTTP
+            (definitivo, ou transitório após esgotar as novas tentativas).
+        PipefyUnavailableError: Se o circuito ficar aberto além do orçamento de tempo.
         Exception: Para outros erros inesperados na execução.
     """
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    response = requests.post("https://api.pipefy.com/graphql", json={"query": query}, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    deadline = time.monotonic() + RETRY_MAX_ELAPSED_SECONDS
+    attempt = 0
+    payload = {"query": query}
+    if variables:
+        payload["variables"] = variables
+
+    while True:
+        attempt += 1
+        circuit_breaker.wait_until_closed(deadline)
+
+        response = None
+        started = time.perf_counter()
+        try:
+            response = post_graphql(payload, token, timeout=REQUEST_TIMEOUT_SECONDS)
+            record_request(time.perf_counter() - started, len(response.content), response.status_code)
+            if response.status_code not in RETRY_STATUS_CODES:
+                circuit_breaker.record_success()
+                response.raise_for_status()
+                return response.json()
+            response.raise_for_status()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.HTTPError) as e:
+            if response is None:
+                record_request(time.perf_counter() - started, 0, None)
+            elif response.status_code not in RETRY_STATUS_CODES:
+                raise
+            last_error = e
+
+        circuit_breaker.record_failure()
+        delay = compute_retry_delay(attempt, _parse_retry_after(response))
+        if attempt >= RETRY_MAX_ATTEMPTS or time.monotonic() + delay > deadline:
+            raise last_error
+        print(f"Falha transitória na API do Pipefy ({last_error}); nova tentativa {attempt + 1} em {delay:.1f}s")
+        record_retry(attempt + 1, delay)
+        time.sleep(delay)
 
 def extract_nested_lists(obj):
     """
@@ -126,23 +380,52 @@ def flatten_record_with_lists(record, parent_key='', sep='_', list_field_limit=6
             items[new_key] = v
     return dict(items), dict(sub_tables)
 
+# Queries fixas: o ID vai em `variables`, então o texto é sempre o mesmo
+PIPE_PHASES_QUERY = """
+query ($id: ID!) {
+  pipe(id: $id) {
+    name
+    phases {
+      id
+      name
+    }
+  }
+}
+"""
+
+CARD_DETAILS_QUERY = """
+query ($id: ID!) {
+  card(id: $id) {
+    id
+    title
+    pipe {
+      id
+      name
+    }
+    current_phase {
+      id
+      name
+    }
+  }
+}
+"""
+
+PHASE_REQUIRED_FIELDS_QUERY = """
+query ($id: ID!) {
+  phase(id: $id) {
+    fields {
+      required
+    }
+  }
+}
+"""
+
 def get_pipe_phases(pipe_id, token):
     """
     Busca todas as fases de um pipe específico na API do Pipefy.
     """
-    query = f"""
-    query {{
-      pipe(id: "{pipe_id}") {{
-        name
-        phases {{
-          id
-          name
-        }}
-      }}
-    }}
-    """
     try:
-        result = execute_graphql_query(query, token)
+        result = execute_graphql_query(PIPE_PHASES_QUERY, token, {"id": str(pipe_id)})
         pipe_data = result.get("data", {}).get("pipe", {})
         return {
             "name": pipe_data.get("name", "Nome do Pipe"),
@@ -163,114 +446,688 @@ def get_card_details(card_id, token):
     Returns:
         dict: Dados do card (id, title, pipe, current_phase) ou None.
     """
-    query = f"""
-    query {{
-      card(id: "{card_id}") {{
-        id
-        title
-        pipe {{
-          id
-          name
-        }}
-        current_phase {{
-          id
-          name
-        }}
-      }}
-    }}
-    """
     try:
-        result = execute_graphql_query(query, token)
+        result = execute_graphql_query(CARD_DETAILS_QUERY, token, {"id": str(card_id)})
         return result.get("data", {}).get("card")
     except Exception as e:
         print(f"Erro ao buscar detalhes do card {card_id}: {e}")
         return None
 
-def generate_phase_report(card_ids, token, filter_type, include_original_cards):
+# Campos básicos de um card, usados por todos os relatórios de cards conectados
+CARD_SUMMARY_FIELDS = "id title pipe { id name } current_phase { id name }"
+
+# Seleção da busca única dos relatórios: união dos campos usados pelos três
+# relatórios (dados do próprio card e dos cards conectados)
+CONNECTED_CARDS_SELECTION = f"{CARD_SUMMARY_FIELDS} parent_relations {{ cards {{ {CARD_SUMMARY_FIELDS} }} }}"
+
+# Seleção usada na travessia em vários níveis (relações pai e filho)
+CARD_GRAPH_SELECTION = f"{CONNECTED_CARDS_SELECTION} child_relations {{ cards {{ {CARD_SUMMARY_FIELDS} }} }}"
+
+# Seleção de um pipe com suas fases e a obrigatoriedade dos campos de cada fase:
+# uma única query por lote de pipes responde tanto aos filtros de fase quanto à
+# verificação de campos obrigatórios
+PIPE_PHASES_SELECTION = "id name phases { id name fields { required } }"
+
+# Quantidade de objetos por requisição (via aliases) e requisições simultâneas
+CARD_BATCH_SIZE = 20
+CARD_BATCH_MAX_WORKERS = 4
+PHASE_BATCH_SIZE = 50
+
+@lru_cache(maxsize=64)
+def build_batch_document(object_type, size, selection):
     """
-    Gera um relatório de fases e pipes de cards conectados, com filtro por pipe.
+    Texto da query de um lote de `size` objetos, com aliases (ex: c0, c1, ...)
+    e um ID por variável ($c0, $c1, ...). Montado uma única vez por tamanho de
+    lote: todos os lotes do mesmo tamanho enviam exatamente o mesmo texto.
+    """
+    prefix = object_type[0]
+    definitions = ", ".join(f"${prefix}{idx}: ID!" for idx in range(size))
+    aliases = "\n".join(
+        f"  {prefix}{idx}: {object_type}(id: ${prefix}{idx}) {{ {selection} }}" for idx in range(size)
+    )
+    return f"query ({definitions}) {{\n{aliases}\n}}"
+
+def build_batch_query(object_type, object_ids, selection):
+    """
+    Monta uma única query GraphQL que busca vários objetos usando aliases (ex: c0, c1, ...).
 
     Args:
-        card_ids (list): Uma lista de IDs de card para buscar.
+        object_type (str): O campo raiz da API ("card", "pipe" ou "phase").
+        object_ids (list): Os IDs dos objetos do lote.
+        selection (str): Os campos a selecionar em cada objeto.
+
+    Returns:
+        tuple: (texto da query, dicionário de variáveis com os IDs).
+    """
+    prefix = object_type[0]
+    variables = {f"{prefix}{idx}": str(object_id) for idx, object_id in enumerate(object_ids)}
+    return build_batch_document(object_type, len(object_ids), selection), variables
+
+def build_cards_batch_query(card_ids, selection):
+    """
+    Monta uma única query GraphQL que busca vários cards usando aliases (c0, c1, ...).
+    """
+    return build_batch_query("card", card_ids, selection)
+
+def fetch_objects_batch(object_type, object_ids, token, selection, batch_size=CARD_BATCH_SIZE, max_workers=CARD_BATCH_MAX_WORKERS):
+    """
+    Busca vários objetos (cards, pipes ou fases) em lotes de queries com aliases,
+    executados em paralelo.
+
+    Args:
+        object_type (str): O campo raiz da API ("card", "pipe" ou "phase").
+        object_ids (list): Os IDs dos objetos a buscar (sem duplicatas).
         token (str): O token de acesso Bearer para autenticação.
-        filter_type (str): O tipo de filtro a ser aplicado ("Nenhum Filtro", "Mudança de Embarque" ou "Desistências").
-        include_original_cards (bool): Se deve incluir os cards de origem no relatório.
+        selection (str): Os campos a selecionar em cada objeto.
+        batch_size (int, opcional): Quantidade de objetos por requisição.
+        max_workers (int, opcional): Quantidade de requisições simultâneas.
 
     Returns:
-        list: Uma lista de dicionários, onde cada dicionário representa uma linha do relatório.
+        tuple: (dicionário ID -> dados do objeto, lista de IDs cujos lotes falharam).
+               Objetos inexistentes ou sem permissão simplesmente não aparecem no dicionário.
     """
-    
-    all_connected_cards = []
-
-    # 1A. Incluir cards de origem se solicitado
-    if include_original_cards:
-        for card_id in card_ids:
-            original_card_data = get_card_details(card_id.strip(), token)
-            if original_card_data:
-                all_connected_cards.append(original_card_data)
-
-    # 1B. Obter cards conectados
-    card_query_template = """
-    query {{
-      card(id: "{}") {{
-        parent_relations {{
-          cards {{
-            id
-            pipe {{
-              id
-              name
-            }}
-            current_phase {{
-              id
-              name
-            }}
-          }}
-        }}
-      }}
-    }}
-    """
-    for card_id in card_ids:
+    batches = [object_ids[i:i + batch_size] for i in range(0, len(object_ids), batch_size)]
+    objects_by_id = {}
+    failed_ids = []
+    if not batches:
+        return objects_by_id, failed_ids
+
+    prefix = object_type[0]
+
+    def run_batch(batch):
+        query, variables = build_batch_query(object_type, batch, selection)
+        result = execute_graphql_query(query, token, variables)
+        data = result.get("data") or {}
+        return {object_id: data.get(f"{prefix}{idx}") for idx, object_id in enumerate(batch)}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        futures = {submit_in_context(executor, run_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                found = future.result()
+            except Exception as e:
+                print(f"Erro ao buscar o lote de {object_type}s {futures[future]}: {e}")
+                failed_ids.extend(futures[future])
+                continue
+            for object_id, object_data in found.items():
+                if object_data:
+                    objects_by_id[object_id] = object_data
+
+    return objects_by_id, failed_ids
+
+def fetch_cards_batch(card_ids, token, selection, batch_size=CARD_BATCH_SIZE, max_workers=CARD_BATCH_MAX_WORKERS):
+    """
+    Busca vários cards em lotes de queries com aliases, executados em paralelo.
+
+    Returns:
+        tuple: (dicionário ID -> dados do card, lista de IDs cujos lotes falharam).
+    """
+    return fetch_objects_batch("card", card_ids, token, selection, batch_size, max_workers)
+
+# Valores de um lote: um por linha, ou separados por vírgula ou ponto e vírgula
+BATCH_VALUE_SEPARATORS = re.compile(r"[\r\n,;]+")
+# Quantidade de queries do lote reunidas em uma requisição (via aliases)
+QUERY_BATCH_SIZE = 10
+
+def parse_batch_values(text):
+    """
+    Normaliza e deduplica os valores de um lote colados pelo usuário (um por
+    linha, ou separados por vírgula ou ponto e vírgula), mantendo a ordem da
+    primeira ocorrência.
+    """
+    values = (value.strip() for value in BATCH_VALUE_SEPARATORS.split(text or ""))
+    return list(dict.fromkeys(value for value in values if value))
+
+def execute_query_batch(query_text, param, values, token, fixed_values=None, batch_size=QUERY_BATCH_SIZE,
+                        max_workers=CARD_BATCH_MAX_WORKERS, progress=None):
+    """
+    Executa uma query salva uma vez para cada valor de um campo variável.
+
+    A query é compilada uma única vez (query_templates.py) e os valores vão
+    em `variables`. As cópias da query são reunidas em lotes de `batch_size`
+    por requisição, com aliases (v0_, v1_, ...) nos campos do primeiro nível
+    e nas variáveis, e os lotes são executados em paralelo, como em
+    `fetch_objects_batch`. Queries que não podem ser agrupadas (mutations,
+    variáveis próprias ou fragmentos) são enviadas uma por requisição, também
+    em paralelo.
+
+    Args:
+        query_text (str): A query com os campos variáveis.
+        param (str): O nome do campo variável do lote.
+        values (list): Os valores do campo.
+        token (str): O token de acesso Bearer para autenticação.
+        fixed_values (dict, opcional): Os valores dos demais campos variáveis.
+        batch_size (int, opcional): Quantidade de queries por requisição.
+        max_workers (int, opcional): Quantidade de requisições simultâneas.
+        progress (callable, opcional): Chamada como progress(valores_concluídos, total)
+            a cada lote encerrado; uma exceção levantada nela interrompe o lote.
+
+    Returns:
+        tuple: (dicionário valor -> "data" da resposta daquele valor, lista de
+               valores cujos lotes falharam).
+
+    Raises:
+        ValueError: Se algum valor não puder ser convertido para o tipo da sua variável.
+    """
+    compiled = compile_query_template(query_text)
+    values = list(dict.fromkeys(values))
+    values_for = {value: dict(fixed_values or {}, **{param: value}) for value in values}
+    if not compiled.batchable:
+        batch_size = 1
+    batches = [values[i:i + batch_size] for i in range(0, len(values), batch_size)]
+    data_by_value = {}
+    failed_values = []
+    if not batches:
+        return data_by_value, failed_values
+    # Valida (e converte) todos os valores antes da primeira requisição
+    for value in values:
+        compiled.render(values_for[value])
+
+    def run_batch(batch):
+        if batch_size == 1:
+            query, variables = compiled.render(values_for[batch[0]])
+            result = execute_graphql_query(query, token, variables)
+            return {batch[0]: result.get("data") or {}}
+        query, variables = compiled.render_batch([values_for[value] for value in batch])
+        data = execute_graphql_query(query, token, variables).get("data") or {}
+        found = {}
+        for idx, value in enumerate(batch):
+            prefix = f"v{idx}_"
+            found[value] = {key[len(prefix):]: item for key, item in data.items() if key.startswith(prefix)}
+        return found
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        futures = {submit_in_context(executor, run_batch, batch): batch for batch in batches}
         try:
-            query = card_query_template.format(card_id.strip())
-            result = execute_graphql_query(query, token)
-            connected_cards = extract_nested_lists(result.get("data", {}))
-            all_connected_cards.extend(connected_cards)
-        except Exception as e:
-            print(f"Erro ao processar o card ID {card_id}: {e}")
+            for future in as_completed(futures):
+                try:
+                    data_by_value.update(future.result())
+                except Exception as e:
+                    print(f"Erro ao executar o lote da query para {futures[future]}: {e}")
+                    failed_values.extend(futures[future])
+                done += len(futures[future])
+                if progress is not None:
+                    progress(done, len(values))
+        except BaseException:
+            # Ex: cancelamento do job levantado em `progress`: descarta os lotes ainda na fila
+            for future in futures:
+                future.cancel()
+            raise
+
+    return data_by_value, failed_values
+
+def assemble_connected_cards_dataset(unique_ids, fetched_cards, failed_card_ids):
+    """
+    Monta o conjunto de dados dos relatórios a partir dos cards de origem já
+    buscados (cada um com seus "parent_relations").
+
+    Args:
+        unique_ids (list): Os IDs dos cards de origem, sem duplicatas, na ordem da entrada.
+        fetched_cards (dict): ID -> dados do card de origem com suas conexões.
+        failed_card_ids (list): IDs que não puderam ser buscados.
+
+    Returns:
+        dict: O conjunto de dados (ver `fetch_connected_cards_dataset`).
+    """
+    original_cards = {}
+    connected_cards = {}
+    sources_by_card = {}
+
+    for card_id in unique_ids:
+        card_data = fetched_cards.get(card_id)
+        if not card_data:
+            continue
+
+        original = {k: v for k, v in card_data.items() if k != "parent_relations"}
+        original_cards.setdefault(original.get("id"), original)
+
+        for connected in extract_nested_lists(card_data.get("parent_relations") or []):
+            connected_id = connected.get("id")
+            connected_cards.setdefault(connected_id, connected)
+            sources = sources_by_card.setdefault(connected_id, [])
+            if card_id not in sources:
+                sources.append(card_id)
+
+    return {
+        "original_cards": list(original_cards.values()),
+        "connected_cards": list(connected_cards.values()),
+        "sources_by_card": sources_by_card,
+        "failed_ids": {"card": failed_card_ids},
+    }
+
+def fetch_connected_cards_dataset(card_ids, token):
+    """
+    Busca uma única vez os cards de origem e seus cards conectados, em lotes
+    de queries com aliases.
+
+    O conjunto de dados retornado alimenta todos os relatórios de cards
+    conectados, de forma que gerar vários relatórios sobre os mesmos IDs custe
+    uma única busca. Os cards são deduplicados por ID, e o mapeamento
+    origem -> conectado é preservado em "sources_by_card".
+
+    Args:
+        card_ids (list): Uma lista de IDs de card para buscar.
+        token (str): O token de acesso Bearer para autenticação.
+
+    Returns:
+        dict: Conjunto de dados com as chaves:
+            - "original_cards": cards de origem encontrados (sem duplicatas).
+            - "connected_cards": cards conectados (sem duplicatas).
+            - "sources_by_card": para cada card conectado, os IDs dos cards de origem que levam a ele.
+            - "failed_ids": IDs perdidos ({"card": [...]}) após esgotar as novas tentativas.
+
+        O conjunto de dados fica em cache e é compartilhado pelos relatórios: eles
+        apenas o leem e devolvem as próprias falhas (pipes e fases) junto das linhas.
+    """
+    # Cada ID de origem é buscado uma única vez, mesmo que repetido na entrada
+    unique_ids = list(dict.fromkeys(card_id.strip() for card_id in card_ids if card_id.strip()))
+    fetched_cards, failed_card_ids = fetch_cards_batch(unique_ids, token, CONNECTED_CARDS_SELECTION)
+    return assemble_connected_cards_dataset(unique_ids, fetched_cards, failed_card_ids)
+
+# Modo incremental: campos de cada card guardados no snapshot (os do resumo e a
+# data da última alteração) e a seleção completa dos cards de origem
+CARD_SNAPSHOT_FIELDS = f"{CARD_SUMMARY_FIELDS} updated_at"
+INCREMENTAL_CARDS_SELECTION = f"{CARD_SNAPSHOT_FIELDS} parent_relations {{ cards {{ {CARD_SNAPSHOT_FIELDS} }} }}"
+# Verificação barata dos cards já conhecidos: só a data da última alteração e a fase atual
+CARD_PROBE_SELECTION = "id updated_at current_phase { id }"
+CARD_PROBE_BATCH_SIZE = 100
+
+# Alterações de um card desde a execução anterior, da mais à menos importante
+CHANGE_NEW = "Novo"
+CHANGE_PHASE = "Mudou de fase"
+CHANGE_RELATIONS = "Conexões alteradas"
+CHANGE_UPDATED = "Atualizado"
+CHANGE_COLUMN = "Alteração desde a última execução"
+
+def _phase_id(card):
+    return (card.get("current_phase") or {}).get("id")
+
+def _snapshot_card(card):
+    # Só os campos de CARD_SNAPSHOT_FIELDS vão para o snapshot
+    return {field: card.get(field) for field in ("id", "title", "pipe", "current_phase", "updated_at")}
+
+def detect_card_change(previous, current, previous_relations=None, current_relations=None):
+    """
+    Compara um card com a sua versão do snapshot anterior.
+
+    Args:
+        previous (dict or None): O card no snapshot (None se ele não existia).
+        current (dict): O card atual.
+        previous_relations (list, opcional): IDs conectados no snapshot (cards de origem).
+        current_relations (list, opcional): IDs conectados agora (cards de origem).
+
+    Returns:
+        str or None: CHANGE_NEW, CHANGE_PHASE, CHANGE_RELATIONS, CHANGE_UPDATED ou None (sem alteração).
+    """
+    if previous is None:
+        return CHANGE_NEW
+    if _phase_id(previous) != _phase_id(current):
+        return CHANGE_PHASE
+    if previous_relations is not None and set(previous_relations) != set(current_relations or ()):
+        return CHANGE_RELATIONS
+    if previous.get("updated_at") != current.get("updated_at"):
+        return CHANGE_UPDATED
+    return None
+
+def fetch_connected_cards_dataset_incremental(card_ids, token, snapshot, full_refresh=False):
+    """
+    Versão incremental de `fetch_connected_cards_dataset`: reaproveita o
+    snapshot da execução anterior e busca de novo apenas o que mudou.
+
+    1. Os cards de origem já conhecidos e seus cards conectados passam por uma
+       verificação barata (id, updated_at e fase atual, CARD_PROBE_BATCH_SIZE
+       cards por requisição).
+    2. Cards de origem novos, alterados (updated_at ou fase diferente do
+       snapshot) ou com um card conectado que deixou de existir são buscados
+       por completo, com as conexões.
+    3. Cards conectados alterados de origens não alteradas são buscados só
+       com os campos do resumo.
+    4. O restante vem do snapshot, e cada card alterado é marcado em "changes".
+
+    Args:
+        card_ids (list): Uma lista de IDs de card para buscar.
+        token (str): O token de acesso Bearer para autenticação.
+        snapshot (dict): O snapshot anterior ("cards": ID -> card, "parents": ID de
+            origem -> IDs conectados, "watermark"); ver card_snapshots.py.
+        full_refresh (bool, opcional): Busca todos os cards de origem por
+            completo (sem a verificação), mas ainda compara com o snapshot.
+
+    Returns:
+        tuple: (conjunto de dados, atualização do snapshot). O conjunto de dados
+               tem as chaves de `fetch_connected_cards_dataset` e também
+               "changes" (ID -> alteração) e "incremental" (contagens da execução).
+               A atualização tem "cards" e "parents" dos cards de origem buscados.
+    """
+    unique_ids = list(dict.fromkeys(card_id.strip() for card_id in card_ids if card_id.strip()))
+    previous_cards = snapshot.get("cards") or {}
+    previous_parents = snapshot.get("parents") or {}
+
+    # 1. Verificação barata dos cards de origem já conhecidos e de seus cards conectados
+    known_sources = [] if full_refresh else [card_id for card_id in unique_ids if card_id in previous_parents]
+    probe_ids = list(dict.fromkeys(
+        known_sources + [connected_id for card_id in known_sources for connected_id in previous_parents[card_id]]
+    ))
+    probed, failed_probe_ids = fetch_cards_batch(probe_ids, token, CARD_PROBE_SELECTION,
+                                                 batch_size=CARD_PROBE_BATCH_SIZE)
+    failed_probe_ids = set(failed_probe_ids)
+
+    def is_stale(card_id):
+        # Sem resposta, inexistente ou diferente do snapshot: precisa ser buscado de novo
+        current = probed.get(card_id)
+        if current is None:
+            return True
+        previous = previous_cards.get(card_id) or {}
+        return current.get("updated_at") != previous.get("updated_at") or _phase_id(current) != _phase_id(previous)
+
+    def vanished(card_id):
+        return card_id not in probed and card_id not in failed_probe_ids
+
+    stale_ids = {card_id for card_id in probe_ids if is_stale(card_id)}
+
+    # 2. Cards de origem buscados por completo (com as conexões)
+    refetch_sources = [
+        card_id for card_id in unique_ids
+        if card_id not in known_sources or card_id in stale_ids
+        or any(vanished(connected_id) for connected_id in previous_parents[card_id])
+    ]
+    fetched_sources, failed_source_ids = fetch_cards_batch(refetch_sources, token, INCREMENTAL_CARDS_SELECTION)
+    parents = {
+        card_id: [
+            _snapshot_card(connected)
+            for relation in card_data.get("parent_relations") or [] for connected in relation.get("cards") or []
+        ]
+        for card_id, card_data in fetched_sources.items()
+    }
+
+    # 3. Cards conectados alterados de cards de origem reaproveitados
+    reused_sources = [card_id for card_id in known_sources if card_id not in set(refetch_sources)]
+    refetch_connected = list(dict.fromkeys(
+        connected_id for card_id in reused_sources for connected_id in previous_parents[card_id]
+        if connected_id in stale_ids
+    ))
+    fetched_connected, failed_connected_ids = fetch_cards_batch(refetch_connected, token, CARD_SNAPSHOT_FIELDS)
+
+    # 4. Mescla: os cards de origem reaproveitados (ou cuja busca falhou) voltam
+    #    ao formato da busca completa, montados a partir do snapshot
+    def summary(card_id):
+        return fetched_connected.get(card_id) or previous_cards.get(card_id)
+
+    merged_sources = {}
+    snapshot_update = {"cards": {}, "parents": {}}
+    for card_id in unique_ids:
+        if card_id in fetched_sources:
+            card, connected = _snapshot_card(fetched_sources[card_id]), parents[card_id]
+        elif card_id in previous_parents and previous_cards.get(card_id) and (
+                card_id in reused_sources or card_id in failed_source_ids):
+            card = previous_cards[card_id]
+            connected = [summary(connected_id) for connected_id in previous_parents[card_id]]
+            connected = [_snapshot_card(connected_card) for connected_card in connected if connected_card]
+        else:
+            continue
+        merged_sources[card_id] = dict(card, parent_relations=[{"cards": connected}])
+        snapshot_update["parents"][card_id] = [connected_card.get("id") for connected_card in connected]
+        snapshot_update["cards"][card_id] = card
+        for connected_card in connected:
+            snapshot_update["cards"].setdefault(connected_card.get("id"), connected_card)
+
+    failed_ids = list(dict.fromkeys(failed_source_ids + failed_connected_ids))
+    dataset = assemble_connected_cards_dataset(unique_ids, merged_sources, failed_ids)
+
+    changes = {}
+    for card in dataset["original_cards"] + dataset["connected_cards"]:
+        card_id = card.get("id")
+        if card_id in changes:
+            continue
+        is_source = card_id in snapshot_update["parents"]
+        change = detect_card_change(
+            previous_cards.get(card_id), card,
+            previous_parents.get(card_id) if is_source else None,
+            snapshot_update["parents"][card_id] if is_source else None
+        )
+        if change:
+            changes[card_id] = change
+
+    dataset["changes"] = changes
+    dataset["incremental"] = {
+        "checked": len(probe_ids),
+        "refetched": len(refetch_sources) + len(refetch_connected),
+        "reused": len(reused_sources),
+        "changed": len(changes),
+        "watermark": snapshot.get("watermark"),
+    }
+    return dataset, snapshot_update
+
+def annotate_report_changes(report_rows, dataset):
+    """
+    Acrescenta às linhas de um relatório a coluna CHANGE_COLUMN, com o que
+    mudou desde a execução anterior (modo incremental).
+
+    Linhas de card ("Card ID") recebem a alteração do próprio card; linhas de
+    fase ("Fase ID") recebem quantos cards alterados estão nela.
+
+    Returns:
+        list: As mesmas linhas, com a coluna nova.
+    """
+    changes = dataset.get("changes") or {}
+    changed_by_phase = {}
+    for card in dataset["original_cards"] + dataset["connected_cards"]:
+        if card.get("id") in changes:
+            changed_by_phase.setdefault(_phase_id(card), set()).add(card.get("id"))
+
+    for row in report_rows:
+        if "Card ID" in row:
+            row[CHANGE_COLUMN] = changes.get(row["Card ID"], "")
+        elif "Fase ID" in row:
+            count = len(changed_by_phase.get(row["Fase ID"], ()))
+            row[CHANGE_COLUMN] = f"{count} card(s) alterado(s)" if count else ""
+    return report_rows
+
+def describe_lost_ids(dataset, report_failed_ids=None):
+    """
+    Lista os IDs que não puderam ser buscados (após esgotar as novas tentativas),
+    para que a interface possa avisar que o relatório está incompleto.
+
+    Args:
+        dataset (dict): O conjunto de dados (cards perdidos na busca).
+        report_failed_ids (dict, opcional): As falhas do próprio relatório
+            ({"pipe": [...], "phase": [...]}), devolvidas pelas funções build_*.
+
+    Returns:
+        list: Descrições como "Card 123", "Pipe 456" ou "Fase 789".
+    """
+    labels = {"card": "Card", "pipe": "Pipe", "phase": "Fase"}
+    failed_ids = dict(dataset["failed_ids"], **(report_failed_ids or {}))
+    return [
+        f"{labels[object_type]} {object_id}"
+        for object_type, object_ids in failed_ids.items()
+        for object_id in object_ids
+    ]
+
+def traverse_connected_cards(card_ids, token, max_depth=3, max_nodes=500, follow_children=True,
+                             batch_size=CARD_BATCH_SIZE, max_workers=CARD_BATCH_MAX_WORKERS):
+    """
+    Percorre em largura (BFS) a árvore de cards conectados a partir dos cards de origem.
+
+    Cada nível (fronteira) é buscado em lotes de queries com aliases. Um conjunto
+    de visitados garante que cada card seja buscado uma única vez, mesmo em
+    grafos com ciclos ou cards alcançáveis por vários caminhos.
+
+    Args:
+        card_ids (list): Os IDs dos cards de origem (profundidade 0).
+        token (str): O token de acesso Bearer para autenticação.
+        max_depth (int, opcional): Quantidade máxima de saltos a partir da origem.
+        max_nodes (int, opcional): Quantidade máxima de cards visitados.
+        follow_children (bool, opcional): Se deve seguir também as relações filho
+            (`child_relations`), além das relações pai (`parent_relations`).
+        batch_size (int, opcional): Quantidade de cards por requisição.
+        max_workers (int, opcional): Quantidade de requisições simultâneas.
+
+    Returns:
+        dict: Com as chaves:
+            - "nodes": linhas com os dados de cada card visitado e sua profundidade.
+            - "edges": lista de arestas (Card Pai -> Card Filho) encontradas.
+            - "truncated": True se o limite de cards interrompeu a travessia.
+            - "failed_ids": IDs cujos lotes falharam e não puderam ser expandidos.
+    """
+    relation_keys = ["parent_relations", "child_relations"] if follow_children else ["parent_relations"]
+    selection = CARD_GRAPH_SELECTION if follow_children else CONNECTED_CARDS_SELECTION
+
+    frontier = list(dict.fromkeys(card_id.strip() for card_id in card_ids if card_id.strip()))[:max_nodes]
+    depth_by_id = {card_id: 0 for card_id in frontier}
+    cards_by_id = {}
+    edges = {}
+    failed_ids = []
+    truncated = False
+    depth = 0
+
+    while frontier:
+        fetched_cards, failed = fetch_cards_batch(frontier, token, selection, batch_size, max_workers)
+        failed_ids.extend(failed)
+        next_frontier = []
+
+        for card_id in frontier:
+            card_data = fetched_cards.get(card_id)
+            if not card_data:
+                continue
+            cards_by_id[card_id] = {k: v for k, v in card_data.items() if k not in relation_keys}
+
+            for relation_key in relation_keys:
+                for neighbor in extract_nested_lists(card_data.get(relation_key) or []):
+                    neighbor_id = neighbor.get("id")
+                    if not neighbor_id:
+                        continue
+
+                    if neighbor_id not in depth_by_id:
+                        if len(depth_by_id) >= max_nodes:
+                            truncated = True
+                            continue
+                        depth_by_id[neighbor_id] = depth + 1
+                        # Os dados básicos já vêm na relação; só a expansão exige nova busca
+                        cards_by_id.setdefault(neighbor_id, neighbor)
+                        next_frontier.append(neighbor_id)
+
+                    # parent_relations traz os pais do card; child_relations, os filhos
+                    edge = (neighbor_id, card_id) if relation_key == "parent_relations" else (card_id, neighbor_id)
+                    edges.setdefault(edge, depth + 1)
+
+        depth += 1
+        # Cards na profundidade máxima ficam com os dados da relação, sem nova busca
+        frontier = next_frontier if depth < max_depth else []
+
+    nodes = []
+    for card_id, card_depth in depth_by_id.items():
+        card = cards_by_id.get(card_id)
+        if not card:
+            continue
+        nodes.append({
+            "Card ID": card_id,
+            "Card Título": card.get("title"),
+            "Pipe ID": (card.get("pipe") or {}).get("id"),
+            "Pipe Nome": (card.get("pipe") or {}).get("name"),
+            "Fase Atual ID": (card.get("current_phase") or {}).get("id"),
+            "Fase Atual Nome": (card.get("current_phase") or {}).get("name"),
+            "Profundidade": card_depth
+        })
+
+    edge_rows = [
+        {"Card Pai": parent_id, "Card Filho": child_id, "Profundidade": edge_depth}
+        for (parent_id, child_id), edge_depth in edges.items()
+    ]
+
+    return {"nodes": nodes, "edges": edge_rows, "truncated": truncated, "failed_ids": failed_ids}
+
+def select_report_cards(dataset, include_original_cards):
+    """
+    Retorna os cards que entram em um relatório, sem duplicatas por ID.
+
+    Args:
+        dataset (dict): O conjunto de dados de `fetch_connected_cards_dataset`.
+        include_original_cards (bool): Se deve incluir os cards de origem.
+
+    Returns:
+        list: Os cards de origem (se solicitado) seguidos dos cards conectados.
+    """
+    cards = dataset["original_cards"] + dataset["connected_cards"] if include_original_cards else dataset["connected_cards"]
+    seen_ids = set()
+    unique_cards = []
+    for card in cards:
+        if card.get("id") not in seen_ids:
+            seen_ids.add(card.get("id"))
+            unique_cards.append(card)
+    return unique_cards
+
+def format_card_sources(dataset, card_id):
+    """
+    Retorna, separados por vírgula, os IDs dos cards de origem que levam a um card conectado.
+    """
+    return ", ".join(dataset["sources_by_card"].get(card_id, []))
+
+def fetch_report_pipes(pipe_ids, token):
+    """
+    Busca, em lotes com aliases, as fases (e a obrigatoriedade dos campos de
+    cada fase) dos pipes de um relatório.
+
+    Args:
+        pipe_ids (iterable): Os IDs dos pipes necessários.
+        token (str): O token de acesso Bearer para autenticação.
+
+    Returns:
+        tuple: (Pipe ID -> {"name": ..., "phases": [...]} para todos os pipes pedidos,
+                Fase ID -> True/False (se a fase possui campos obrigatórios),
+                lista de IDs de pipes cujos lotes falharam).
+    """
+    pipe_ids = list(dict.fromkeys(pipe_ids))
+    fetched_pipes, failed_pipe_ids = fetch_objects_batch("pipe", pipe_ids, token, PIPE_PHASES_SELECTION)
+
+    pipe_phases_by_id = {}
+    phase_mandatory = {}
+    for pipe_id in pipe_ids:
+        pipe_data = fetched_pipes.get(pipe_id)
+        if not pipe_data:
+            # Mesmo retorno de get_pipe_phases em caso de erro
+            pipe_phases_by_id[pipe_id] = {"name": "Nome do Pipe", "phases": []}
             continue
 
+        phases = pipe_data.get("phases") or []
+        pipe_phases_by_id[pipe_id] = {"name": pipe_data.get("name", "Nome do Pipe"), "phases": phases}
+        for phase in phases:
+            phase_mandatory[phase.get("id")] = any(field.get("required") for field in phase.get("fields") or [])
+
+    return pipe_phases_by_id, phase_mandatory, failed_pipe_ids
+
+def build_phase_report(dataset, token, filter_type, include_original_cards):
+    """
+    Gera o relatório de fases e pipes a partir de um conjunto de dados já buscado.
+
+    Args:
+        dataset (dict): O conjunto de dados de `fetch_connected_cards_dataset`.
+        token (str): O token de acesso Bearer para autenticação.
+        filter_type (str or tuple): O filtro a ser aplicado ("Nenhum Filtro", um nome de
+            PHASE_FILTERS ou uma tupla (modo, nome alvo); ver `get_phase_matcher`).
+        include_original_cards (bool): Se deve incluir os cards de origem no relatório.
+
+    Returns:
+        tuple: (lista de dicionários, um por linha do relatório,
+                IDs perdidos pelo relatório: {"pipe": [...]}).
+    """
+    all_connected_cards = select_report_cards(dataset, include_original_cards)
+
     # 2. Identificar pipes únicos e aplicar filtro
     unique_pipe_ids = set(card.get("pipe", {}).get("id") for card in all_connected_cards if card.get("pipe", {}).get("id"))
-    filtered_pipes = {}
+    pipe_phases_by_id, _, failed_pipe_ids = fetch_report_pipes(unique_pipe_ids, token)
 
-    # Normaliza os alvos de filtro
-    norm_target_mudanca = normalize_string("Mudança de Embarque")
-    norm_target_desist = normalize_string("Desist")
-    
-    for pipe_id in unique_pipe_ids:
-        pipe_data = get_pipe_phases(pipe_id, token)
-        if pipe_data:
-            phases = pipe_data["phases"]
-            should_include_pipe = False
-            
-            if filter_type == "Nenhum Filtro":
-                should_include_pipe = True
-            else:
-                for phase in phases:
-                    phase_name = phase.get("name", "")
-                    norm_phase_name = normalize_string(phase_name)
-                    
-                    # FILTRO ROBUSTO: Verifica se o nome normalizado contém o alvo normalizado
-                    if filter_type == "Mudança de Embarque" and norm_target_mudanca in norm_phase_name:
-                        should_include_pipe = True
-                        break
-                    # FILTRO ROBUSTO: Verifica se o nome normalizado começa com o alvo normalizado
-                    elif filter_type == "Desistências" and norm_phase_name.startswith(norm_target_desist):
-                        should_include_pipe = True
-                        break
-            
-            if should_include_pipe:
-                filtered_pipes[pipe_id] = pipe_data["name"]
+    # Comparador compilado uma vez por relatório; cada fase de cada pipe é avaliada uma única vez
+    phase_matcher = get_phase_matcher(filter_type)
+    if phase_matcher is None:
+        filtered_pipes = {pipe_id: pipe_data["name"] for pipe_id, pipe_data in pipe_phases_by_id.items()}
+    else:
+        end_phases = index_end_phases(pipe_phases_by_id, phase_matcher)
+        filtered_pipes = {
+            pipe_id: pipe_data["name"]
+            for pipe_id, pipe_data in pipe_phases_by_id.items()
+            if end_phases[pipe_id] is not None
+        }
 
     # 3. Construir o relatório final
     final_report = []
@@ -290,100 +1147,94 @@ def generate_phase_report(card_ids, token, filter_type, include_original_cards):
             })
             processed_phases.add((pipe_id, phase_id))
             
-    return final_report
+    return final_report, {"pipe": failed_pipe_ids}
+
+def generate_phase_report(card_ids, token, filter_type, include_original_cards):
+    """
+    Gera um relatório de fases e pipes de cards conectados, com filtro por pipe.
+
+    Args:
+        card_ids (list): Uma lista de IDs de card para buscar.
+        token (str): O token de acesso Bearer para autenticação.
+        filter_type (str): O tipo de filtro a ser aplicado ("Nenhum Filtro", "Mudança de Embarque" ou "Desistências").
+        include_original_cards (bool): Se deve incluir os cards de origem no relatório.
+
+    Returns:
+        list: Uma lista de dicionários, onde cada dicionário representa uma linha do relatório.
+    """
+    dataset = fetch_connected_cards_dataset(card_ids, token)
+    report_rows, _ = build_phase_report(dataset, token, filter_type, include_original_cards)
+    return report_rows
 
 def check_phase_for_mandatory_fields(phase_id, token):
     """
     Verifica se uma fase possui campos obrigatórios.
     """
-    query = f"""
-    query {{
-      phase(id: "{phase_id}") {{
-        fields {{
-          required
-        }}
-      }}
-    }}
-    """
     try:
-        result = execute_graphql_query(query, token)
+        result = execute_graphql_query(PHASE_REQUIRED_FIELDS_QUERY, token, {"id": str(phase_id)})
         fields = result.get("data", {}).get("phase", {}).get("fields", [])
         return any(field.get("required") for field in fields)
     except Exception as e:
         print(f"Erro ao verificar campos obrigatórios para a fase {phase_id}: {e}")
         return False
 
-def get_connected_cards_with_mandatory_fields(card_ids, token, include_original_cards):
+def check_phases_for_mandatory_fields(phase_ids, token, batch_size=PHASE_BATCH_SIZE):
     """
-    Obtém uma lista de cards conectados cujas fases possuem campos obrigatórios.
+    Verifica, em lotes de queries com aliases, se cada fase possui campos obrigatórios.
+
+    Args:
+        phase_ids (list): Os IDs das fases (sem duplicatas).
+        token (str): O token de acesso Bearer para autenticação.
+        batch_size (int, opcional): Quantidade de fases por requisição.
+
+    Returns:
+        tuple: (dicionário Fase ID -> True/False, lista de IDs de fases cujos lotes falharam).
+    """
+    fetched_phases, failed_phase_ids = fetch_objects_batch("phase", phase_ids, token, "fields { required }", batch_size)
+    phase_mandatory = {
+        phase_id: any(field.get("required") for field in phase_data.get("fields") or [])
+        for phase_id, phase_data in fetched_phases.items()
+    }
+    return phase_mandatory, failed_phase_ids
+
+def build_mandatory_fields_report(dataset, token, include_original_cards):
+    """
+    Gera o relatório de cards em fases com campos obrigatórios a partir de um
+    conjunto de dados já buscado.
     **EXCLUI O PIPE ID "302440540"**
 
     Args:
-        card_ids (list): Uma lista de IDs de card para buscar.
+        dataset (dict): O conjunto de dados de `fetch_connected_cards_dataset`.
         token (str): O token de acesso Bearer para autenticação.
         include_original_cards (bool): Se deve incluir os cards de origem no relatório.
 
     Returns:
-        list: Uma lista de dicionários, onde cada dicionário representa um card conectado que passou no filtro.
+        tuple: (lista de dicionários, um por card conectado que passou no filtro,
+                IDs perdidos pelo relatório: {"pipe": [...], "phase": [...]}).
     """
-    
-    all_connected_cards = []
-    
-    # 1A. Incluir cards de origem se solicitado
-    if include_original_cards:
-        for card_id in card_ids:
-            original_card_data = get_card_details(card_id.strip(), token)
-            if original_card_data:
-                all_connected_cards.append(original_card_data)
-                
-    # 1B. Obter cards conectados
-    card_query_template = """
-    query {{
-      card(id: "{}") {{
-        parent_relations {{
-          cards {{
-            id
-            title
-            pipe {{
-              id
-              name
-            }}
-            current_phase {{
-              id
-              name
-            }}
-          }}
-        }}
-      }}
-    }}
-    """
-    for card_id in card_ids:
-        try:
-            query = card_query_template.format(card_id.strip())
-            result = execute_graphql_query(query, token)
-            connected_cards = extract_nested_lists(result.get("data", {}))
-            all_connected_cards.extend(connected_cards)
-        except Exception as e:
-            print(f"Erro ao processar o card ID {card_id}: {e}")
-            continue
+    all_connected_cards = select_report_cards(dataset, include_original_cards)
 
-    # 2. Identificar fases únicas e verificar se possuem campos obrigatórios
-    unique_phases = {}
-    for card in all_connected_cards:
-        phase_id = card.get("current_phase", {}).get("id")
-        if phase_id and phase_id not in unique_phases:
-            unique_phases[phase_id] = {
-                "name": card.get("current_phase", {}).get("name"),
-                "has_mandatory_fields": False
-            }
+    PIPE_ID_EXCLUSAO = "302440540"
 
-    for phase_id in unique_phases.keys():
-        has_mandatory = check_phase_for_mandatory_fields(phase_id, token)
-        unique_phases[phase_id]["has_mandatory_fields"] = has_mandatory
+    # 2. Verificar se as fases atuais possuem campos obrigatórios: primeiro com
+    #    uma query por lote de pipes (que traz todas as fases com seus campos) e,
+    #    para as fases que ainda faltarem, com lotes de fases via aliases.
+    pipe_ids = set(
+        card.get("pipe", {}).get("id") for card in all_connected_cards
+        if card.get("pipe", {}).get("id") and card.get("pipe", {}).get("id") != PIPE_ID_EXCLUSAO
+    )
+    _, phase_mandatory, failed_pipe_ids = fetch_report_pipes(pipe_ids, token)
+
+    missing_phase_ids = list(dict.fromkeys(
+        card.get("current_phase", {}).get("id") for card in all_connected_cards
+        if card.get("current_phase", {}).get("id") and card.get("current_phase", {}).get("id") not in phase_mandatory
+        and card.get("pipe", {}).get("id") != PIPE_ID_EXCLUSAO
+    ))
+    checked_phases, failed_phase_ids = check_phases_for_mandatory_fields(missing_phase_ids, token)
+    phase_mandatory.update(checked_phases)
 
     # 3. Filtrar os cards: por campos obrigatórios E excluir pipe "302440540"
     filtered_cards = []
-    PIPE_ID_EXCLUSAO = "302440540"
     
     for card in all_connected_cards:
         pipe_id = card.get("pipe", {}).get("id")
@@ -393,109 +1244,68 @@ def get_connected_cards_with_mandatory_fields(card_ids, token, include_original_
             continue
             
         phase_id = card.get("current_phase", {}).get("id")
-        if phase_id in unique_phases and unique_phases[phase_id]["has_mandatory_fields"]:
+        if phase_mandatory.get(phase_id):
             filtered_cards.append({
                 "Card ID": card.get("id"),
                 "Card Título": card.get("title"),
                 "Pipe ID": pipe_id,
                 "Pipe Nome": card.get("pipe", {}).get("name"),
                 "Fase ID": phase_id,
-                "Fase Nome": card.get("current_phase", {}).get("name")
+                "Fase Nome": card.get("current_phase", {}).get("name"),
+                "Cards de Origem": format_card_sources(dataset, card.get("id"))
             })
 
-    return filtered_cards
+    return filtered_cards, {"pipe": failed_pipe_ids, "phase": failed_phase_ids}
 
-def generate_final_phase_report(card_ids, token, filter_type, include_original_cards):
+def get_connected_cards_with_mandatory_fields(card_ids, token, include_original_cards):
     """
-    Gera um relatório de cards conectados, incluindo a fase de fim de processo.
+    Obtém uma lista de cards conectados cujas fases possuem campos obrigatórios.
+    **EXCLUI O PIPE ID "302440540"**
 
     Args:
         card_ids (list): Uma lista de IDs de card para buscar.
         token (str): O token de acesso Bearer para autenticação.
-        filter_type (str): O tipo de filtro a ser aplicado ("Mudança de Embarque" ou "Desistências").
         include_original_cards (bool): Se deve incluir os cards de origem no relatório.
 
     Returns:
-        list: Uma lista de dicionários, onde cada dicionário representa uma linha do relatório.
+        list: Uma lista de dicionários, onde cada dicionário representa um card conectado que passou no filtro.
     """
-    
-    pipe_phases_cache = {}
-    all_connected_cards = []
-    
-    # 1A. Incluir cards de origem se solicitado
-    if include_original_cards:
-        for card_id in card_ids:
-            original_card_data = get_card_details(card_id.strip(), token)
-            if original_card_data:
-                all_connected_cards.append(original_card_data)
-
-    # 1B. Obter cards conectados
-    card_query_template = """
-    query {{
-      card(id: "{}") {{
-        title
-        parent_relations {{
-          cards {{
-            id
-            title
-            pipe {{
-              id
-              name
-            }}
-            current_phase {{
-              id
-              name
-            }}
-          }}
-        }}
-      }}
-    }}
-    """
-    for card_id in card_ids:
-        try:
-            query = card_query_template.format(card_id.strip())
-            result = execute_graphql_query(query, token)
-            connected_cards = extract_nested_lists(result.get("data", {}))
-            all_connected_cards.extend(connected_cards)
-        except Exception as e:
-            print(f"Erro ao processar o card ID {card_id}: {e}")
-            continue
+    dataset = fetch_connected_cards_dataset(card_ids, token)
+    report_rows, _ = build_mandatory_fields_report(dataset, token, include_original_cards)
+    return report_rows
+
+def build_final_phase_report(dataset, token, filter_type, include_original_cards):
+    """
+    Gera o relatório de fases de fim de processo a partir de um conjunto de
+    dados já buscado.
+
+    Args:
+        dataset (dict): O conjunto de dados de `fetch_connected_cards_dataset`.
+        token (str): O token de acesso Bearer para autenticação.
+        filter_type (str or tuple): O filtro da fase de fim de processo ("Mudança de Embarque",
+            "Desistências" ou uma tupla (modo, nome alvo); ver `get_phase_matcher`).
+        include_original_cards (bool): Se deve incluir os cards de origem no relatório.
+
+    Returns:
+        tuple: (lista de dicionários, um por linha do relatório,
+                IDs perdidos pelo relatório: {"pipe": [...]}).
+    """
+    all_connected_cards = select_report_cards(dataset, include_original_cards)
 
-    # 2. Construir o relatório final card por card
+    # 2. Indexar a fase de "fim de processo" de cada pipe (uma avaliação por fase)
+    unique_pipe_ids = set(card.get("pipe", {}).get("id") for card in all_connected_cards if card.get("pipe", {}).get("id"))
+    pipe_phases_by_id, _, failed_pipe_ids = fetch_report_pipes(unique_pipe_ids, token)
+    phase_matcher = get_phase_matcher(filter_type)
+    end_phases = index_end_phases(pipe_phases_by_id, phase_matcher) if phase_matcher else {}
+
+    # 3. Construir o relatório final card por card (a fase final é uma consulta ao índice)
     final_report = []
 
-    # Normaliza os alvos de filtro
-    norm_target_mudanca = normalize_string("Mudança de Embarque")
-    norm_target_desist = normalize_string("Desist")
-    
     for card in all_connected_cards:
         pipe_id = card.get("pipe", {}).get("id")
-        
-        end_phase_id = "N/A"
-        end_phase_name = "N/A"
-        
-        if pipe_id:
-            # Busca as fases do pipe do cache, ou da API se não estiver no cache
-            if pipe_id not in pipe_phases_cache:
-                pipe_phases_cache[pipe_id] = get_pipe_phases(pipe_id, token)["phases"]
-
-            phases_of_pipe = pipe_phases_cache[pipe_id]
-            
-            # Encontra a fase de "fim de processo"
-            for phase in phases_of_pipe:
-                phase_name = phase.get("name", "")
-                norm_phase_name = normalize_string(phase_name)
-                
-                # FILTRO ROBUSTO: Verifica se o nome normalizado contém o alvo normalizado
-                if filter_type == "Mudança de Embarque" and norm_target_mudanca in norm_phase_name:
-                    end_phase_id = phase.get("id", "N/A")
-                    end_phase_name = phase_name
-                    break
-                # FILTRO ROBUSTO: Verifica se o nome normalizado começa com o alvo normalizado
-                elif filter_type == "Desistências" and norm_phase_name.startswith(norm_target_desist):
-                    end_phase_id = phase.get("id", "N/A")
-                    end_phase_name = phase_name
-                    break
+        end_phase = end_phases.get(pipe_id) or {}
+        end_phase_id = end_phase.get("id", "N/A")
+        end_phase_name = end_phase.get("name", "N/A")
         
         final_report.append({
             "Card ID": card.get("id"),
@@ -505,7 +1315,25 @@ def generate_final_phase_report(card_ids, token, filter_type, include_original_c
             "Fase Atual ID": card.get("current_phase", {}).get("id"),
             "Fase Atual Nome": card.get("current_phase", {}).get("name"),
             "ID da Fase de Fim de Processo": end_phase_id,
-            "Nome da Fase de Fim de Processo": end_phase_name
+            "Nome da Fase de Fim de Processo": end_phase_name,
+            "Cards de Origem": format_card_sources(dataset, card.get("id"))
         })
             
-    return final_report
+    return final_report, {"pipe": failed_pipe_ids}
+
+def generate_final_phase_report(card_ids, token, filter_type, include_original_cards):
+    """
+    Gera um relatório de cards conectados, incluindo a fase de fim de processo.
+
+    Args:
+        card_ids (list): Uma lista de IDs de card para buscar.
+        token (str): O token de acesso Bearer para autenticação.
+        filter_type (str): O tipo de filtro a ser aplicado ("Mudança de Embarque" ou "Desistências").
+        include_original_cards (bool): Se deve incluir os cards de origem no relatório.
+
+    Returns:
+        list: Uma lista de dicionários, onde cada dicionário representa uma linha do relatório.
+    """
+    dataset = fetch_connected_cards_dataset(card_ids, token)
+    report_rows, _ = build_final_phase_report(dataset, token, filter_type, include_original_cards)
+    return report_rows
\ No newline at end of file
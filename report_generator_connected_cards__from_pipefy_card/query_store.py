@@ -0,0 +1,253 @@
+import bisect
+import json
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (os contêineres rodam em Linux)
+    fcntl = None
+
+from toolbox_common.shared_store import replace_file
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Peso de cada parte da query na busca (nome, tags e o texto da própria query)
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "query": 1.0}
+
+
+def normalize_text(text):
+    """
+    Remove os acentos e passa para minúsculas ("Relatório" -> "relatorio").
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def parse_tags(text):
+    """
+    Converte as tags digitadas (separadas por vírgula) em uma lista sem
+    repetições, mantendo a grafia da primeira ocorrência.
+    """
+    tags = {}
+    for tag in (text or "").split(","):
+        tag = tag.strip()
+        if tag and normalize_text(tag) not in tags:
+            tags[normalize_text(tag)] = tag
+    return list(tags.values())
+
+
+def _normalize_entry(value):
+    # Formato antigo: "nome": "texto da query"; formato novo: "nome": {"query": ..., "tags": [...]}
+    if isinstance(value, str):
+        return {"query": value, "tags": []}
+    return {"query": value.get("query", ""), "tags": list(value.get("tags") or [])}
+
+
+def _serialize_entry(entry):
+    # Queries sem tags continuam no formato antigo, legível por versões anteriores
+    return {"query": entry["query"], "tags": entry["tags"]} if entry["tags"] else entry["query"]
+
+
+class QueryStore:
+    """
+    Biblioteca de queries salvas (saved_queries.json), carregada uma vez por
+    processo e compartilhada pelas sessões.
+
+    O arquivo só é lido de novo quando muda (data de modificação e tamanho),
+    então as reexecuções do Streamlit não o releem. Cada gravação trava o
+    arquivo (flock em "<arquivo>.lock"), relê a versão atual do disco, aplica
+    a alteração e grava em um temporário renomeado (os.replace): duas
+    gravações simultâneas, de sessões ou de réplicas diferentes, não apagam
+    uma à outra, e um leitor nunca vê o arquivo pela metade.
+
+    Um índice em memória (termo -> queries) atende a busca por nome, tags e
+    campos da query.
+
+    Args:
+        path (str): Caminho do arquivo JSON.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._lock = threading.RLock()
+        self._signature = None
+        self._entries = {}
+        self._postings = {}
+        self._vocabulary = []
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_file(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return {name: _normalize_entry(value) for name, value in data.items()}
+
+    def _load(self, entries, signature):
+        self._entries = entries
+        self._signature = signature
+        postings = {}
+        for name, entry in entries.items():
+            texts = {"name": name, "tags": " ".join(entry["tags"]), "query": entry["query"]}
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in TOKEN_PATTERN.findall(normalize_text(texts[field])):
+                    by_name = postings.setdefault(token, {})
+                    by_name[name] = max(by_name.get(name, 0.0), weight)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def refresh(self):
+        """
+        Recarrega o arquivo se ele mudou desde a última leitura.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if signature != self._signature:
+                self._load(self._read_file(), signature)
+
+    def entries(self):
+        """
+        Retorna as queries salvas: nome -> {"query": texto, "tags": [...]}.
+        """
+        self.refresh()
+        with self._lock:
+            return dict(self._entries)
+
+    def get(self, name):
+        return self.entries().get(name)
+
+    def all_tags(self):
+        """
+        Retorna todas as tags usadas, em ordem alfabética.
+        """
+        tags = {}
+        for entry in self.entries().values():
+            for tag in entry["tags"]:
+                tags.setdefault(normalize_text(tag), tag)
+        return [tags[key] for key in sorted(tags)]
+
+    def search(self, text="", tags=()):
+        """
+        Busca as queries salvas.
+
+        Args:
+            text (str, opcional): Termos da busca; cada termo deve aparecer (como
+                palavra ou início de palavra) no nome, nas tags ou na query.
+            tags (iterable, opcional): Tags que a query precisa ter (todas).
+
+        Returns:
+            list: Os nomes encontrados, do mais relevante ao menos relevante
+                  (sem termos, em ordem alfabética).
+        """
+        entries = self.entries()
+        wanted_tags = {normalize_text(tag) for tag in tags}
+        names = [name for name, entry in entries.items()
+                 if wanted_tags <= {normalize_text(tag) for tag in entry["tags"]}]
+        terms = list(dict.fromkeys(TOKEN_PATTERN.findall(normalize_text(text))))
+        if not terms:
+            return sorted(names, key=normalize_text)
+
+        with self._lock:
+            postings, vocabulary = self._postings, self._vocabulary
+        scores = {name: 0.0 for name in names}
+        for term in terms:
+            # Melhor peso do termo (ou de uma palavra que começa com ele) em cada query
+            best = {}
+            position = bisect.bisect_left(vocabulary, term)
+            while position < len(vocabulary) and vocabulary[position].startswith(term):
+                token = vocabulary[position]
+                weight = 1.0 if token == term else 0.8
+                for name, field_weight in postings[token].items():
+                    best[name] = max(best.get(name, 0.0), weight * field_weight)
+                position += 1
+            scores = {name: score + best[name] for name, score in scores.items() if name in best}
+        return sorted(scores, key=lambda name: (-scores[name], normalize_text(name)))
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update(self, change):
+        # Lê a versão atual do disco sob a trava, aplica a alteração e grava de forma atômica
+        with self._file_lock():
+            entries = self._read_file()
+            change(entries)
+            directory = os.path.dirname(self.path)
+            temp_path = None
+            try:
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp",
+                                                 delete=False) as f:
+                    temp_path = f.name
+                    json.dump({name: _serialize_entry(entry) for name, entry in entries.items()},
+                              f, indent=2, ensure_ascii=False)
+                # Mantém a permissão do arquivo anterior (o temporário é criado com 0600)
+                replace_file(temp_path, self.path)
+            finally:
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self._load(entries, self._file_signature())
+
+    def save(self, name, query, tags=()):
+        """
+        Salva (ou substitui) uma query.
+
+        Args:
+            name (str): O nome da query.
+            query (str): O texto da query, com os campos variáveis.
+            tags (iterable, opcional): As tags da query.
+
+        Raises:
+            ValueError: Se o nome estiver vazio.
+        """
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("Informe um nome para a query.")
+        entry = {"query": query, "tags": parse_tags(",".join(tags))}
+
+        def change(entries):
+            entries[name] = entry
+
+        self._update(change)
+
+    def delete(self, name):
+        """
+        Remove uma query salva (nomes inexistentes são ignorados).
+        """
+        self._update(lambda entries: entries.pop(name, None))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_query_store(path):
+    """
+    Retorna a biblioteca de queries do arquivo `path`, compartilhada por todas
+    as sessões do processo.
+    """
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = QueryStore(path)
+        return store
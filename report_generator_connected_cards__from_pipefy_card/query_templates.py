@@ -0,0 +1,362 @@
+import json
+import re
+import unicodedata
+from functools import lru_cache
+
+# Campos variáveis das queries salvas: $Nome$ (uma linha) ou $$Nome$$ (multilinha), com
+# tipo GraphQL opcional ($Limite:Int$). Os nomes não contêm ( ) { } " , para não confundir
+# com variáveis GraphQL de verdade (ex: "query ($id: ID!) { card(id: $id) ... }")
+PLACEHOLDER_PATTERN = re.compile(
+    r"\$\$([^\s$(){}\",][^$\n(){}\",]*?)\$\$|\$([^\s$(){}\",][^$\n(){}\",]*?)(?<!\s)\$"
+)
+TYPE_SUFFIX_PATTERN = re.compile(r"^(.*?)\s*:\s*(\[?[_A-Za-z]\w*!?\]?!?)$")
+# Operação com uma única seleção: [query|mutation] [Nome] [(definições)] { seleção }
+OPERATION_PATTERN = re.compile(
+    r"^\s*(?:(query|mutation)\b\s*([_A-Za-z]\w*)?\s*(?:\(([^()]*)\))?\s*)?\{(.*)\}\s*$", re.S
+)
+ARGUMENT_NAME_PATTERN = re.compile(r"([_A-Za-z]\w*)\s*:\s*$")
+GRAPHQL_NAME_PATTERN = re.compile(r"[_A-Za-z]\w*")
+FRAGMENT_PATTERN = re.compile(r"\bfragment\s+[_A-Za-z]")
+# Valores aceitos fora de aspas quando o campo não vira variável: números, IDs, enums e
+# booleanos (o mesmo critério do gerador de mutations), nunca trechos de query
+INLINE_VALUE_PATTERN = re.compile(r"[\w.+-]*")
+
+
+def split_placeholder(raw_name):
+    """
+    Separa o nome e o tipo GraphQL explícito de um campo variável
+    ("Limite:Int" -> ("Limite", "Int"); "Card ID" -> ("Card ID", None)).
+    """
+    match = TYPE_SUFFIX_PATTERN.match(raw_name)
+    if match and match.group(1):
+        return match.group(1).strip(), match.group(2)
+    return raw_name.strip(), None
+
+
+def variable_name(param):
+    """
+    Nome de variável GraphQL para um campo variável ("Card ID" -> "card_id").
+    """
+    decomposed = unicodedata.normalize("NFKD", param)
+    ascii_name = "".join(char for char in decomposed if not unicodedata.combining(char))
+    name = re.sub(r"\W+", "_", ascii_name).strip("_").lower() or "valor"
+    return name if not name[0].isdigit() else f"v_{name}"
+
+
+def infer_variable_type(argument_name):
+    """
+    Tipo GraphQL de um campo variável usado como valor inteiro de um
+    argumento (entre aspas ou não): ID! para argumentos de ID (id, pipe_id,
+    pipeId, ...) e None para os demais, que podem ter qualquer tipo no schema
+    (String, DateTime, [UndefinedInput], ...) e por isso continuam no texto
+    da query.
+    """
+    if argument_name and (argument_name == "id" or argument_name.endswith(("_id", "Id"))):
+        return "ID!"
+    return None
+
+
+def coerce_value(value, graphql_type):
+    """
+    Converte o texto digitado para o tipo da variável (Int, Float e Boolean;
+    os demais tipos seguem como texto).
+
+    Raises:
+        ValueError: Se o texto não puder ser convertido.
+    """
+    base_type = graphql_type.strip("[]!")
+    value = "" if value is None else str(value)
+    if base_type == "Int":
+        return int(value) if value.strip() else None
+    if base_type == "Float":
+        return float(value) if value.strip() else None
+    if base_type == "Boolean":
+        return value.strip().lower() in ("true", "1", "sim", "s", "yes")
+    return value
+
+
+def _string_spans(text):
+    # Posições dentro de textos entre aspas e, para cada aspa de abertura, a de fechamento
+    inside = [False] * len(text)
+    spans = {}
+    opened_at = None
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if opened_at is not None:
+            inside[position] = True
+            if char == "\\":
+                if position + 1 < len(text):
+                    inside[position + 1] = True
+                position += 2
+                continue
+            if char == '"':
+                spans[opened_at] = position
+                opened_at = None
+        elif char == '"':
+            opened_at = position
+            inside[position] = True
+        position += 1
+    return inside, spans
+
+
+def alias_top_level_fields(selection, prefix):
+    """
+    Renomeia os campos do primeiro nível de uma seleção com aliases
+    prefixados (ex: `card(id: $id) {...}` -> `v3_card: card(id: $id) {...}`),
+    para que várias queries possam ser enviadas em uma única requisição.
+
+    Args:
+        selection (str): O conteúdo das chaves externas da query.
+        prefix (str): O prefixo dos aliases (ex: "v3_").
+
+    Returns:
+        str or None: A seleção com os aliases, ou None se ela não puder ser
+                     renomeada com segurança (fragmentos, chaves desbalanceadas).
+    """
+    if "..." in selection:
+        return None
+    parts = []
+    depth = 0
+    position = 0
+    expects_field_name = False
+    while position < len(selection):
+        char = selection[position]
+        if char == '"':
+            # Copia a string inteira (valores de argumentos), respeitando os escapes
+            end = position + 1
+            while end < len(selection) and selection[end] != '"':
+                end += 2 if selection[end] == "\\" else 1
+            if end >= len(selection):
+                return None
+            parts.append(selection[position:end + 1])
+            position = end + 1
+            continue
+        if char == "#":
+            end = selection.find("\n", position)
+            position = len(selection) if end == -1 else end
+            continue
+        if char in "{(":
+            depth += 1
+        elif char in "})":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif depth == 0 and (char == "@" or GRAPHQL_NAME_PATTERN.match(char)):
+            name_match = GRAPHQL_NAME_PATTERN.match(selection, position + (char == "@"))
+            if not name_match:
+                return None
+            name = name_match.group()
+            after_name = selection[name_match.end():].lstrip()
+            if char == "@" or expects_field_name:
+                # Diretiva ou nome do campo depois de um alias: mantém como está
+                parts.append(selection[position:name_match.end()])
+                expects_field_name = False
+            elif after_name.startswith(":"):
+                # O campo já tem um alias: só acrescenta o prefixo
+                parts.append(prefix + name)
+                expects_field_name = True
+            else:
+                parts.append(f"{prefix}{name}: {name}")
+            position = name_match.end()
+            continue
+        parts.append(char)
+        position += 1
+    if depth != 0:
+        return None
+    return "".join(parts)
+
+
+class CompiledQuery:
+    """
+    Uma query salva já analisada: os campos variáveis usados como valor de um
+    argumento viram variáveis GraphQL de verdade, enviadas à parte em
+    `variables`, e o texto da query fica fixo (o mesmo para qualquer valor).
+
+    Um campo variável vira variável quando tem tipo explícito (ex: first:
+    $Limite:Int$ ou due_date: "$Prazo:DateTime$") ou quando é o valor
+    inteiro de um argumento de ID, entre aspas ou não (ex: card(id: "$Card
+    ID$") ou allCards(pipeId: $Pipe$) -> card(id: $card_id), do tipo ID!).
+    Nos demais casos (ex: new_value: "$Valor$", cujo tipo no schema não é
+    String, ou no meio de um texto), o valor continua sendo inserido no
+    texto: escapado quando estiver entre aspas e, fora delas, só se for um
+    literal simples (INLINE_VALUE_PATTERN), para que um valor nunca altere a
+    estrutura da query.
+
+    Use `compile_query_template`, que guarda as queries compiladas.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.params = []
+        self.multiline = set()
+        # Variáveis criadas: (nome da variável, campo variável, tipo)
+        self.variables = []
+        self.operation = None
+        self.name = None
+        self.definitions = None
+        self._parts = []
+        self._compile()
+
+    def _compile(self):
+        operation = OPERATION_PATTERN.match(self.source)
+        self.structured = operation is not None and not FRAGMENT_PATTERN.search(self.source)
+        if self.structured:
+            self.operation, self.name, self.definitions = operation.group(1), operation.group(2), operation.group(3)
+            body_start, body_end = operation.span(4)
+        else:
+            body_start, body_end = 0, len(self.source)
+        self._head, self._tail = self.source[:body_start], self.source[body_end:]
+
+        in_string, string_spans = _string_spans(self.source)
+        variable_by_key = {}
+        cursor = body_start
+        parts = []
+        for match in PLACEHOLDER_PATTERN.finditer(self.source, body_start, body_end):
+            multiline = match.group(1) is not None
+            param, explicit_type = split_placeholder(match.group(1) if multiline else match.group(2))
+            if param not in self.params:
+                self.params.append(param)
+            if multiline:
+                self.multiline.add(param)
+            start, end = match.span()
+
+            # O campo ocupa um texto inteiro entre aspas (ex: "$Card ID$")?
+            quoted = start > 0 and string_spans.get(start - 1) == end
+            argument_start = start - 1 if quoted else start
+            graphql_type = None
+            if self.structured and (quoted or not in_string[start]):
+                argument = ARGUMENT_NAME_PATTERN.search(self.source[body_start:argument_start])
+                graphql_type = explicit_type or infer_variable_type(argument.group(1) if argument else None)
+            if graphql_type:
+                var = variable_by_key.get((param, graphql_type))
+                if var is None:
+                    taken = {name for name, _, _ in self.variables}
+                    var = base = variable_name(param)
+                    suffix = 2
+                    while var in taken:
+                        var = f"{base}_{suffix}"
+                        suffix += 1
+                    variable_by_key[(param, graphql_type)] = var
+                    self.variables.append((var, param, graphql_type))
+                parts.append(("text", self.source[cursor:argument_start]))
+                parts.append(("var", var))
+                cursor = end + 1 if quoted else end
+            else:
+                parts.append(("text", self.source[cursor:start]))
+                parts.append(("inline", param, in_string[start]))
+                cursor = end
+        parts.append(("text", self.source[cursor:body_end]))
+        self._parts = [part for part in parts if part != ("text", "")]
+
+    @property
+    def batchable(self):
+        """
+        Se cópias desta query podem ser reunidas em uma única requisição
+        (queries simples, sem variáveis próprias nem fragmentos).
+        """
+        return (self.structured and self.operation in (None, "query") and not (self.definitions or "").strip()
+                and alias_top_level_fields(self._render_selection({}, ""), "v0_") is not None)
+
+    def _render_selection(self, values, var_prefix):
+        rendered = []
+        for part in self._parts:
+            if part[0] == "text":
+                rendered.append(part[1])
+            elif part[0] == "var":
+                rendered.append(f"${var_prefix}{part[1]}")
+            else:
+                value = "" if values.get(part[1]) is None else str(values.get(part[1]))
+                if part[2]:
+                    rendered.append(json.dumps(value, ensure_ascii=False)[1:-1])
+                    continue
+                value = value.strip()
+                if not INLINE_VALUE_PATTERN.fullmatch(value):
+                    raise ValueError(f"Valor inválido para {part[1]}: {value!r}. Fora de aspas, o campo só aceita "
+                                     "números, IDs e nomes (letras, números, _, -, + e .).")
+                rendered.append(value)
+        return "".join(rendered)
+
+    def _bind(self, values, var_prefix=""):
+        bound = {}
+        for var, param, graphql_type in self.variables:
+            try:
+                bound[var_prefix + var] = coerce_value(values.get(param), graphql_type)
+            except ValueError:
+                raise ValueError(f"Valor inválido para {param} ({graphql_type}): {values.get(param)!r}")
+        return bound
+
+    def _definitions(self, var_prefix=""):
+        definitions = [self.definitions.strip()] if self.definitions and self.definitions.strip() else []
+        definitions += [f"${var_prefix}{var}: {graphql_type}" for var, _, graphql_type in self.variables]
+        return ", ".join(definitions)
+
+    def _check_values(self, values):
+        missing = [param for param in self.params if param not in values]
+        if missing:
+            raise ValueError(f"Valores ausentes para os campos variáveis: {', '.join(missing)}")
+
+    def render(self, values):
+        """
+        Monta a requisição para os valores informados.
+
+        Args:
+            values (dict): Campo variável -> valor digitado (todos os campos de `params`).
+
+        Returns:
+            tuple: (texto da query, dicionário de variáveis).
+
+        Raises:
+            ValueError: Se faltar o valor de um campo ou se um valor não puder
+                ser convertido para o tipo da variável.
+        """
+        self._check_values(values)
+        selection = self._render_selection(values, "")
+        if not self.variables:
+            # Nada a declarar: o texto segue como foi escrito (só com os valores inseridos)
+            return self._head + selection + self._tail, {}
+        header = f"{self.operation or 'query'} {self.name}" if self.name else f"{self.operation or 'query'} "
+        return f"{header}({self._definitions()}) {{{selection}}}", self._bind(values)
+
+    def render_batch(self, values_list):
+        """
+        Monta uma única requisição com uma cópia da query para cada conjunto de
+        valores: os campos do primeiro nível e as variáveis da cópia i recebem
+        o prefixo "v<i>_".
+
+        Returns:
+            tuple: (texto da query, dicionário de variáveis).
+
+        Raises:
+            ValueError: Se a query não puder ser agrupada (ver `batchable`) ou
+                se faltar o valor de um campo.
+        """
+        if not self.batchable:
+            raise ValueError("Esta query não pode ser agrupada com aliases.")
+        selections = []
+        definitions = []
+        variables = {}
+        for idx, values in enumerate(values_list):
+            self._check_values(values)
+            prefix = f"v{idx}_"
+            selection = alias_top_level_fields(self._render_selection(values, prefix), prefix)
+            if selection is None:
+                raise ValueError("Esta query não pode ser agrupada com aliases.")
+            selections.append(selection)
+            if self.variables:
+                definitions.append(self._definitions(prefix))
+            variables.update(self._bind(values, prefix))
+        header = f"query ({', '.join(definitions)}) " if definitions else "query "
+        return header + "{\n" + "\n".join(selections) + "\n}", variables
+
+
+@lru_cache(maxsize=256)
+def compile_query_template(query_text):
+    """
+    Compila (uma única vez por texto) uma query com campos variáveis.
+
+    Returns:
+        CompiledQuery: A query compilada; `params` lista os campos variáveis na
+                       ordem em que aparecem.
+    """
+    return CompiledQuery(query_text or "")
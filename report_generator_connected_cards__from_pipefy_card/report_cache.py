@@ -0,0 +1,145 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import record_cache_lookup
+from toolbox_common.shared_store import get_shared_store
+
+# Tempo de vida padrão dos relatórios em cache (pode ser ajustado por variável de ambiente)
+DEFAULT_TTL_SECONDS = int(os.environ.get("REPORT_CACHE_TTL_SECONDS", 15 * 60))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", 128))
+
+
+def token_fingerprint(token):
+    """
+    Gera uma impressão digital curta do token, para usar em chaves de cache
+    sem manter o token em texto puro.
+    """
+    return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+
+def make_report_key(report_type, card_ids, filter_type, include_original_cards, token):
+    """
+    Monta a chave de cache de um relatório.
+
+    Args:
+        report_type (str): Identificador do relatório (ex: "phase_report").
+        card_ids (list): Os IDs dos cards de origem.
+        filter_type (str or None): O filtro aplicado, se houver.
+        include_original_cards (bool): Se os cards de origem foram incluídos.
+        token (str): O token usado na consulta (apenas sua impressão digital entra na chave).
+
+    Returns:
+        tuple: A chave de cache (hashable).
+    """
+    return (
+        report_type,
+        tuple(card_id.strip() for card_id in card_ids),
+        filter_type,
+        bool(include_original_cards),
+        token_fingerprint(token),
+    )
+
+
+def make_dataset_key(card_ids, token, incremental=False):
+    """
+    Monta a chave de cache do conjunto de dados de cards conectados, que é
+    compartilhado por todos os relatórios sobre os mesmos IDs. O conjunto do
+    modo incremental (com as alterações marcadas) tem chave própria.
+    """
+    dataset_type = "connected_cards_dataset_incremental" if incremental else "connected_cards_dataset"
+    return make_report_key(dataset_type, card_ids, None, None, token)
+
+
+class TTLCache:
+    """
+    Cache em memória com tempo de vida por entrada e limite de tamanho (LRU).
+
+    É seguro para uso concorrente, já que várias sessões do Streamlit rodam em
+    threads diferentes do mesmo processo.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Retorna a tupla (encontrado, valor). Entradas expiradas são descartadas.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Cache compartilhado por todas as sessões deste processo
+process_cache = TTLCache()
+# Cache compartilhado entre as réplicas (None se TOOLBOX_SHARED_DIR não estiver definido)
+shared_cache = get_shared_store("report_cache", DEFAULT_TTL_SECONDS)
+
+
+def get_cached_report(session_cache, key, compute, force_refresh=False, should_cache=None):
+    """
+    Retorna o resultado de um relatório consultando primeiro o cache da sessão,
+    depois o cache do processo, o cache compartilhado entre as réplicas (se
+    configurado) e, só então, executando as chamadas à API.
+
+    Args:
+        session_cache (TTLCache): O cache guardado no session_state da sessão atual.
+        key (tuple): A chave do relatório (ver `make_report_key`).
+        compute (callable): Função sem argumentos que gera o relatório.
+        force_refresh (bool, opcional): Ignora os caches e consulta a API novamente.
+        should_cache (callable, opcional): Recebe o resultado e diz se ele pode ir
+            para o cache (ex: resultados incompletos não devem ser reaproveitados).
+
+    Returns:
+        tuple: (resultado, origem), onde origem é "session", "process", "shared" ou "api".
+    """
+    if not force_refresh:
+        found, value = session_cache.get(key)
+        if found:
+            record_cache_lookup("session")
+            return value, "session"
+        found, value = process_cache.get(key)
+        if found:
+            session_cache.set(key, value)
+            record_cache_lookup("process")
+            return value, "process"
+        if shared_cache is not None:
+            found, value = shared_cache.get(key)
+            if found:
+                session_cache.set(key, value)
+                process_cache.set(key, value)
+                record_cache_lookup("shared")
+                return value, "shared"
+
+    record_cache_lookup("api")
+    value = compute()
+    if should_cache is None or should_cache(value):
+        session_cache.set(key, value)
+        process_cache.set(key, value)
+        if shared_cache is not None:
+            shared_cache.set(key, value)
+    return value, "api"
@@ -0,0 +1,6 @@
+"""
+Módulos compartilhados entre as ferramentas da Caixa de Ferramentas.
+
+Cada aplicação Streamlit importa daqui os componentes comuns (visualização de
+tabelas, utilitários de infraestrutura etc.) em vez de duplicá-los.
+"""
@@ -0,0 +1,31 @@
+import sys
+
+from streamlit.web import cli
+
+from toolbox_common.metrics import start_metrics_server
+
+
+def main(argv=None):
+    """
+    Ponto de entrada dos contêineres das ferramentas: o mesmo que
+    `streamlit run <argumentos>`, mas com o endpoint de métricas (/metrics e
+    /healthz) iniciado assim que o contêiner sobe, e não apenas na primeira
+    visita à página.
+
+    O Streamlit roda no mesmo processo, então o `init_metrics` do script
+    reaproveita o servidor já aberto. Até a primeira execução do script, o
+    nome da ferramenta nas métricas vem de TOOLBOX_APP_NAME.
+
+    Args:
+        argv (list, opcional): Os argumentos do `streamlit run` (o script e as
+            opções; padrão: sys.argv[1:]).
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    start_metrics_server()
+    # As opções e as variáveis STREAMLIT_* são tratadas pela própria linha de comando do Streamlit
+    sys.argv = ["streamlit", "run"] + list(argv)
+    cli.main(prog_name="streamlit")
+
+
+if __name__ == "__main__":
+    main()
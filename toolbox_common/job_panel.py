@@ -0,0 +1,115 @@
+import uuid
+
+import streamlit as st
+
+from toolbox_common.jobs import ACTIVE_STATUSES, CANCELLED, DONE, FAILED, QUEUED, get_job_runner
+
+# Intervalo (em segundos) entre as atualizações do painel de um job em andamento
+JOB_POLL_SECONDS = 1.0
+
+
+def session_owner():
+    """
+    Identificador desta sessão do navegador, usado como dono dos jobs na fila
+    justa do JobRunner.
+    """
+    if "_toolbox_job_owner" not in st.session_state:
+        st.session_state["_toolbox_job_owner"] = uuid.uuid4().hex
+    return st.session_state["_toolbox_job_owner"]
+
+
+def submit_job(job_key, fn, *args, label=None, **kwargs):
+    """
+    Submete um job em segundo plano e guarda seu ID no session_state.
+
+    Args:
+        job_key (str): Chave do session_state onde o ID do job é guardado.
+        fn (callable): A função do job (recebe o Job como primeiro argumento).
+        label (str, opcional): Descrição exibida no painel.
+
+    Returns:
+        str: O ID do job.
+    """
+    job_id = get_job_runner().submit(fn, *args, owner=session_owner(), label=label, **kwargs)
+    st.session_state[job_key] = job_id
+    return job_id
+
+
+def job_is_active(job_key):
+    """
+    Indica se o job guardado em `job_key` ainda está na fila ou em execução.
+    """
+    job_id = st.session_state.get(job_key)
+    job = get_job_runner().get(job_id) if job_id else None
+    return job is not None and job.status in ACTIVE_STATUSES
+
+
+def _render_logs(snapshot):
+    # Mensagens mais recentes no topo, como no log do executor de mutations
+    if snapshot["logs"]:
+        with st.container(height=300):
+            st.code("\n".join(reversed(snapshot["logs"])), language=None)
+
+
+def render_job_panel(job_key, on_done, show_logs=False):
+    """
+    Acompanha o job guardado em `job_key`: enquanto ele está na fila ou em
+    execução, exibe o progresso (atualizado a cada JOB_POLL_SECONDS, sem
+    reexecutar o restante da página) e um botão de cancelamento.
+
+    Quando o job termina com sucesso, `on_done(resultado)` é chamado uma única
+    vez (para guardar o resultado no session_state); por isso o painel deve
+    ser exibido antes do resultado guardado. Falhas e cancelamentos ficam
+    visíveis até o próximo job.
+
+    Args:
+        job_key (str): Chave do session_state com o ID do job.
+        on_done (callable): Recebe o resultado do job concluído.
+        show_logs (bool, opcional): Exibe as mensagens de log do job.
+    """
+    job_id = st.session_state.get(job_key)
+    if not job_id:
+        return
+    runner = get_job_runner()
+    job = runner.get(job_id)
+    if job is None:
+        # Job expirado (ou de outro processo, após um reinício do contêiner)
+        st.session_state.pop(job_key, None)
+        st.warning("⚠️ O resultado da execução em segundo plano não está mais disponível. Execute novamente.")
+        return
+
+    if job.status in ACTIVE_STATUSES:
+        # Só o painel é reexecutado periodicamente, enquanto o job não termina
+        @st.fragment(run_every=JOB_POLL_SECONDS)
+        def job_progress():
+            snapshot = job.snapshot()
+            if snapshot["status"] not in ACTIVE_STATUSES:
+                # Reexecuta a página inteira, que exibe o resultado fora do painel
+                st.rerun()
+            if snapshot["status"] == QUEUED:
+                position = runner.queue_position(job_id)
+                text = f"⏳ {snapshot['label']}: na fila" + (f" (posição {position})" if position else "")
+            else:
+                text = f"🔄 {snapshot['label']}: {snapshot['message']}"
+            st.progress(snapshot["progress"], text=text)
+            if not snapshot["cancel_requested"] and st.button("⏹️ Cancelar", key=f"{job_key}_cancel"):
+                runner.cancel(job_id)
+            if show_logs:
+                _render_logs(snapshot)
+
+        job_progress()
+        return
+
+    snapshot = job.snapshot()
+    if snapshot["status"] == DONE:
+        st.session_state.pop(job_key, None)
+        on_done(snapshot["result"])
+    elif snapshot["status"] == FAILED:
+        st.error(f"❌ {snapshot['label']}: {snapshot['error']}")
+        if snapshot["error_details"]:
+            with st.expander("Detalhes do erro"):
+                st.code(snapshot["error_details"])
+    elif snapshot["status"] == CANCELLED:
+        st.info(f"⏹️ {snapshot['label']}: cancelado.")
+    if show_logs:
+        _render_logs(snapshot)
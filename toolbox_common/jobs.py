@@ -0,0 +1,331 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+
+from toolbox_common.metrics import Gauge, registry, current_app_name
+from toolbox_common.shared_store import get_shared_store
+
+# Threads de trabalho por processo (cada ferramenta roda em seu próprio contêiner)
+JOB_WORKERS = int(os.environ.get("TOOLBOX_JOB_WORKERS", 2))
+# Por quanto tempo um job encerrado continua disponível para a interface buscar o resultado
+JOB_RETENTION_SECONDS = float(os.environ.get("TOOLBOX_JOB_RETENTION_SECONDS", 3600))
+# Linhas de log mantidas por job (as mais antigas são descartadas)
+JOB_LOG_LIMIT = 2000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+JOBS_QUEUED = registry.register(Gauge(
+    "toolbox_jobs_queued", "Jobs aguardando uma thread de trabalho.", ("app",)
+), queue=True)
+
+
+class JobCancelled(Exception):
+    """
+    Interrompe um job cujo cancelamento foi pedido (ver `Job.check_cancelled`).
+    """
+
+
+class Job:
+    """
+    Um trabalho submetido ao JobRunner. A função do job recebe este objeto como
+    primeiro argumento, para informar o progresso, registrar mensagens de log e
+    verificar se o cancelamento foi pedido.
+    """
+
+    def __init__(self, owner, label, fn, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.label = label
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Na fila"
+        self.logs = deque(maxlen=JOB_LOG_LIMIT)
+        self.result = None
+        self.error = None
+        self.error_details = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Reconstrói um job encerrado a partir do seu snapshot (ex: gravado no
+        diário por outra réplica). O job reconstruído serve só para consulta.
+        """
+        job = cls(snapshot["owner"], snapshot["label"], None, (), {})
+        for field in ("id", "status", "progress", "message", "result", "error", "error_details",
+                      "created_at", "started_at", "finished_at"):
+            setattr(job, field, snapshot[field])
+        job.logs.extend(snapshot["logs"])
+        return job
+
+    def report_progress(self, fraction, message=None):
+        """
+        Atualiza o progresso (0 a 1) e, opcionalmente, a mensagem de status.
+        """
+        with self._lock:
+            self.progress = min(max(float(fraction), 0.0), 1.0)
+            if message is not None:
+                self.message = message
+
+    def log(self, message):
+        with self._lock:
+            self.logs.append(message)
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """
+        Levanta JobCancelled se o cancelamento foi pedido. Chame entre as etapas
+        de um job longo.
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def snapshot(self):
+        """
+        Retorna uma cópia consistente do estado do job, para a interface.
+        """
+        with self._lock:
+            return {
+                "id": self.id,
+                "owner": self.owner,
+                "label": self.label,
+                "status": self.status,
+                "progress": self.progress,
+                "message": self.message,
+                "logs": list(self.logs),
+                "result": self.result,
+                "error": self.error,
+                "error_details": self.error_details,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "cancel_requested": self._cancel_event.is_set(),
+            }
+
+
+class JobRunner:
+    """
+    Executa jobs em threads de trabalho, fora da execução do script do
+    Streamlit: o job continua mesmo que a sessão seja reexecutada ou
+    desconectada, e a interface acompanha o progresso pelo ID do job.
+
+    A fila é justa entre donos (ex: sessões): cada dono tem sua própria fila e
+    as threads atendem os donos em rodízio, então quem enfileira muitos jobs
+    não atrasa os demais.
+
+    Se TOOLBOX_SHARED_DIR estiver definido, cada job encerrado também é gravado
+    em um diário compartilhado, e `get` o encontra mesmo em outra réplica
+    (ex: depois de um reinício ou de uma mudança na quantidade de réplicas).
+    Os jobs em andamento continuam existindo só na réplica que os executa.
+
+    Args:
+        workers (int, opcional): Quantidade de threads de trabalho.
+        retention_seconds (float, opcional): Tempo que um job encerrado fica disponível.
+        journal (SharedDirStore, opcional): Diário dos jobs encerrados (padrão:
+            o armazenamento compartilhado "jobs", se configurado).
+    """
+
+    def __init__(self, workers=JOB_WORKERS, retention_seconds=JOB_RETENTION_SECONDS, journal=None):
+        self.workers = max(int(workers), 1)
+        self.retention_seconds = retention_seconds
+        self.journal = journal if journal is not None else get_shared_store("jobs", retention_seconds)
+        self._jobs = OrderedDict()
+        self._queues = {}
+        self._rotation = deque()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._app_name = None
+
+    def _ensure_workers(self):
+        # As threads são criadas sob demanda, na primeira submissão
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"toolbox-job-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, owner="anonymous", label=None, **kwargs):
+        """
+        Enfileira `fn(job, *args, **kwargs)`.
+
+        Args:
+            fn (callable): A função do job; seu retorno vira o resultado do job.
+            owner (str, opcional): Dono do job, usado na divisão justa da fila.
+            label (str, opcional): Descrição exibida na interface.
+
+        Returns:
+            str: O ID do job.
+        """
+        job = Job(owner, label or getattr(fn, "__name__", "job"), fn, args, kwargs)
+        with self._condition:
+            self._app_name = current_app_name()
+            self._prune()
+            self._jobs[job.id] = job
+            queue = self._queues.get(owner)
+            if queue is None:
+                queue = self._queues[owner] = deque()
+                self._rotation.append(owner)
+            queue.append(job)
+            self._update_queue_gauge()
+            self._ensure_workers()
+            self._condition.notify()
+        return job.id
+
+    def _next_job(self):
+        # Rodízio entre os donos com jobs na fila: um job de cada dono por vez
+        while self._rotation:
+            owner = self._rotation.popleft()
+            queue = self._queues[owner]
+            job = queue.popleft()
+            if queue:
+                self._rotation.append(owner)
+            else:
+                del self._queues[owner]
+            return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                self._update_queue_gauge()
+            self._run(job)
+
+    def _run(self, job):
+        with job._lock:
+            if job._cancel_event.is_set():
+                job.status = CANCELLED
+                job.message = "Cancelado antes de iniciar"
+                job.finished_at = time.time()
+                return
+            job.status = RUNNING
+            job.message = "Em execução"
+            job.started_at = time.time()
+        try:
+            result = job._fn(job, *job._args, **job._kwargs)
+        except JobCancelled:
+            status, result, error, details = CANCELLED, None, None, None
+        except Exception as e:
+            status, result, error, details = FAILED, None, str(e) or type(e).__name__, traceback.format_exc()
+        else:
+            status, error, details = DONE, None, None
+        with job._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.error_details = details
+            job.finished_at = time.time()
+            if status == DONE:
+                job.progress = 1.0
+                job.message = "Concluído"
+            elif status == CANCELLED:
+                job.message = "Cancelado"
+            else:
+                job.message = "Falhou"
+            # Libera as referências aos argumentos (ex: DataFrames grandes)
+            job._args = job._kwargs = None
+        if self.journal is not None:
+            self.journal.set(job.id, job.snapshot())
+
+    def _update_queue_gauge(self):
+        JOBS_QUEUED.set(sum(len(queue) for queue in self._queues.values()), app=self._app_name or current_app_name())
+
+    def _prune(self):
+        # Descarta os jobs encerrados há mais de `retention_seconds`
+        limit = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < limit]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Retorna o job pelo ID, ou None se ele não existir (ou já tiver expirado).
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+        if job is None and job_id and self.journal is not None:
+            found, snapshot = self.journal.get(job_id)
+            if found:
+                job = Job.from_snapshot(snapshot)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Pede o cancelamento de um job. Jobs na fila são cancelados antes de
+        iniciar; jobs em execução param na próxima verificação de `check_cancelled`.
+
+        Returns:
+            bool: False se o job não existir ou já tiver terminado.
+        """
+        job = self.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        job._cancel_event.set()
+        with job._lock:
+            job.message = "Cancelamento solicitado"
+        return True
+
+    def queue_position(self, job_id):
+        """
+        Posição aproximada do job na fila (1 = o próximo a executar), considerando
+        o rodízio entre donos, ou None se ele não estiver na fila.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            queue = self._queues.get(job.owner) if job is not None else None
+            if job is None or job.status != QUEUED or not queue or job not in queue:
+                return None
+            index = queue.index(job)
+            # À frente: os `index` jobs do mesmo dono e, a cada rodada, um job de cada outro dono
+            ahead = index
+            owner_turn = list(self._rotation).index(job.owner)
+            for position, other in enumerate(self._rotation):
+                if other == job.owner:
+                    continue
+                rounds = index + (1 if position < owner_turn else 0)
+                ahead += min(len(self._queues[other]), rounds)
+            return ahead + 1
+
+    def jobs_for(self, owner):
+        """
+        Retorna os jobs de um dono, do mais recente ao mais antigo.
+        """
+        with self._condition:
+            return [job for job in reversed(self._jobs.values()) if job.owner == owner]
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """
+    Retorna o JobRunner do processo (compartilhado por todas as sessões).
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,373 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Porta do endpoint de métricas (0 desativa o servidor)
+METRICS_PORT = int(os.environ.get("TOOLBOX_METRICS_PORT", 9100))
+
+# Limites (em segundos) dos buckets dos histogramas de duração
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Base das métricas: guarda um valor por combinação de rótulos, com lock,
+    já que as sessões do Streamlit rodam em threads diferentes.
+    """
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        missing = set(self.labelnames) - set(labels)
+        if missing:
+            raise ValueError(f"Rótulos ausentes para a métrica {self.name}: {sorted(missing)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        """
+        Retorna as linhas da métrica no formato de texto do Prometheus.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for suffix, labelvalues, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labelvalues, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, None, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def total(self):
+        """
+        Soma do gauge em todas as combinações de rótulos.
+        """
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, None, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for upper_bound, count in zip(self.buckets, state["buckets"]):
+                    samples.append(("_bucket", key, ("le", _format_value(upper_bound)), count))
+                samples.append(("_sum", key, None, state["sum"]))
+                samples.append(("_count", key, None, state["count"]))
+        return samples
+
+    def quantile(self, fraction):
+        """
+        Estima um quantil (ex: fraction=0.95 para o p95) de todas as
+        observações, somando os buckets de todas as combinações de rótulos e
+        interpolando dentro do bucket, como o histogram_quantile do Prometheus.
+
+        Returns:
+            float or None: O quantil estimado, ou None sem observações.
+        """
+        with self._lock:
+            states = [list(state["buckets"]) for state in self._values.values()]
+        if not states:
+            return None
+        counts = [sum(buckets[i] for buckets in states) for i in range(len(self.buckets))]
+        rank = fraction * counts[-1]
+        lower_bound, lower_count = 0.0, 0
+        for upper_bound, count in zip(self.buckets, counts):
+            if count >= rank:
+                if upper_bound == float("inf"):
+                    # Acima do maior limite finito: o melhor que o histograma informa é esse limite
+                    return lower_bound
+                return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / ((count - lower_count) or 1)
+            lower_bound, lower_count = upper_bound, count
+        return None
+
+
+class MetricsRegistry:
+    """
+    Conjunto das métricas do processo, exportadas juntas em /metrics.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._queue_gauges = []
+        self._lock = threading.Lock()
+
+    def register(self, metric, queue=False):
+        """
+        Registra a métrica. Gauges com `queue=True` contam trabalho à espera
+        (ex: jobs na fila) e entram na profundidade de fila de /healthz.
+        """
+        with self._lock:
+            self._metrics.append(metric)
+            if queue:
+                self._queue_gauges.append(metric)
+        return metric
+
+    def queue_depth(self):
+        with self._lock:
+            gauges = list(self._queue_gauges)
+        return sum(gauge.total() for gauge in gauges)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+ACTIONS_TOTAL = registry.register(Counter(
+    "toolbox_actions_total", "Ações executadas pelos usuários (botões de cada ferramenta).", ("app", "action", "status")
+))
+ROWS_PROCESSED_TOTAL = registry.register(Counter(
+    "toolbox_rows_processed_total", "Linhas processadas pelas ações.", ("app", "action")
+))
+ACTION_DURATION_SECONDS = registry.register(Histogram(
+    "toolbox_action_duration_seconds", "Duração das ações, em segundos.", ("app", "action")
+))
+API_CALLS_TOTAL = registry.register(Counter(
+    "toolbox_api_calls_total", "Chamadas a APIs externas, por status HTTP.", ("app", "api", "status")
+))
+API_CALL_DURATION_SECONDS = registry.register(Histogram(
+    "toolbox_api_call_duration_seconds", "Latência das chamadas a APIs externas, em segundos.", ("app", "api")
+))
+JOBS_IN_FLIGHT = registry.register(Gauge(
+    "toolbox_jobs_in_flight", "Ações em execução neste momento.", ("app", "action")
+))
+
+_app_name = os.environ.get("TOOLBOX_APP_NAME", "unknown")
+_started_at = time.time()
+_server = None
+_server_lock = threading.Lock()
+
+
+def health_snapshot():
+    """
+    Estado resumido do processo, servido em /healthz (ex: para o painel de
+    saúde do Lobby).
+
+    Returns:
+        dict: Nome da ferramenta, tempo no ar, ações em andamento,
+              profundidade de fila (jobs e requisições aguardando vaga) e o
+              p95 da duração das ações desde a partida (None sem ações).
+    """
+    action_p95 = ACTION_DURATION_SECONDS.quantile(0.95)
+    return {
+        "app": _app_name,
+        "status": "ok",
+        "uptime_seconds": round(time.time() - _started_at, 1),
+        "in_flight": JOBS_IN_FLIGHT.total(),
+        "queue_depth": registry.queue_depth(),
+        "action_p95_seconds": round(action_p95, 3) if action_p95 is not None else None,
+    }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body = registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/healthz":
+            body = json.dumps(health_snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # As coletas periódicas não devem poluir o log do contêiner
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """
+    Inicia (uma única vez por processo) o servidor HTTP que expõe /metrics
+    e /healthz em uma thread daemon.
+
+    Returns:
+        ThreadingHTTPServer or None: O servidor, ou None se estiver desativado
+            ou se a porta não puder ser aberta.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            print(f"Não foi possível iniciar o endpoint de métricas na porta {port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="toolbox-metrics", daemon=True).start()
+        return _server
+
+
+def init_metrics(app_name, port=METRICS_PORT):
+    """
+    Define o nome da ferramenta usado no rótulo "app" e inicia o endpoint de
+    métricas. Pode ser chamada a cada reexecução do script do Streamlit.
+
+    Args:
+        app_name (str): Nome da ferramenta (ex: "report_generator").
+        port (int, opcional): Porta do endpoint (0 desativa).
+    """
+    global _app_name
+    _app_name = app_name
+    start_metrics_server(port)
+
+
+def current_app_name():
+    """
+    Retorna o nome da ferramenta definido em `init_metrics`.
+    """
+    return _app_name
+
+
+class ActionTracker:
+    """
+    Acompanha uma ação em andamento (ver `track_action`).
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.rows = 0
+        self.failed = False
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def mark_error(self):
+        self.failed = True
+
+
+@contextmanager
+def track_action(action):
+    """
+    Mede uma ação da ferramenta: conta a execução (com status "ok" ou "error"),
+    as linhas processadas, a duração e a mantém no gauge de ações em andamento.
+
+    Uma exceção que escape do bloco marca a ação como erro; erros tratados
+    dentro do bloco devem chamar `mark_error()`.
+
+    Args:
+        action (str): Nome da ação (ex: "phase_report").
+
+    Yields:
+        ActionTracker: Use `add_rows(n)` para registrar as linhas processadas.
+    """
+    app = _app_name
+    tracker = ActionTracker(action)
+    JOBS_IN_FLIGHT.inc(app=app, action=action)
+    started = time.perf_counter()
+    try:
+        yield tracker
+    except BaseException:
+        tracker.failed = True
+        raise
+    finally:
+        JOBS_IN_FLIGHT.dec(app=app, action=action)
+        ACTION_DURATION_SECONDS.observe(time.perf_counter() - started, app=app, action=action)
+        ACTIONS_TOTAL.inc(app=app, action=action, status="error" if tracker.failed else "ok")
+        if tracker.rows:
+            ROWS_PROCESSED_TOTAL.inc(tracker.rows, app=app, action=action)
+
+
+def record_api_call(api, status_code, duration_seconds):
+    """
+    Registra uma chamada a uma API externa.
+
+    Args:
+        api (str): Nome da API (ex: "pipefy").
+        status_code (int or None): Status HTTP; None para falhas de conexão.
+        duration_seconds (float): Latência da chamada.
+    """
+    API_CALLS_TOTAL.inc(app=_app_name, api=api, status="error" if status_code is None else status_code)
+    API_CALL_DURATION_SECONDS.observe(duration_seconds, app=_app_name, api=api)
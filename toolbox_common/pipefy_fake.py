@@ -0,0 +1,187 @@
+"""
+Modelo de dados em memória que imita as respostas GraphQL do Pipefy.
+
+Usado pelo transporte "fake" (pipefy_transport.py) e pelo servidor local dos
+benchmarks (benchmarks/mock_pipefy_server.py).
+"""
+import re
+
+# Nomes das fases de cada pipe simulado (incluem as fases usadas pelos filtros dos relatórios)
+PHASE_NAMES = ["Caixa de Entrada", "Em Andamento", "Mudança de Embarque", "Desistências", "Concluído"]
+
+FIELD_PATTERN = re.compile(r"(?:(\w+)\s*:\s*)?([A-Za-z_]\w*)\s*(\()?")
+ARGUMENT_PATTERN = re.compile(r"(\w+)\s*:\s*(?:\"([^\"]*)\"|\$(\w+)|(-?\d+))")
+
+
+def _skip_arguments(query, start):
+    """
+    Retorna o índice logo após o ")" que fecha os argumentos abertos em `start`,
+    ignorando parênteses dentro de textos entre aspas.
+    """
+    depth = 0
+    in_string = False
+    i = start
+    while i < len(query):
+        char = query[i]
+        if in_string:
+            if char == "\\":
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("Argumentos sem ')' de fechamento na query.")
+
+
+def top_level_fields(query):
+    """
+    Lista os campos do primeiro nível de seleção de uma operação GraphQL
+    (ex: cada alias de um lote de cards ou de mutations).
+
+    Returns:
+        list: Tuplas (nome de saída, nome do campo, texto dos argumentos).
+    """
+    fields = []
+    depth = 0
+    i = 0
+    while i < len(query):
+        char = query[i]
+        if char == "{":
+            depth += 1
+            i += 1
+        elif char == "}":
+            depth -= 1
+            i += 1
+        elif char == "(":
+            # Argumentos fora do primeiro nível (ex: da própria operação) são ignorados
+            i = _skip_arguments(query, i)
+        elif depth == 1 and (char.isalpha() or char == "_"):
+            match = FIELD_PATTERN.match(query, i)
+            alias, name, has_args = match.groups()
+            arguments = ""
+            i = match.end()
+            if has_args:
+                end = _skip_arguments(query, i - 1)
+                arguments = query[i:end - 1]
+                i = end
+            fields.append((alias or name, name, arguments))
+        else:
+            i += 1
+    return fields
+
+
+def parse_arguments(arguments, variables):
+    values = {}
+    for name, text, variable, number in ARGUMENT_PATTERN.findall(arguments):
+        if variable:
+            values[name] = variables.get(variable)
+        else:
+            values[name] = text if text or not number else int(number)
+    return values
+
+
+class PipefyDataModel:
+    """
+    Gera cards, pipes e fases de forma determinística a partir dos IDs.
+
+    Args:
+        fan_out (int): Cards conectados (pais e filhos) de cada card.
+        pipes (int): Quantidade de pipes simulados.
+        pipe_size (int): Cards por pipe na conexão paginada.
+        max_page_size (int): Tamanho máximo de página aceito em `first`.
+    """
+
+    def __init__(self, fan_out=3, pipes=20, pipe_size=1000, max_page_size=50):
+        self.fan_out = fan_out
+        self.pipes = pipes
+        self.pipe_size = pipe_size
+        self.max_page_size = max_page_size
+
+    def pipe_of(self, card_id):
+        return 100 + card_id % self.pipes
+
+    def phase_ids(self, pipe_id):
+        return [pipe_id * 10 + k for k in range(len(PHASE_NAMES))]
+
+    def card_summary(self, card_id):
+        pipe_id = self.pipe_of(card_id)
+        phase_index = card_id % len(PHASE_NAMES)
+        return {
+            "id": str(card_id),
+            "title": f"Card {card_id}",
+            "pipe": {"id": str(pipe_id), "name": f"Pipe {pipe_id}"},
+            "current_phase": {"id": str(pipe_id * 10 + phase_index), "name": PHASE_NAMES[phase_index]},
+            "updated_at": "2025-07-01T12:00:00Z",
+            "fields": [{"name": "Campo", "value": f"Valor {card_id}"}],
+        }
+
+    def related_ids(self, card_id, offset):
+        return [card_id * (self.fan_out + 1) + offset + k for k in range(self.fan_out)]
+
+    def card(self, card_id):
+        card = self.card_summary(card_id)
+        card["parent_relations"] = [{
+            "name": "Conexão Pai",
+            "cards": [self.card_summary(i) for i in self.related_ids(card_id, 1)],
+        }]
+        card["child_relations"] = [{
+            "name": "Conexão Filho",
+            "cards": [self.card_summary(i) for i in self.related_ids(card_id, 1000003)],
+        }]
+        return card
+
+    def phase(self, phase_id):
+        index = phase_id % 10
+        return {
+            "id": str(phase_id),
+            "name": PHASE_NAMES[index % len(PHASE_NAMES)],
+            "fields": [{"id": f"campo_{phase_id}_{k}", "required": (phase_id + k) % 3 == 0} for k in range(3)],
+        }
+
+    def pipe(self, pipe_id):
+        return {
+            "id": str(pipe_id),
+            "name": f"Pipe {pipe_id}",
+            "phases": [self.phase(phase_id) for phase_id in self.phase_ids(pipe_id)],
+        }
+
+    def cards_page(self, pipe_id, first, after):
+        first = min(int(first or self.max_page_size), self.max_page_size)
+        start = int(after) if after else 0
+        end = min(start + first, self.pipe_size)
+        # Os cards de cada pipe são os IDs congruentes ao pipe (ver pipe_of)
+        base = pipe_id - 100
+        edges = [{"node": self.card(base + self.pipes * (n + 1))} for n in range(start, end)]
+        return {
+            "edges": edges,
+            "pageInfo": {"hasNextPage": end < self.pipe_size, "endCursor": str(end)},
+        }
+
+    def resolve(self, query, variables):
+        """
+        Monta o `data` da resposta para uma query ou mutation.
+        """
+        data = {}
+        is_mutation = query.lstrip().startswith("mutation")
+        for output_name, field, arguments in top_level_fields(query):
+            args = parse_arguments(arguments, variables or {})
+            if is_mutation:
+                data[output_name] = {"clientMutationId": None, "success": True}
+            elif field == "card":
+                data[output_name] = self.card(int(args["id"]))
+            elif field == "pipe":
+                data[output_name] = self.pipe(int(args["id"]))
+            elif field == "phase":
+                data[output_name] = self.phase(int(args["id"]))
+            elif field in ("cards", "allCards"):
+                data[output_name] = self.cards_page(int(args["pipe_id"]), args.get("first"), args.get("after"))
+            else:
+                data[output_name] = None
+        return data
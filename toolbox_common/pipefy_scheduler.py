@@ -0,0 +1,242 @@
+import contextvars
+import hashlib
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from toolbox_common.metrics import Gauge, Histogram, registry, current_app_name
+
+# Orçamento de cada token: requisições por segundo (0 = sem limite de taxa) e rajada máxima.
+# O padrão fica abaixo do limite do Pipefy por token (500 requisições a cada 30 segundos).
+PIPEFY_TOKEN_RATE_PER_SECOND = float(os.environ.get("PIPEFY_TOKEN_RATE_PER_SECOND", 15))
+PIPEFY_TOKEN_BURST = float(os.environ.get("PIPEFY_TOKEN_BURST", 30))
+# Requisições simultâneas por token, somando todas as sessões do processo
+PIPEFY_TOKEN_MAX_IN_FLIGHT = int(os.environ.get("PIPEFY_TOKEN_MAX_IN_FLIGHT", 8))
+# Dessas, quantas ficam reservadas às requisições interativas
+PIPEFY_INTERACTIVE_RESERVED_SLOTS = int(os.environ.get("PIPEFY_INTERACTIVE_RESERVED_SLOTS", 2))
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# Da maior para a menor prioridade
+PRIORITIES = (INTERACTIVE, BULK)
+DEFAULT_OWNER = "anonymous"
+
+REQUESTS_WAITING = registry.register(Gauge(
+    "toolbox_pipefy_requests_waiting", "Requisições ao Pipefy aguardando uma vaga do token.", ("app", "priority")
+), queue=True)
+SCHEDULER_WAIT_SECONDS = registry.register(Histogram(
+    "toolbox_pipefy_scheduler_wait_seconds", "Espera por uma vaga do token antes de cada requisição, em segundos.",
+    ("app", "priority"), buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+))
+
+# Dono (ex: a sessão) e prioridade das requisições feitas no contexto atual
+_request_context = contextvars.ContextVar("pipefy_request_context", default=(DEFAULT_OWNER, INTERACTIVE))
+
+
+@contextmanager
+def request_context(owner=None, priority=None):
+    """
+    Define o dono e a prioridade das requisições ao Pipefy feitas dentro do
+    bloco (inclusive nas threads iniciadas com `submit_in_context`). O que
+    não for informado é herdado do contexto atual.
+
+    Args:
+        owner (str, opcional): Quem faz as requisições (ex: o ID da sessão).
+        priority (str, opcional): INTERACTIVE (padrão fora de qualquer bloco) ou BULK.
+    """
+    current_owner, current_priority = _request_context.get()
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Prioridade desconhecida: {priority!r} (opções: {', '.join(PRIORITIES)})")
+    token = _request_context.set((owner or current_owner, priority or current_priority))
+    try:
+        yield
+    finally:
+        _request_context.reset(token)
+
+
+def current_request_context():
+    """
+    Retorna (dono, prioridade) das requisições feitas no contexto atual.
+    """
+    return _request_context.get()
+
+
+def token_key(token):
+    """
+    Chave do orçamento de um token, sem manter o token em texto puro.
+    """
+    return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+
+class _Ticket:
+    __slots__ = ("owner", "priority", "seq")
+
+    def __init__(self, owner, priority, seq):
+        self.owner = owner
+        self.priority = priority
+        self.seq = seq
+
+
+class _TokenState:
+    def __init__(self, burst):
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.in_flight_by_owner = {}
+        self.last_grant_by_owner = {}
+        self.grants = 0
+        self.waiting = []
+
+
+class TokenScheduler:
+    """
+    Distribui as requisições ao Pipefy de todas as sessões do processo, por
+    token: cada token tem seu próprio balde de taxa (`rate_per_second`,
+    `burst`) e um limite de requisições simultâneas (`max_in_flight`).
+
+    Quando há espera, a próxima vaga vai para:
+    1. as requisições interativas antes das em lote (BULK), que também não
+       usam as `interactive_reserved` últimas vagas simultâneas;
+    2. dentro da mesma prioridade, o dono com menos requisições em andamento
+       naquele token e, no empate, o atendido há mais tempo (divisão justa
+       entre sessões);
+    3. por fim, a requisição mais antiga.
+
+    Args:
+        rate_per_second (float, opcional): Requisições por segundo por token (0 = sem limite).
+        burst (float, opcional): Requisições que podem sair de uma vez com o balde cheio.
+        max_in_flight (int, opcional): Requisições simultâneas por token.
+        interactive_reserved (int, opcional): Vagas simultâneas que as requisições em lote não usam.
+    """
+
+    def __init__(self, rate_per_second=PIPEFY_TOKEN_RATE_PER_SECOND, burst=PIPEFY_TOKEN_BURST,
+                 max_in_flight=PIPEFY_TOKEN_MAX_IN_FLIGHT, interactive_reserved=PIPEFY_INTERACTIVE_RESERVED_SLOTS):
+        self.rate_per_second = max(float(rate_per_second), 0.0)
+        self.burst = max(float(burst), 1.0)
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.bulk_max_in_flight = max(self.max_in_flight - max(int(interactive_reserved), 0), 1)
+        self._states = {}
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+
+    def _refill(self, state, now):
+        if self.rate_per_second:
+            state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate_per_second)
+        state.refilled_at = now
+
+    def _next_ticket(self, state):
+        best, best_rank = None, None
+        for ticket in state.waiting:
+            limit = self.max_in_flight if ticket.priority == INTERACTIVE else self.bulk_max_in_flight
+            if state.in_flight >= limit:
+                continue
+            rank = (
+                PRIORITIES.index(ticket.priority),
+                state.in_flight_by_owner.get(ticket.owner, 0),
+                state.last_grant_by_owner.get(ticket.owner, 0),
+                ticket.seq,
+            )
+            if best_rank is None or rank < best_rank:
+                best, best_rank = ticket, rank
+        return best
+
+    def _update_waiting_gauge(self):
+        app = current_app_name()
+        for priority in PRIORITIES:
+            waiting = sum(1 for state in self._states.values() for ticket in state.waiting if ticket.priority == priority)
+            REQUESTS_WAITING.set(waiting, app=app, priority=priority)
+
+    def acquire(self, token):
+        """
+        Bloqueia até a requisição do contexto atual poder ser enviada com
+        este token. Toda chamada deve ser seguida de `release` (ver `slot`).
+
+        Returns:
+            tuple: A concessão, a ser devolvida em `release`.
+        """
+        owner, priority = _request_context.get()
+        key = token_key(token)
+        ticket = _Ticket(owner, priority, next(self._sequence))
+        started = time.monotonic()
+        with self._condition:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _TokenState(self.burst)
+            state.waiting.append(ticket)
+            self._update_waiting_gauge()
+            while True:
+                timeout = None
+                if self._next_ticket(state) is ticket:
+                    self._refill(state, time.monotonic())
+                    if not self.rate_per_second or state.tokens >= 1:
+                        break
+                    # Aguarda o balde encher o suficiente (ou uma requisição mais prioritária chegar)
+                    timeout = (1 - state.tokens) / self.rate_per_second
+                self._condition.wait(timeout)
+            state.waiting.remove(ticket)
+            if self.rate_per_second:
+                state.tokens -= 1
+            state.in_flight += 1
+            state.in_flight_by_owner[owner] = state.in_flight_by_owner.get(owner, 0) + 1
+            state.grants += 1
+            state.last_grant_by_owner[owner] = state.grants
+            self._update_waiting_gauge()
+            # A próxima da fila pode já estar liberada
+            self._condition.notify_all()
+        SCHEDULER_WAIT_SECONDS.observe(time.monotonic() - started, app=current_app_name(), priority=priority)
+        return key, owner
+
+    def release(self, grant):
+        """
+        Devolve a vaga de uma requisição encerrada.
+        """
+        key, owner = grant
+        with self._condition:
+            state = self._states[key]
+            state.in_flight -= 1
+            remaining = state.in_flight_by_owner.get(owner, 0) - 1
+            if remaining > 0:
+                state.in_flight_by_owner[owner] = remaining
+            else:
+                state.in_flight_by_owner.pop(owner, None)
+                if not any(ticket.owner == owner for ticket in state.waiting):
+                    state.last_grant_by_owner.pop(owner, None)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, token):
+        """
+        Ocupa uma vaga do token durante o bloco.
+        """
+        grant = self.acquire(token)
+        try:
+            yield
+        finally:
+            self.release(grant)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Retorna o agendador do processo, criado na primeira chamada a partir das
+    variáveis PIPEFY_TOKEN_*.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TokenScheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """
+    Substitui o agendador do processo (ex: benchmarks sem limite de taxa).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
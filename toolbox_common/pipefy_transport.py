@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+from toolbox_common.pipefy_fake import PipefyDataModel
+from toolbox_common.pipefy_scheduler import get_scheduler
+
+# Configuração padrão, lida das variáveis de ambiente
+PIPEFY_API_URL = os.environ.get("PIPEFY_API_URL", "https://api.pipefy.com/graphql")
+PIPEFY_TRANSPORT = os.environ.get("PIPEFY_TRANSPORT", "http")
+PIPEFY_FIXTURES_FILE = os.environ.get("PIPEFY_FIXTURES_FILE", "pipefy_fixtures.jsonl")
+PIPEFY_FAKE_LATENCY_MS = float(os.environ.get("PIPEFY_FAKE_LATENCY_MS", 0))
+
+TRANSPORT_NAMES = ("http", "record", "replay", "fake")
+
+
+class FixtureNotFoundError(Exception):
+    """
+    Indica que o transporte de replay não tem resposta gravada para a requisição.
+    """
+
+
+class TransportResponse:
+    """
+    Resposta compatível com `requests.Response` (status_code, headers, content,
+    text, json() e raise_for_status()), devolvida pelos transportes offline.
+    """
+
+    def __init__(self, status_code, content, headers=None, url=""):
+        self.status_code = status_code
+        self.content = content if isinstance(content, bytes) else content.encode("utf-8")
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.url = url
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def fixture_key(payload):
+    """
+    Chave de uma requisição nas gravações: hash da query (com espaços
+    normalizados) e das variáveis. O token nunca faz parte da chave.
+    """
+    query = re.sub(r"\s+", " ", payload.get("query", "")).strip()
+    canonical = json.dumps({"query": query, "variables": payload.get("variables") or {}}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class HttpTransport:
+    """
+    Envia as requisições para a API real (ou para qualquer servidor compatível,
+    como o servidor local dos benchmarks), reaproveitando conexões.
+    """
+
+    name = "http"
+
+    def __init__(self, url=PIPEFY_API_URL):
+        self.url = url
+        self._local = threading.local()
+
+    def _session(self):
+        # Uma sessão por thread: as buscas em lote usam várias threads ao mesmo tempo
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def post(self, payload, headers, timeout=None):
+        return self._session().post(self.url, json=payload, headers=headers, timeout=timeout)
+
+
+class RecordingTransport:
+    """
+    Encaminha as requisições para outro transporte e grava cada resposta em um
+    arquivo JSON lines, que depois pode ser usado pelo ReplayTransport.
+    """
+
+    name = "record"
+
+    def __init__(self, inner, fixtures_file=PIPEFY_FIXTURES_FILE):
+        self.inner = inner
+        self.fixtures_file = fixtures_file
+        self._lock = threading.Lock()
+
+    def post(self, payload, headers, timeout=None):
+        response = self.inner.post(payload, headers, timeout)
+        entry = {
+            "key": fixture_key(payload),
+            "query": payload.get("query", ""),
+            "variables": payload.get("variables"),
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "retry-after")},
+            "body": response.text,
+        }
+        with self._lock, open(self.fixtures_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return response
+
+
+class ReplayTransport:
+    """
+    Responde com as gravações de um arquivo JSON lines (ver RecordingTransport),
+    sem acesso à rede. Se a mesma requisição foi gravada várias vezes, as
+    respostas são devolvidas em sequência (a última se repete).
+    """
+
+    name = "replay"
+
+    def __init__(self, fixtures_file=PIPEFY_FIXTURES_FILE):
+        self.fixtures_file = fixtures_file
+        self._responses = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        with open(fixtures_file, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._responses.setdefault(entry["key"], []).append(entry)
+
+    def post(self, payload, headers, timeout=None):
+        key = fixture_key(payload)
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                raise FixtureNotFoundError(
+                    f"Nenhuma resposta gravada em {self.fixtures_file} para a query: {payload.get('query', '')[:200]}"
+                )
+            position = self._positions.get(key, 0)
+            self._positions[key] = min(position + 1, len(entries) - 1)
+        entry = entries[position]
+        return TransportResponse(entry["status"], entry["body"], entry.get("headers"), url=f"replay://{self.fixtures_file}")
+
+
+class FakeTransport:
+    """
+    Responde em memória com dados gerados pelo PipefyDataModel, sem rede nem
+    servidor: ideal para testes de carga e profiling na velocidade máxima.
+
+    Args:
+        model (PipefyDataModel, opcional): O modelo de dados (padrão: o modelo padrão).
+        latency_ms (float, opcional): Latência simulada de cada resposta.
+    """
+
+    name = "fake"
+
+    def __init__(self, model=None, latency_ms=PIPEFY_FAKE_LATENCY_MS):
+        self.model = model or PipefyDataModel()
+        self.latency_ms = latency_ms
+
+    def post(self, payload, headers, timeout=None):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        data = self.model.resolve(payload.get("query", ""), payload.get("variables"))
+        return TransportResponse(200, json.dumps({"data": data}), {"Content-Type": "application/json"}, url="fake://pipefy")
+
+
+def create_transport(name=PIPEFY_TRANSPORT, url=PIPEFY_API_URL, fixtures_file=PIPEFY_FIXTURES_FILE):
+    """
+    Cria um transporte pelo nome ("http", "record", "replay" ou "fake").
+
+    Raises:
+        ValueError: Se o nome não for um transporte conhecido.
+    """
+    if name == "http":
+        return HttpTransport(url)
+    if name == "record":
+        return RecordingTransport(HttpTransport(url), fixtures_file)
+    if name == "replay":
+        return ReplayTransport(fixtures_file)
+    if name == "fake":
+        return FakeTransport()
+    raise ValueError(f"Transporte do Pipefy desconhecido: {name!r} (opções: {', '.join(TRANSPORT_NAMES)})")
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Retorna o transporte do processo, criado na primeira chamada a partir de
+    PIPEFY_TRANSPORT, PIPEFY_API_URL e PIPEFY_FIXTURES_FILE.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = create_transport()
+        return _transport
+
+
+def set_transport(transport):
+    """
+    Substitui o transporte do processo (ex: benchmarks e testes de carga).
+    """
+    global _transport
+    with _transport_lock:
+        _transport = transport
+
+
+def post_graphql(payload, token, timeout=None):
+    """
+    Envia uma requisição GraphQL pelo transporte configurado, depois de obter
+    uma vaga do token no agendador do processo (toolbox_common/pipefy_scheduler.py).
+
+    Args:
+        payload (dict): O corpo da requisição ({"query": ..., "variables": ...}).
+        token (str): O token de acesso Bearer.
+        timeout (float, opcional): Tempo limite da requisição, em segundos.
+
+    Returns:
+        requests.Response or TransportResponse: A resposta (mesma interface nos dois casos).
+    """
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    with get_scheduler().slot(token):
+        return get_transport().post(payload, headers, timeout)
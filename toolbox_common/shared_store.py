@@ -0,0 +1,145 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+
+# Diretório compartilhado entre as réplicas de uma ferramenta (ex: um volume do Docker).
+# Sem ele, caches e resultados de jobs ficam apenas na memória de cada processo.
+SHARED_DIR = os.environ.get("TOOLBOX_SHARED_DIR")
+# Intervalo mínimo entre duas limpezas das entradas expiradas de um armazenamento
+CLEANUP_INTERVAL_SECONDS = 300
+# Permissão de um arquivo gravado por `replace_file` quando ele ainda não existia
+NEW_FILE_MODE = 0o644
+
+
+def replace_file(temp_path, path):
+    """
+    Substitui `path` pelo temporário `temp_path` (os.replace, atômico) com a
+    permissão do arquivo anterior, ou NEW_FILE_MODE se ele ainda não existir:
+    o tempfile.NamedTemporaryFile cria o temporário com 0600, que de outra
+    forma passaria para o arquivo final.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    os.chmod(temp_path, mode)
+    os.replace(temp_path, path)
+
+
+class SharedDirStore:
+    """
+    Armazenamento chave-valor em arquivos, com tempo de vida por entrada, para
+    compartilhar dados entre processos (réplicas) que montam o mesmo diretório.
+
+    Cada entrada é um arquivo pickle, gravado em um temporário e renomeado
+    (os.replace), então um leitor nunca vê uma gravação pela metade. O pickle
+    só é seguro porque o diretório é privado das ferramentas: não aponte
+    TOOLBOX_SHARED_DIR para um lugar gravável por terceiros.
+
+    A interface de `get`/`set` é a mesma do TTLCache (report_cache.py).
+
+    Args:
+        directory (str): Diretório das entradas (criado se não existir).
+        ttl_seconds (float): Tempo de vida de cada entrada, contado da gravação.
+    """
+
+    def __init__(self, directory, ttl_seconds):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".pkl")
+
+    def get(self, key):
+        """
+        Retorna a tupla (encontrado, valor). Entradas expiradas ou ilegíveis
+        contam como não encontradas, inclusive as gravadas por uma réplica com
+        outra versão do código ou das bibliotecas (classe ou módulo ausente).
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                return False, None
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            print(f"Entrada ilegível no armazenamento compartilhado ({path}): {e}")
+            return False, None
+        if stored_key != key:
+            # Colisão de hash (improvável): trata como ausente
+            return False, None
+        return True, value
+
+    def set(self, key, value):
+        """
+        Grava a entrada. Falhas de gravação (disco cheio, valor que não pode
+        ser serializado) são registradas e ignoradas: o armazenamento é um
+        complemento dos caches em memória, não a única cópia.
+        """
+        path = self._path(key)
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("wb", dir=self.directory, suffix=".tmp", delete=False) as f:
+                temp_path = f.name
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            replace_file(temp_path, path)
+        except Exception as e:
+            print(f"Não foi possível gravar no armazenamento compartilhado ({self.directory}): {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._cleanup()
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _cleanup(self):
+        # Remove as entradas expiradas (e temporários abandonados) de tempos em tempos
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < CLEANUP_INTERVAL_SECONDS:
+                return
+            self._last_cleanup = now
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl_seconds:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_shared_store(namespace, ttl_seconds):
+    """
+    Retorna o armazenamento compartilhado `namespace` (um subdiretório de
+    TOOLBOX_SHARED_DIR), ou None se TOOLBOX_SHARED_DIR não estiver definido.
+
+    Args:
+        namespace (str): Nome do armazenamento (ex: "report_cache", "jobs").
+        ttl_seconds (float): Tempo de vida das entradas.
+    """
+    if not SHARED_DIR:
+        return None
+    with _stores_lock:
+        store = _stores.get(namespace)
+        if store is None:
+            store = _stores[namespace] = SharedDirStore(os.path.join(SHARED_DIR, namespace), ttl_seconds)
+        return store
@@ -0,0 +1,118 @@
+import math
+
+import streamlit as st
+
+PAGE_SIZE_OPTIONS = [50, 100, 250, 500, 1000]
+
+
+def filter_and_sort_dataframe(df, columns=None, sort_by=None, ascending=True, filter_text=""):
+    """
+    Aplica projeção de colunas, filtro textual e ordenação a um DataFrame.
+
+    Args:
+        df (pandas.DataFrame): O DataFrame completo.
+        columns (list, opcional): Colunas a manter. Se vazio, mantém todas.
+        sort_by (str, opcional): Coluna usada para ordenação.
+        ascending (bool, opcional): Ordem crescente ou decrescente.
+        filter_text (str, opcional): Texto buscado (sem diferenciar maiúsculas)
+            em todas as colunas projetadas.
+
+    Returns:
+        pandas.DataFrame: A visão resultante (sem cópia quando nada é aplicado).
+    """
+    view = df[list(columns)] if columns else df
+
+    if filter_text:
+        mask = None
+        for col in view.columns:
+            col_mask = view[col].astype(str).str.contains(filter_text, case=False, regex=False, na=False)
+            mask = col_mask if mask is None else mask | col_mask
+        if mask is not None:
+            view = view[mask]
+
+    if sort_by and sort_by in view.columns:
+        try:
+            view = view.sort_values(by=sort_by, ascending=ascending, kind="mergesort")
+        except TypeError:
+            # Colunas com tipos mistos (ex: listas e textos) são ordenadas pela representação textual
+            view = view.sort_values(by=sort_by, ascending=ascending, kind="mergesort", key=lambda s: s.astype(str))
+
+    return view
+
+
+def paginate_dataframe(df, page=1, page_size=100):
+    """
+    Retorna apenas a fatia de uma página do DataFrame.
+
+    Args:
+        df (pandas.DataFrame): O DataFrame (já filtrado e ordenado).
+        page (int, opcional): Página desejada (começando em 1).
+        page_size (int, opcional): Quantidade de linhas por página.
+
+    Returns:
+        tuple: (DataFrame da página, número da página efetivo, total de páginas).
+    """
+    total_pages = max(math.ceil(len(df) / page_size), 1)
+    page = min(max(int(page), 1), total_pages)
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size], page, total_pages
+
+
+def render_paginated_dataframe(df, key, default_page_size=100, **dataframe_kwargs):
+    """
+    Exibe um DataFrame paginado com seleção de colunas, ordenação e filtro.
+
+    Substitui `st.dataframe(df)` para tabelas grandes: somente a página visível
+    trafega pelo websocket, enquanto o DataFrame completo continua disponível
+    para as exportações.
+
+    Args:
+        df (pandas.DataFrame): O DataFrame completo.
+        key (str): Prefixo único para as chaves dos widgets desta tabela.
+        default_page_size (int, opcional): Tamanho de página inicial.
+        **dataframe_kwargs: Argumentos repassados para `st.dataframe`.
+    """
+    if df is None or df.empty:
+        st.dataframe(df, **dataframe_kwargs)
+        return
+
+    # Nomes de coluna precisam ser textos para os widgets de seleção
+    if any(not isinstance(c, str) for c in df.columns):
+        df = df.rename(columns=str)
+    all_columns = list(df.columns)
+
+    with st.expander("🔧 Opções da tabela", expanded=False):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            columns = st.multiselect("Colunas", all_columns, default=all_columns, key=f"{key}_columns")
+        with col2:
+            filter_text = st.text_input("Filtrar (contém)", key=f"{key}_filter")
+        with col3:
+            page_size = st.selectbox(
+                "Linhas por página",
+                PAGE_SIZE_OPTIONS,
+                index=PAGE_SIZE_OPTIONS.index(default_page_size) if default_page_size in PAGE_SIZE_OPTIONS else 1,
+                key=f"{key}_page_size"
+            )
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            sort_by = st.selectbox("Ordenar por", [""] + (columns or all_columns), key=f"{key}_sort_by")
+        with col2:
+            ascending = st.radio("Ordem", ["Crescente", "Decrescente"], key=f"{key}_sort_order", horizontal=True) == "Crescente"
+
+    view = filter_and_sort_dataframe(df, columns, sort_by or None, ascending, filter_text)
+    total_pages = max(math.ceil(len(view) / page_size), 1)
+
+    # Se o filtro reduziu o número de páginas, volta para a última página válida
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+
+    page = st.number_input(f"Página (de {total_pages})", min_value=1, max_value=total_pages, step=1, key=page_key)
+
+    page_df, page, _ = paginate_dataframe(view, page, page_size)
+    st.dataframe(page_df, **dataframe_kwargs)
+
+    first_row = (page - 1) * page_size + 1 if len(view) else 0
+    last_row = min(page * page_size, len(view))
+    st.caption(f"Linhas {first_row}–{last_row} de {len(view)} (total sem filtro: {len(df)})")